@@ -0,0 +1,323 @@
+import os
+from functools import partial
+from logging import getLogger
+
+from backend.preflight import preflight_files
+from util.batch import collected_records, find_excel_files, run_in_pool
+from util.calendar_index import build_calendar_index
+from util.check_cache import DEFAULT_MAX_ENTRIES, CheckCache
+from util.findings import (
+    CollectFindingSink,
+    LogFindingSink,
+    open_finding_sinks,
+    sheet_name_findings,
+)
+from util.logger import flush_log_summary
+from util.memory import MemoryGuard
+from util.profiler import FILE_SCOPE, SHEET_SCOPE, active_profiler, phase, start_profiling
+from util.rules import CHECK_NAMES, DEFAULT_PLAN
+from util.xlsx_reader import SheetCells, StreamingWorkbook, sheet_layout, snapshot_worksheet
+
+logger = getLogger()
+
+ENGINE_STREAM = "stream"
+ENGINE_OPENPYXL = "openpyxl"
+
+
+def check_workbook(
+    input_path,
+    start_yyyymm: str,
+    end_yyyymm: str,
+    engine: str = ENGINE_STREAM,
+    cache=None,
+    sink=None,
+    file_name=None,
+    sheet_jobs=1,
+    workbook=None,
+    memory_guard=None,
+):
+    """
+    1 つのブックをチェックし、ファイル単位の集計結果を返す。
+    cache (CheckCache) を渡すと、前回から変更のないシートはチェックせずに前回の結果を使う (stream エンジンのみ)。
+    違反 (Finding) はシートごとに sink (FindingSink) へ書き出す。省略時はログに出力する。
+    input_path にはファイルのパスのほか、アップロードされたブックなどのファイルオブジェクト (BytesIO) も渡せる。
+    その場合は集計・違反に記録するファイル名を file_name で指定する (キャッシュは使えない)。
+    sheet_jobs に 2 以上を指定すると、シートを分けて複数のプロセスでチェックする (stream エンジンでファイルを指定した場合のみ)。
+    workbook に開いている StreamingWorkbook を渡すと、ブックを開き直さずにそれを使う (閉じるのは呼び出し元)。
+    memory_guard (util.memory.MemoryGuard) を渡すと、シートごとにメモリ使用量が上限を超えていないか確認する。
+    """
+    if sink is None:
+        sink = LogFindingSink()
+    if file_name is None:
+        file_name = str(input_path)
+
+    with phase(FILE_SCOPE, file=file_name):
+        if engine == ENGINE_OPENPYXL:
+            import openpyxl
+
+            # read_only で開き、シートごとにチェックするセルの値だけを SheetCells に写す
+            # (全シートの Cell オブジェクトを同時に保持しない)
+            with phase("openpyxl.load_workbook"):
+                wb = openpyxl.load_workbook(
+                    input_path if hasattr(input_path, "read") else f"{input_path}", read_only=True, data_only=False
+                )
+            get_sheet = lambda sheet_name: snapshot_worksheet(wb[sheet_name], DEFAULT_PLAN.addresses)
+            cache = None
+        else:
+            wb = StreamingWorkbook(input_path) if workbook is None else workbook
+            get_sheet = lambda sheet_name: wb.read_cells(sheet_name, DEFAULT_PLAN.addresses)
+        if memory_guard is not None:
+            memory_guard.check(f"{file_name} の読み込み後")
+        existing_sheets = set(wb.sheetnames)
+
+        calendar = build_calendar_index(start_yyyymm, end_yyyymm)
+        expected_sheets = calendar.sheet_names
+
+        missing_sheets, extra_sheets, name_findings = sheet_name_findings(wb.sheetnames, expected_sheets)
+
+        if not missing_sheets:
+            logger.info("必要なシートはすべて存在しています。")
+
+        sink.write(file_name, name_findings)
+
+        summary = {
+            "file": file_name,
+            "checked_sheets": 0,
+            "error_sheets": 0,
+            "missing_sheets": len(missing_sheets),
+            "extra_sheets": len(extra_sheets),
+            "failures": {check: 0 for check in CHECK_NAMES},
+            "cached_sheets": 0,
+        }
+        sheets = [sheet_name for sheet_name in expected_sheets if sheet_name in existing_sheets]
+        if sheet_jobs > 1 and engine == ENGINE_STREAM and not hasattr(input_path, "read") and len(sheets) > 1:
+            results = _check_sheets_parallel(wb, input_path, sheets, start_yyyymm, end_yyyymm, cache, sheet_jobs)
+        else:
+            results = check_sheets(wb, get_sheet, sheets, calendar, cache)
+        for sheet_name, findings, cached in results:
+            if memory_guard is not None:
+                memory_guard.check(f"{file_name} のシート {sheet_name} のチェック後")
+            with phase("findings.write"):
+                sink.write(file_name, findings)
+            summary["checked_sheets"] += 1
+            if cached:
+                summary["cached_sheets"] += 1
+            if findings:
+                summary["error_sheets"] += 1
+            for check in {finding.check for finding in findings}:
+                summary["failures"][check] += 1
+
+        if wb is not workbook:
+            wb.close()
+    return summary
+
+
+def check_sheets(wb, get_sheet, sheets, calendar, cache):
+    """
+    シートを 1 つずつ順にチェックし、(シート名, 違反, キャッシュを使ったか) を sheets の順に返す。
+    get_sheet(シート名) はチェックに使うシート (SheetCells / openpyxl の Worksheet) を返す関数。
+    """
+    for sheet_name in sheets:
+        with phase(SHEET_SCOPE, sheet=sheet_name):
+            with phase("cache.lookup"):
+                findings = cache.lookup(wb, sheet_name) if cache is not None else None
+            if findings is not None:
+                yield sheet_name, findings, True
+                continue
+            ws = get_sheet(sheet_name)
+            findings = DEFAULT_PLAN.run(ws, sheet_name, calendar.week(sheet_name))
+            if cache is not None:
+                with phase("cache.store"):
+                    cache.store(wb, sheet_name, ws, findings)
+            yield sheet_name, findings, False
+
+
+def _split_sheets(sheets, parts):
+    """シートの一覧を、ブック内で連続した parts 個のまとまりにほぼ均等に分ける"""
+    size = -(-len(sheets) // parts)
+    return [tuple(sheets[index:index + size]) for index in range(0, len(sheets), size)]
+
+
+def _check_sheets_in_worker(sheet_names, input_path, start_yyyymm, end_yyyymm, holiday_dates, profile=False):
+    """
+    --sheet-jobs 用: ワーカープロセスでブックを開き、担当するシートの XML パートだけを読んでチェックする。
+    祝日の集合は親プロセスで作ったもの (holiday_dates) を使う。
+    戻り値は ([(シート名, 違反, 参照した共有文字列)], 計測結果)。
+    """
+    profiler = start_profiling() if profile else None
+    calendar = build_calendar_index(start_yyyymm, end_yyyymm)
+    calendar.use_holiday_dates(holiday_dates)
+    results = []
+    with StreamingWorkbook(input_path) as wb:
+        for sheet_name in sheet_names:
+            with phase(SHEET_SCOPE, sheet=sheet_name):
+                ws = wb.read_cells(sheet_name, DEFAULT_PLAN.addresses)
+                findings = DEFAULT_PLAN.run(ws, sheet_name, calendar.week(sheet_name))
+            results.append((sheet_name, findings, ws.shared_refs))
+    return results, profiler.pop_stats() if profiler is not None else None
+
+
+def _check_sheets_parallel(wb, input_path, sheets, start_yyyymm, end_yyyymm, cache, sheet_jobs):
+    """
+    キャッシュのないシートを sheet_jobs 個に分けてプロセスプールでチェックし、結果を sheets の順に並べ直して返す。
+    キャッシュの参照・記録は親プロセスで行う。
+    """
+    results = {}
+    pending = []
+    for sheet_name in sheets:
+        with phase("cache.lookup"):
+            findings = cache.lookup(wb, sheet_name) if cache is not None else None
+        if findings is None:
+            pending.append(sheet_name)
+        else:
+            results[sheet_name] = (findings, True)
+
+    if pending:
+        worker = partial(
+            _check_sheets_in_worker,
+            input_path=str(input_path),
+            start_yyyymm=start_yyyymm,
+            end_yyyymm=end_yyyymm,
+            holiday_dates=build_calendar_index(start_yyyymm, end_yyyymm).holiday_dates,
+            profile=active_profiler() is not None,
+        )
+        with phase("check.sheet_jobs"):
+            for _, (sheet_results, profile_stats) in run_in_pool(worker, _split_sheets(pending, sheet_jobs), sheet_jobs):
+                for sheet_name, findings, shared_refs in sheet_results:
+                    results[sheet_name] = (findings, False)
+                    if cache is not None:
+                        cache.store(wb, sheet_name, SheetCells(sheet_name, sheet_layout(()), shared_refs=shared_refs), findings)
+                if profile_stats is not None:
+                    active_profiler().merge(profile_stats)
+
+    for sheet_name in sheets:
+        findings, cached = results[sheet_name]
+        yield sheet_name, findings, cached
+
+
+_worker_cache = None
+
+
+def _check_workbook_in_worker(input_path, start_yyyymm, end_yyyymm, engine, cache_path=None, profile=False, max_memory=0):
+    """
+    バッチ用: ワーカープロセスで 1 ブックをチェックし、集計・違反・ログ・キャッシュの更新分
+    (profile 時は計測結果も) をまとめて返す。キャッシュファイルへの書き込みは親プロセスがまとめて行う。
+    max_memory (MB) はワーカープロセスごとのメモリ使用量の上限。
+    """
+    global _worker_cache
+    profiler = start_profiling() if profile else None
+    if cache_path is not None and _worker_cache is None:
+        _worker_cache = CheckCache(cache_path)
+    sink = CollectFindingSink()
+    try:
+        summary = check_workbook(
+            input_path, start_yyyymm, end_yyyymm, engine, _worker_cache, sink, memory_guard=MemoryGuard(max_memory)
+        )
+    except Exception as e:
+        logger.error(f"エラーが発生しました: {e}")
+        summary = None
+    cache_updates = _worker_cache.pop_updates() if _worker_cache is not None else {}
+    profile_stats = profiler.pop_stats() if profiler is not None else None
+    return summary, sink.pop_batches(), collected_records(), cache_updates, profile_stats
+
+
+def log_batch_summary(summaries):
+    """バッチチェックのファイル単位の集計をまとめて出力"""
+    lines = ["ファイル | チェック済 | キャッシュ使用 | エラーシート | 不足 | 不正シート名 | " + " | ".join(CHECK_NAMES)]
+    for summary in summaries:
+        lines.append(
+            f"{summary['file']} | {summary['checked_sheets']} | {summary['cached_sheets']} | {summary['error_sheets']} | "
+            f"{summary['missing_sheets']} | {summary['extra_sheets']} | "
+            + " | ".join(str(summary["failures"][check]) for check in CHECK_NAMES)
+        )
+    logger.info("バッチチェック結果:\n" + "\n".join(lines))
+
+
+def run_check(
+    start_yyyymm,
+    end_yyyymm,
+    engine=ENGINE_STREAM,
+    batch=False,
+    input_dir="input",
+    recursive=False,
+    jobs=0,
+    use_cache=True,
+    cache_size=None,
+    findings_out=None,
+    findings_format=None,
+    preflight=False,
+    sheet_jobs=1,
+    max_memory=0,
+):
+    """
+    check コマンドの本体 (引数は main.py の check コマンドのオプションと同じ)。
+    メモリ使用量が max_memory (MB) を超えた場合は util.memory.MemoryLimitExceeded を送出する
+    (--batch ではワーカープロセスごとの上限とし、超えたファイルはエラーとして次のファイルに進む)。
+    """
+    input_dir = os.path.abspath(input_dir)
+    excel_files = find_excel_files(input_dir, recursive=batch and recursive)
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+    if not batch:
+        excel_files = excel_files[:1]
+    sheet_jobs = sheet_jobs or os.cpu_count() or 1
+    if sheet_jobs > 1 and (batch or engine != ENGINE_STREAM):
+        logger.warning("--sheet-jobs は --batch なし・--engine stream の場合だけ有効です。シートは 1 つずつチェックします。")
+        sheet_jobs = 1
+
+    cache = CheckCache(max_entries=cache_size or DEFAULT_MAX_ENTRIES) if use_cache else None
+    sinks, finding_summary = open_finding_sinks(findings_out, findings_format, base_dir=input_dir if batch else None)
+
+    try:
+        if preflight:
+            # シート名だけを先に確認し、シートが不足・不正なファイルはセルのチェックを行わない
+            rejected = set(preflight_files(excel_files, start_yyyymm, end_yyyymm, sinks))
+            if rejected:
+                logger.warning(f"シート名に問題がある {len(rejected)} 件のファイルはセルのチェックを行いません。")
+            excel_files = [path for path in excel_files if path not in rejected]
+
+        if batch and excel_files:
+            _check_batch(excel_files, input_dir, start_yyyymm, end_yyyymm, engine, jobs, cache, sinks, max_memory)
+        elif excel_files:
+            summary = check_workbook(
+                excel_files[0], start_yyyymm, end_yyyymm, engine, cache, sinks,
+                sheet_jobs=sheet_jobs, memory_guard=MemoryGuard(max_memory),
+            )
+            if cache is not None:
+                logger.info(f"{summary['checked_sheets']} シート中 {summary['cached_sheets']} シートは前回のチェック結果を使用しました。")
+    finally:
+        sinks.close()
+        flush_log_summary()
+    finding_summary.log()
+    if cache is not None:
+        cache.save()
+
+
+def _check_batch(excel_files, input_dir, start_yyyymm, end_yyyymm, engine, jobs, cache, sinks, max_memory=0):
+    """check --batch: 複数のブックをプロセスプールでチェックし、完了したファイルから順に出力する"""
+
+    logger.info(f"{len(excel_files)} 件の Excel ファイルをチェックします。")
+    worker = partial(
+        _check_workbook_in_worker,
+        start_yyyymm=start_yyyymm,
+        end_yyyymm=end_yyyymm,
+        engine=engine,
+        cache_path=str(cache.path) if cache is not None else None,
+        profile=active_profiler() is not None,
+        max_memory=max_memory,
+    )
+    summaries = {}
+    results = run_in_pool(worker, excel_files, jobs, prefix=lambda path: os.path.relpath(path, input_dir))
+    for input_path, (summary, batches, records, cache_updates, profile_stats) in results:
+        for level, message in records:
+            logger.log(level, message)
+        for file, findings in batches:
+            sinks.write(file, findings)
+        if summary is not None:
+            summaries[input_path] = summary
+        if cache is not None:
+            cache.merge(cache_updates)
+        if profile_stats is not None:
+            active_profiler().merge(profile_stats)
+
+    log_batch_summary(summaries[path] for path in excel_files if path in summaries)
@@ -0,0 +1,105 @@
+import os
+from logging import getLogger
+
+from util.batch import find_excel_files
+from util.calendar_index import build_calendar_index
+from util.profiler import FILE_SCOPE, phase
+from util.xlsx_package import XlsxPackage
+
+logger = getLogger()
+
+ENGINE_ZIP = "zip"
+ENGINE_COM = "com"
+
+
+def generate_expected_sheet_names(start_yyyymm: str, end_yyyymm: str):
+    """指定された年月の範囲で、各週の月曜始まり・日曜終わりのシート名リストを生成"""
+    return list(build_calendar_index(start_yyyymm, end_yyyymm).sheet_names)
+
+
+def cut_output_path(start_yyyymm, end_yyyymm, output_dir):
+    """抽出したブックの出力先 (output/日報_抽出_<開始年月>_<終了年月>.xlsx)"""
+    return os.path.join(output_dir, f"日報_抽出_{start_yyyymm}_{end_yyyymm}.xlsx")
+
+
+def run_cut(start_yyyymm, end_yyyymm, engine=ENGINE_ZIP):
+    """cut コマンドの本体: 指定した年月範囲に含まれるシートのみを抽出し、新しいExcelファイルとして出力する。"""
+    input_dir = os.path.abspath("input")
+    # inputフォルダ内の名前順で最初の.xlsxファイルを取得 (Excel の一時ファイル ~$xxx.xlsx は除外)
+    excel_files = find_excel_files(input_dir)
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+
+    input_path = excel_files[0]  # 最初のExcelファイルを取得
+    output_dir = os.path.abspath("output")
+    output_filename = cut_output_path(start_yyyymm, end_yyyymm, output_dir)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # 期待されるシート名を取得（昇順でソート）
+    expected_sheets = generate_expected_sheet_names(start_yyyymm, end_yyyymm)
+
+    if engine == ENGINE_COM:
+        _cut_out_sheet_com(input_path, output_filename, expected_sheets)
+        return
+
+    try:
+        with phase(FILE_SCOPE, file=input_path), XlsxPackage(input_path) as package:
+            with phase("cut.extract"):
+                copied = package.extract(expected_sheets, output_filename)
+        if copied:
+            logger.info(f"抽出したシートを {output_filename} に出力しました。({len(copied)} シート)")
+        else:
+            logger.warning("指定範囲に該当するシートがありませんでした。")
+
+    except Exception as e:
+        logger.error(f"エラーが発生しました: {e}")
+
+
+def _cut_out_sheet_com(input_path, output_filename, expected_sheets):
+    """Excel を COM で操作してシートを抽出する (従来方式)"""
+    import win32com.client
+
+    excel = None
+    try:
+        # Excelアプリケーションの起動
+        excel = win32com.client.Dispatch("Excel.Application")
+        excel.Visible = False  # Excelを非表示で実行
+
+        # 元のExcelファイルを開く
+        wb = excel.Workbooks.Open(input_path)
+        
+        # 新規Excelファイルを作成
+        new_wb = excel.Workbooks.Add()
+
+        # シートを順番通りにコピー
+        copied_any = False
+        existing_sheets = {sheet.Name for sheet in wb.Sheets}
+
+        for sheet_name in expected_sheets:
+            if sheet_name in existing_sheets:
+                wb.Sheets(sheet_name).Copy(Before=new_wb.Sheets(1))  # 先頭に追加
+                copied_any = True
+
+        if copied_any:
+            # デフォルトの空シート（Sheet1 など）を削除
+            while new_wb.Sheets.Count > len(expected_sheets):
+                new_wb.Sheets(new_wb.Sheets.Count).Delete()
+
+            # 新規Excelファイルを保存
+            new_wb.SaveAs(output_filename)
+            logger.info(f"抽出したシートを {output_filename} に出力しました。")
+        else:
+            logger.warning("指定範囲に該当するシートがありませんでした。")
+
+        # ファイルを閉じる
+        new_wb.Close(SaveChanges=False)
+        wb.Close(SaveChanges=False)
+
+    except Exception as e:
+        logger.error(f"エラーが発生しました: {e}")
+    
+    finally:
+        if excel is not None:
+            excel.Quit()  # Excelを終了
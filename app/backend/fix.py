@@ -0,0 +1,85 @@
+import os
+from collections import Counter
+from logging import getLogger
+from pathlib import Path
+
+from util.batch import find_excel_files
+from util.calendar_index import build_calendar_index
+from util.profiler import FILE_SCOPE, SHEET_SCOPE, phase
+from util.xlsx_fix import FIX_ADDRESSES, fix_transforms, plan_fixes
+from util.xlsx_package import XlsxPackage
+from util.xlsx_reader import StreamingWorkbook
+
+logger = getLogger()
+
+
+def fixed_output_path(input_path, output_dir):
+    """修正後のブックの出力先 (output/<元のファイル名>_fixed.xlsx)"""
+    return os.path.join(output_dir, f"{Path(input_path).stem}_fixed.xlsx")
+
+
+def fix_workbook(input_path, output_path, start_yyyymm, end_yyyymm, dry_run=False):
+    """
+    1 つのブックの指定範囲のシートから自動修正できるセルを探し、修正したコピーを output_path に書き出す。
+    対象のセルだけを読み込み (StreamingWorkbook)、書き換えるのは修正が必要なシートの XML パートと
+    workbook.xml (開いたときに再計算させる設定) だけで、他のパートは内容を変えずにコピーする。
+    戻り値は修正 (CellFix) の一覧。修正するセルがない・dry_run の場合は何も書き出さない。
+    """
+    calendar = build_calendar_index(start_yyyymm, end_yyyymm)
+    fixes = []
+    with phase(FILE_SCOPE, file=str(input_path)):
+        with StreamingWorkbook(input_path) as wb:
+            existing_sheets = set(wb.sheetnames)
+            for sheet_name in calendar.sheet_names:
+                if sheet_name not in existing_sheets:
+                    continue
+                with phase(SHEET_SCOPE, sheet=sheet_name):
+                    ws = wb.read_cells(sheet_name, FIX_ADDRESSES)
+                    fixes.extend(plan_fixes(ws, sheet_name, calendar.week(sheet_name)))
+
+        if fixes and not dry_run:
+            with phase("fix.rewrite"), XlsxPackage(input_path) as package:
+                package.rewrite(output_path, fix_transforms(package, fixes), drop_calc_chain=True)
+    return fixes
+
+
+def log_fixes(input_path, fixes):
+    """修正したセルの一覧と、ルールごとの件数を出力"""
+    lines = [f"{fix.sheet}!{fix.cell}: {fix.actual!r} → {fix.expected!r} ({fix.rule_id})" for fix in fixes]
+    counts = Counter(fix.rule_id for fix in fixes)
+    sheets = len({fix.sheet for fix in fixes})
+    logger.info(f"{input_path} の修正内容:\n" + "\n".join(lines))
+    logger.info(
+        f"{sheets} シート・{len(fixes)} セルを修正しました: "
+        + ", ".join(f"{rule_id} {count} 件" for rule_id, count in counts.most_common())
+    )
+
+
+def run_fix(start_yyyymm, end_yyyymm, batch=False, input_dir="input", dry_run=False):
+    """fix コマンドの本体 (引数は main.py の fix コマンドのオプションと同じ)"""
+    input_dir = os.path.abspath(input_dir)
+    excel_files = find_excel_files(input_dir)
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+    if not batch:
+        excel_files = excel_files[:1]
+
+    output_dir = os.path.abspath("output")
+    if not dry_run:
+        os.makedirs(output_dir, exist_ok=True)
+
+    for input_path in excel_files:
+        output_path = fixed_output_path(input_path, output_dir)
+        try:
+            fixes = fix_workbook(input_path, output_path, start_yyyymm, end_yyyymm, dry_run)
+        except Exception as e:
+            logger.error(f"エラーが発生しました ({input_path}): {e}")
+            continue
+        if not fixes:
+            logger.info(f"{input_path} に自動修正が必要なセルはありません。")
+            continue
+        log_fixes(input_path, fixes)
+        if dry_run:
+            logger.info("--dry-run のため、ファイルは出力していません。")
+        else:
+            logger.info(f"修正したブックを {output_path} に出力しました。")
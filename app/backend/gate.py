@@ -0,0 +1,100 @@
+import os
+import time
+from datetime import date, datetime, timedelta
+from logging import getLogger
+
+from util.batch import find_excel_files
+from util.calendar_index import DAYS_PER_WEEK, build_calendar_index
+from util.findings import LogFindingSink, missing_sheet_finding
+from util.rules import DEFAULT_PLAN
+from util.xlsx_reader import StreamingWorkbook
+
+logger = getLogger()
+
+# gate コマンドの終了コード
+EXIT_PASSED = 0
+EXIT_FAILED = 1  # 違反・不足しているシートがある
+EXIT_UNREADABLE = 2  # ブックが見つからない・読み込めない
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y%m%d")
+
+
+def parse_gate_date(value):
+    """--date の値 (YYYY-MM-DD / YYYY/MM/DD / YYYYMMDD) を date に変換"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"日付の形式が正しくありません: {value} (YYYY-MM-DD で指定してください)")
+
+
+def gate_sheet_names(weeks=1, target_date=None):
+    """target_date (省略時は今日) を含む週までの直近 weeks 週分のシート名を、古い順に返す"""
+    target_date = target_date or date.today()
+    last_monday = target_date - timedelta(days=target_date.weekday())
+    sheet_names = []
+    for offset in reversed(range(weeks)):
+        monday = last_monday - timedelta(days=offset * DAYS_PER_WEEK)
+        sunday = monday + timedelta(days=DAYS_PER_WEEK - 1)
+        sheet_names.append(f"{monday:%Y%m%d}_{sunday:%Y%m%d}")
+    return sheet_names
+
+
+def gate_workbook(input_path, sheet_names, fail_fast=False, max_errors=0, sink=None):
+    """
+    sheet_names のシートの XML パートだけを読んでチェックし、違反を sink (省略時はログ) に書き出す。
+    fail_fast では違反のあったシートで、max_errors を指定すると違反の件数がそれに達したシートで打ち切る。
+    戻り値は (違反の件数, 確認したシート数)。
+    """
+    if sink is None:
+        sink = LogFindingSink()
+    calendar = build_calendar_index(sheet_names[0][:6], sheet_names[-1][:6])
+    errors = 0
+    checked = 0
+    with StreamingWorkbook(input_path) as wb:
+        existing_sheets = set(wb.sheetnames)
+        for sheet_name in sheet_names:
+            if sheet_name in existing_sheets:
+                ws = wb.read_cells(sheet_name, DEFAULT_PLAN.addresses)
+                findings = DEFAULT_PLAN.run(ws, sheet_name, calendar.week(sheet_name))
+            else:
+                findings = [missing_sheet_finding(sheet_name)]
+            sink.write(str(input_path), findings)
+            checked += 1
+            errors += len(findings)
+            if (fail_fast and errors) or (max_errors and errors >= max_errors):
+                break
+    return errors, checked
+
+
+def run_gate(weeks=1, date_value=None, input_dir="input", fail_fast=False, max_errors=0):
+    """
+    gate コマンドの本体。直近の週 (または指定日を含む週) のシートだけをチェックし、終了コードを返す。
+    """
+    started = time.perf_counter()
+    try:
+        target_date = parse_gate_date(date_value) if date_value else None
+    except ValueError as e:
+        logger.error(str(e))
+        return EXIT_UNREADABLE
+    excel_files = find_excel_files(os.path.abspath(input_dir))
+    if not excel_files:
+        logger.error("input フォルダに Excel ファイルが見つかりません。")
+        return EXIT_UNREADABLE
+
+    input_path = excel_files[0]
+    sheet_names = gate_sheet_names(max(weeks, 1), target_date)
+    try:
+        errors, checked = gate_workbook(input_path, sheet_names, fail_fast, max_errors)
+    except Exception as e:
+        logger.error(f"ブックを読み込めません ({input_path}): {e}")
+        return EXIT_UNREADABLE
+    elapsed = (time.perf_counter() - started) * 1000
+
+    stopped = f" (違反が見つかったため残り {len(sheet_names) - checked} シートは確認していません)" if checked < len(sheet_names) else ""
+    if errors:
+        logger.warning(f"ゲート NG: {checked} / {len(sheet_names)} シートで違反が {errors} 件あります{stopped} ({elapsed:.0f} ms)。")
+        return EXIT_FAILED
+    logger.info(f"ゲート OK: {sheet_names[0]} 〜 {sheet_names[-1]} の {checked} シートに違反はありません ({elapsed:.0f} ms)。")
+    return EXIT_PASSED
@@ -0,0 +1,139 @@
+import csv
+import os
+import time
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+
+from util.batch import find_excel_files
+from util.calendar_index import build_calendar_index
+from util.check_cache import shared_refs_match, sheet_digest
+from util.findings import finding_record
+from util.formula_eval import FormulaEvaluator
+from util.profiler import FILE_SCOPE, SHEET_SCOPE, phase
+from util.report_index import DEFAULT_INDEX_PATH, REPORTS, ReportIndex
+from util.rules import DEFAULT_PLAN, SHEET_NAME_PATTERN, parse_sheet_name
+from util.xlsx_reader import StreamingWorkbook
+
+logger = getLogger()
+
+# 索引に入れる各日のセル: {日 (月曜 = 0): セル番地}
+DATE_CELLS = {0: "H10", **{rule.day: rule.cell for rule in DEFAULT_PLAN.rules if rule.rule_id == "h_formula"}}
+ENTRY_CELLS = {rule.day: rule.cell for rule in DEFAULT_PLAN.rules if rule.rule_id == "c_required"}
+
+
+def _iso_date(value):
+    return value.date().isoformat() if isinstance(value, datetime) else None
+
+
+def sheet_entries(ws, values, week):
+    """1 シート分の (日, 日付, H 列の日付, C 列の入力内容, 土日・祝日か) の一覧"""
+    evaluator = FormulaEvaluator(values)
+    entries = []
+    for day, entry_cell in sorted(ENTRY_CELLS.items()):
+        entry = ws[entry_cell].value
+        entries.append((
+            day,
+            week.dates[day].isoformat() if week is not None else None,
+            _iso_date(evaluator.evaluate(DATE_CELLS[day])),
+            None if entry is None else str(entry),
+            int(week.day_off[day]) if week is not None else None,
+        ))
+    return entries
+
+
+def index_workbook(index, input_path):
+    """
+    1 つのブックの YYYYMMDD_YYYYMMDD 形式のシートを索引に入れる (存在しない日付のシート名は警告を出して除く)。
+    ダイジェストと参照していた共有文字列が前回と同じシートは読み直さない。
+    戻り値は (更新したシート数, 変更がなかったシート数)。
+    """
+    with phase(FILE_SCOPE, file=str(input_path)), StreamingWorkbook(input_path) as wb, index.transaction():
+        sheets = []
+        for sheet_name in wb.sheetnames:
+            if parse_sheet_name(sheet_name) is not None:
+                sheets.append(sheet_name)
+            elif SHEET_NAME_PATTERN.match(sheet_name):
+                # 形式は合っているが存在しない日付のシートだけを除き、他のシートは索引に入れる
+                logger.warning(f"{input_path}: シート {sheet_name} は存在しない日付のため索引に入れません。")
+        file_id = index.file_id(os.path.abspath(input_path), Path(input_path).stem)
+        states = index.sheet_states(file_id)
+        shared_strings_changed = index.shared_strings_digest(file_id) != wb.shared_strings_digest
+
+        pending = []
+        for sheet_name in sheets:
+            state = states.get(sheet_name)
+            if (
+                state is not None
+                and state[0] == sheet_digest(wb, sheet_name)
+                and (not shared_strings_changed or shared_refs_match(wb, state[1]))
+            ):
+                continue
+            pending.append(sheet_name)
+
+        if pending:
+            # シート名の月曜日の年月の範囲で暦を作る (範囲外・月曜始まりでないシートは week が None)
+            months = [sheet_name[:6] for sheet_name in sheets]
+            calendar = build_calendar_index(min(months), max(months))
+        for sheet_name in pending:
+            with phase(SHEET_SCOPE, sheet=sheet_name):
+                week = calendar.week(sheet_name)
+                ws = wb.read_cells(sheet_name, DEFAULT_PLAN.addresses)
+                findings = DEFAULT_PLAN.run(ws, sheet_name, week)
+                with phase("index.write"):
+                    index.replace_sheet(
+                        file_id,
+                        sheet_name,
+                        sheet_digest(wb, sheet_name),
+                        {str(number): text for number, text in ws.shared_refs.items()},
+                        week.dates[0].isoformat() if week is not None else None,
+                        sheet_entries(ws, DEFAULT_PLAN.read(ws), week),
+                        [finding_record(str(input_path), finding) for finding in findings],
+                    )
+
+        existing_sheets = set(sheets)
+        index.remove_sheets(file_id, [sheet_name for sheet_name in states if sheet_name not in existing_sheets])
+        index.set_shared_strings_digest(file_id, wb.shared_strings_digest)
+    return len(pending), len(sheets) - len(pending)
+
+
+def run_index(input_dir="input", recursive=False, db_path=None):
+    """index コマンドの本体: input フォルダ内のすべてのブックを索引に入れる (変更のないシートは読み直さない)"""
+    input_dir = os.path.abspath(input_dir)
+    excel_files = find_excel_files(input_dir, recursive=recursive)
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+
+    started = time.perf_counter()
+    updated = unchanged = 0
+    with ReportIndex(db_path or DEFAULT_INDEX_PATH) as index:
+        for input_path in excel_files:
+            try:
+                file_updated, file_unchanged = index_workbook(index, input_path)
+            except Exception as e:
+                logger.error(f"エラーが発生しました ({input_path}): {e}")
+                continue
+            updated += file_updated
+            unchanged += file_unchanged
+        path = index.path
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(
+        f"{len(excel_files)} ファイルを索引に入れました: {updated} シートを更新、{unchanged} シートは変更なし "
+        f"({elapsed:.0f} ms, {path})"
+    )
+
+
+def run_report(name, db_path=None, out=None):
+    """report コマンドの本体: 索引に対して定型のレポートを実行し、表を出力する (out を指定すると CSV にも書き出す)"""
+    started = time.perf_counter()
+    with ReportIndex(db_path or DEFAULT_INDEX_PATH) as index:
+        columns, rows = index.report(name)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if out:
+        with open(out, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+    lines = [" | ".join(columns)] + [" | ".join("" if value is None else str(value) for value in row) for row in rows]
+    logger.info(f"{REPORTS[name][0]} ({len(rows)} 件, {elapsed:.1f} ms):\n" + "\n".join(lines))
@@ -0,0 +1,109 @@
+import os
+import time
+from contextlib import ExitStack
+from logging import getLogger
+
+from backend.check import check_workbook
+from backend.cut import cut_output_path, generate_expected_sheet_names
+from util.batch import find_excel_files
+from util.check_cache import DEFAULT_MAX_ENTRIES, CheckCache
+from util.profiler import FILE_SCOPE, phase
+from util.xlsx_package import XlsxPackage, replacing_file
+from util.xlsx_reader import StreamingWorkbook
+from util.xlsx_views import view_transforms
+
+logger = getLogger()
+
+STEP_CHECK = "check"
+STEP_CUT = "cut"
+STEP_MOVE_A1 = "move_a1"
+STEP_SET_ZOOM = "set_zoom"
+
+# パイプラインで実行できるステップ (指定した順番に関係なく、この順番で実行する)
+PIPELINE_STEPS = (STEP_CHECK, STEP_CUT, STEP_MOVE_A1, STEP_SET_ZOOM)
+
+
+def parse_steps(value):
+    """--steps の値 (カンマ区切り) を、実行する順番に並べたステップのタプルに変換"""
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = sorted(names - set(PIPELINE_STEPS))
+    if unknown:
+        raise ValueError(f"不明なステップです: {', '.join(unknown)} (指定できるのは {', '.join(PIPELINE_STEPS)})")
+    if not names:
+        raise ValueError("ステップを 1 つ以上指定してください。")
+    return tuple(step for step in PIPELINE_STEPS if step in names)
+
+
+def run_pipeline(start_yyyymm, end_yyyymm, steps=PIPELINE_STEPS, zoom=100, input_dir="input", use_cache=True):
+    """
+    pipeline コマンドの本体: input フォルダの最初のブックを 1 度だけ開き、steps のステップを続けて実行する。
+
+    - check: 開いている zip をそのまま使ってチェックする (check コマンドと同じ結果)
+    - cut: 指定範囲のシートを output フォルダに抽出する。move_a1 / set_zoom も指定されていれば、
+      抽出と同時に抽出後のシートの表示設定を書き換え、1 回の書き出しで出力する
+    - move_a1 / set_zoom (cut なし): 元のブックの表示設定を 1 回の書き換えでまとめて変更し、上書き保存する
+    """
+    excel_files = find_excel_files(os.path.abspath(input_dir))
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+    input_path = excel_files[0]
+    move_a1 = STEP_MOVE_A1 in steps
+    zoom = zoom if STEP_SET_ZOOM in steps else None
+    update_views = move_a1 or zoom is not None
+
+    # cut なしで表示設定を変える場合は元のブックを上書きする。書き換えは同じフォルダの一時ファイルに行い、
+    # ブックを閉じてから (ExitStack を抜けるときに) アクセス権を保ったまま置き換える
+    in_place = update_views and STEP_CUT not in steps
+
+    timings = []
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            tmp_path = stack.enter_context(replacing_file(input_path)) if in_place else None
+            stack.enter_context(phase(FILE_SCOPE, file=input_path))
+            package = stack.enter_context(XlsxPackage(input_path))
+            if STEP_CHECK in steps:
+                step_started = time.perf_counter()
+                cache = CheckCache(max_entries=DEFAULT_MAX_ENTRIES) if use_cache else None
+                with phase("pipeline.check"), StreamingWorkbook(input_path, archive=package.archive) as wb:
+                    summary = check_workbook(input_path, start_yyyymm, end_yyyymm, cache=cache, workbook=wb)
+                if cache is not None:
+                    cache.save()
+                logger.info(
+                    f"チェック: {summary['checked_sheets']} シート中 {summary['error_sheets']} シートに違反があります "
+                    f"(不足 {summary['missing_sheets']} シート・不正なシート名 {summary['extra_sheets']} シート)。"
+                )
+                timings.append((STEP_CHECK, time.perf_counter() - step_started))
+
+            step_started = time.perf_counter()
+            output_steps = [step for step in steps if step != STEP_CHECK]
+            if STEP_CUT in steps:
+                output_dir = os.path.abspath("output")
+                os.makedirs(output_dir, exist_ok=True)
+                output_path = cut_output_path(start_yyyymm, end_yyyymm, output_dir)
+                sheet_names = generate_expected_sheet_names(start_yyyymm, end_yyyymm)
+                transforms = view_transforms(package, move_a1, zoom, sheet_names=sheet_names) if update_views else None
+                with phase("pipeline.extract"):
+                    copied = package.extract(sheet_names, output_path, transforms)
+                if copied:
+                    logger.info(f"抽出したシートを {output_path} に出力しました。({len(copied)} シート)")
+                else:
+                    logger.warning("指定範囲に該当するシートがありませんでした。")
+            elif in_place:
+                with phase("pipeline.rewrite"):
+                    package.rewrite(tmp_path, view_transforms(package, move_a1, zoom))
+            if output_steps:
+                timings.append(("+".join(output_steps), time.perf_counter() - step_started))
+
+        if in_place:
+            logger.info(f"{input_path} の表示設定を変更して保存しました。")
+    except Exception as e:
+        logger.error(f"エラーが発生しました ({input_path}): {e}")
+        return
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "パイプライン完了: "
+        + " / ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings)
+        + f" (合計 {elapsed * 1000:.0f} ms)"
+    )
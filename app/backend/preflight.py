@@ -0,0 +1,73 @@
+import os
+import time
+from logging import getLogger
+
+from util.batch import find_excel_files
+from util.calendar_index import build_calendar_index
+from util.findings import LogFindingSink, sheet_name_findings
+from util.xlsx_package import XlsxPackage
+
+logger = getLogger()
+
+
+def read_sheet_names(input_path):
+    """
+    xlsx の zip から workbook.xml (とリレーションシップ) だけを読み、シート名をブック内の順番で返す。
+    シートの XML は展開しないため、ファイルの大きさに関わらず数ミリ秒で終わる。
+    """
+    with XlsxPackage(input_path) as package:
+        return package.sheetnames
+
+
+def preflight_workbook(input_path, expected_sheets):
+    """1 つのブックのシート名だけを確認し、シート名の過不足の Finding の一覧を返す"""
+    _, _, findings = sheet_name_findings(read_sheet_names(input_path), expected_sheets)
+    return findings
+
+
+def preflight_files(excel_files, start_yyyymm, end_yyyymm, sink=None):
+    """
+    複数のブックのシート名を確認し、違反を sink (省略時はログ) に書き出す。
+    戻り値はシート名に問題があったファイルのリスト。
+    """
+    if sink is None:
+        sink = LogFindingSink()
+    expected_sheets = build_calendar_index(start_yyyymm, end_yyyymm).sheet_names
+    rejected = []
+    for input_path in excel_files:
+        try:
+            findings = preflight_workbook(input_path, expected_sheets)
+        except Exception as e:
+            # zip や workbook.xml が壊れているファイルも、構造の不正として扱う
+            logger.error(f"ブックを読み込めません ({input_path}): {e}")
+            rejected.append(input_path)
+            continue
+        sink.write(str(input_path), findings)
+        if findings:
+            rejected.append(input_path)
+    return rejected
+
+
+def run_preflight(start_yyyymm, end_yyyymm, batch=False, input_dir="input", recursive=False):
+    """
+    preflight コマンドの本体。シート名に問題があったファイル (読み込めないファイルを含む) の数を返す。
+    """
+    input_dir = os.path.abspath(input_dir)
+    excel_files = find_excel_files(input_dir, recursive=batch and recursive)
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+    if not batch:
+        excel_files = excel_files[:1]
+
+    started = time.perf_counter()
+    rejected = preflight_files(excel_files, start_yyyymm, end_yyyymm, LogFindingSink(input_dir if batch else None))
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if rejected:
+        logger.warning(
+            f"シート名に問題があるファイルが {len(rejected)} / {len(excel_files)} 件あります ({elapsed:.1f} ms):\n"
+            + "\n".join(os.path.relpath(path, input_dir) for path in rejected)
+        )
+    else:
+        logger.info(f"{len(excel_files)} 件のファイルのシート名に問題はありません ({elapsed:.1f} ms)。")
+    return len(rejected)
@@ -0,0 +1,270 @@
+import io
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree.ElementTree import ParseError
+
+from backend.check import check_workbook
+from util.batch import init_worker
+from util.calendar_index import build_calendar_index
+from util.findings import CollectFindingSink, finding_record
+from util.logger import flush_log_summary, log_queue
+
+logger = getLogger()
+
+YYYYMM_PATTERN = re.compile(r"^\d{6}$")
+
+# レイテンシの集計に使う、ルートごとの直近のリクエスト数
+LATENCY_WINDOW = 1000
+DEFAULT_UPLOAD_NAME = "upload.xlsx"
+
+
+def _warm_up():
+    """重いモジュールの読み込みと、今年の祝日データの作成を済ませておく (最初のリクエストを待たせないため)"""
+    import openpyxl  # noqa: F401
+
+    year = date.today().year
+    build_calendar_index(f"{year}01", f"{year}12").holiday_dates
+
+
+def _init_service_worker(level, queue):
+    init_worker(level, queue)
+    _warm_up()
+
+
+def _check_upload_in_worker(data, file_name, start_yyyymm, end_yyyymm):
+    """
+    ワーカープロセスでアップロードされたブック (bytes) をメモリ上のままチェックし、(集計, 違反のレコード) を返す。
+    カレンダー (build_calendar_index) とルールはプロセス内で保持されるため、同じ範囲の 2 回目以降は作り直さない。
+    """
+    sink = CollectFindingSink()
+    summary = check_workbook(io.BytesIO(data), start_yyyymm, end_yyyymm, sink=sink, file_name=file_name)
+    records = [finding_record(file, finding) for file, findings in sink.pop_batches() for finding in findings]
+    return summary, records
+
+
+class LatencyMetrics:
+    """ルートごとのリクエスト数・ステータス・レイテンシ (直近 LATENCY_WINDOW 件の p50 / p95) を集計する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.in_flight = 0
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.latencies = {}
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self, route, status, elapsed_ms):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[route] += 1
+            self.statuses[str(status)] += 1
+            self.latencies.setdefault(route, deque(maxlen=LATENCY_WINDOW)).append(elapsed_ms)
+
+    @staticmethod
+    def _percentile(values, percent):
+        """nearest-rank 法のパーセンタイル (values は昇順)"""
+        return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+    def snapshot(self):
+        with self._lock:
+            latencies = {route: sorted(values) for route, values in self.latencies.items()}
+            snapshot = {
+                "uptime_s": round(time.time() - self.started, 1),
+                "in_flight": self.in_flight,
+                "requests": dict(self.requests),
+                "statuses": dict(self.statuses),
+            }
+        snapshot["latency_ms"] = {
+            route: {
+                "count": len(values),
+                "p50": round(self._percentile(values, 50), 1),
+                "p95": round(self._percentile(values, 95), 1),
+                "max": round(values[-1], 1),
+            }
+            for route, values in latencies.items()
+        }
+        return snapshot
+
+
+class ServiceBusy(Exception):
+    """処理待ちのリクエストが上限に達している"""
+
+
+class CheckService:
+    """
+    チェックを行うプロセスプールと、処理中・待ちのリクエスト数の上限 (max_pending) を管理する。
+    ワーカープロセスはサーバーの起動時に作り、リクエストをまたいで使い回す。
+    """
+
+    def __init__(self, jobs, max_pending, max_upload_bytes):
+        self.jobs = jobs
+        self.max_pending = max_pending
+        self.max_upload_bytes = max_upload_bytes
+        self.metrics = LatencyMetrics()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_service_worker,
+            initargs=(logging.getLogger().level, log_queue()),
+        )
+
+    def warm_up(self):
+        """全ワーカープロセスを起動し、初期化 (モジュールの読み込みなど) が終わるまで待つ"""
+        for future in [self._executor.submit(_warm_up) for _ in range(self.jobs)]:
+            future.result()
+
+    def check(self, data, file_name, start_yyyymm, end_yyyymm):
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy()
+        try:
+            future = self._executor.submit(_check_upload_in_worker, data, file_name, start_yyyymm, end_yyyymm)
+            return future.result()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+
+class CheckRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /check?start=YYYYMM&end=YYYYMM  リクエストボディの xlsx をチェックし、集計と違反を JSON で返す
+    GET  /metrics                        リクエスト数・ステータス・レイテンシ (p50 / p95) を JSON で返す
+    GET  /health                         稼働確認
+    """
+
+    server_version = "DailyReportChecker"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        # http.server の標準エラー出力へのアクセスログは使わず、_handle でまとめて出力する
+        pass
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def _handle(self, method):
+        route = urlsplit(self.path).path
+        started = time.perf_counter()
+        self.service.metrics.begin()
+        status = HTTPStatus.INTERNAL_SERVER_ERROR
+        try:
+            status, body = method(route)
+        except Exception as e:
+            logger.error(f"{self.command} {self.path} でエラーが発生しました: {e}")
+            body = {"error": str(e)}
+        try:
+            self._send_json(status, body)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.service.metrics.end(f"{self.command} {route}", int(status), elapsed_ms)
+            logger.info(f"{self.command} {self.path} {int(status)} {elapsed_ms:.1f} ms")
+            flush_log_summary()
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if self.command == "POST" and status >= HTTPStatus.BAD_REQUEST:
+            # 読み込んでいないリクエストボディが残っている場合があるため、接続を閉じる
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _get(self, route):
+        if route == "/metrics":
+            return HTTPStatus.OK, {"workers": self.service.jobs, "max_pending": self.service.max_pending,
+                                   **self.service.metrics.snapshot()}
+        if route == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+        return HTTPStatus.NOT_FOUND, {"error": f"{route} は存在しません"}
+
+    def _post(self, route):
+        if route != "/check":
+            return HTTPStatus.NOT_FOUND, {"error": f"{route} は存在しません"}
+
+        query = parse_qs(urlsplit(self.path).query)
+        start_yyyymm = (query.get("start") or query.get("start_yyyymm") or [""])[0]
+        end_yyyymm = (query.get("end") or query.get("end_yyyymm") or [""])[0]
+        if not (YYYYMM_PATTERN.match(start_yyyymm) and YYYYMM_PATTERN.match(end_yyyymm)):
+            return HTTPStatus.BAD_REQUEST, {"error": "start と end に YYYYMM 形式の年月を指定してください"}
+        try:
+            # 13 月などの存在しない年月は、ブックを読み込む前にパラメータの誤りとして返す
+            build_calendar_index(start_yyyymm, end_yyyymm)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"start と end の年月が正しくありません: {e}"}
+
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            return HTTPStatus.LENGTH_REQUIRED, {"error": "Content-Length を指定してください"}
+        if int(length) > self.service.max_upload_bytes:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"ファイルが大きすぎます (上限 {self.service.max_upload_bytes} バイト)"}
+        data = self.rfile.read(int(length))
+        if not zipfile.is_zipfile(io.BytesIO(data)):
+            return HTTPStatus.BAD_REQUEST, {"error": "リクエストボディが xlsx ファイルではありません"}
+
+        file_name = (query.get("name") or [unquote(self.headers.get("X-File-Name", ""))])[0] or DEFAULT_UPLOAD_NAME
+        started = time.perf_counter()
+        try:
+            summary, findings = self.service.check(data, file_name, start_yyyymm, end_yyyymm)
+        except ServiceBusy:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "処理待ちのリクエストが多いため受け付けられません"}
+        except (KeyError, ValueError, ParseError, zipfile.BadZipFile) as e:
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {"error": f"ブックを読み込めません: {e}"}
+        return HTTPStatus.OK, {
+            "file": file_name,
+            "start_yyyymm": start_yyyymm,
+            "end_yyyymm": end_yyyymm,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "summary": summary,
+            "findings": findings,
+        }
+
+
+def run_serve(host="127.0.0.1", port=8765, jobs=0, max_pending=0, max_upload_mb=50):
+    """serve コマンドの本体 (引数は main.py の serve コマンドのオプションと同じ)"""
+    jobs = jobs or os.cpu_count() or 1
+    service = CheckService(jobs, max_pending or jobs * 4, max_upload_mb * 1024 * 1024)
+    server = ThreadingHTTPServer((host, port), CheckRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+
+    started = time.perf_counter()
+    service.warm_up()
+    logger.info(
+        f"{jobs} 個のワーカープロセスを起動しました ({(time.perf_counter() - started) * 1000:.0f} ms)。"
+        f"http://{host}:{server.server_address[1]}/ で待ち受けます (Ctrl+C で終了)。"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("サーバーを停止します。")
+    finally:
+        server.server_close()
+        service.close()
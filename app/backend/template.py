@@ -0,0 +1,142 @@
+import os
+import time
+from logging import getLogger
+
+from util.batch import find_excel_files
+from util.calendar_index import build_calendar_index
+from util.findings import open_finding_sinks, sheet_name_findings
+from util.profiler import FILE_SCOPE, SHEET_SCOPE, phase
+from util.rules import parse_sheet_name
+from util.template import DEFAULT_TEMPLATE_PATH, learn_template, load_template, save_template
+from util.xlsx_reader import StreamingWorkbook
+
+logger = getLogger()
+
+
+def _sample_sheets(sheet_names, count):
+    """sheet_names から count 枚 (0 ならすべて) をブック内で均等な間隔で選ぶ"""
+    if not count or count >= len(sheet_names):
+        return list(sheet_names)
+    step = len(sheet_names) / count
+    return [sheet_names[int(index * step)] for index in range(count)]
+
+
+def _sample_calendar(sample_cells):
+    """見本のシートの週をすべて含む CalendarIndex (土日・祝日と入力の有無の対応を調べるため)。見本がなければ None"""
+    if not sample_cells:
+        return None
+    names = sorted(sample.title for sample in sample_cells)
+    return build_calendar_index(names[0][:6], names[-1][9:15])
+
+
+def _read_samples(wb, addresses, samples, exclude=None):
+    """ブックの YYYYMMDD_YYYYMMDD 形式のシート (exclude 以外) から samples 枚 (0 ならすべて) の addresses のセルを読む"""
+    names = [name for name in wb.sheetnames if name != exclude and parse_sheet_name(name) is not None]
+    return [wb.read_cells(name, addresses) for name in _sample_sheets(names, samples)]
+
+
+def run_learn_template(sheet_name, input_dir="input", out=None, samples=0):
+    """
+    learn_template コマンドの本体: input フォルダの最初のブックの sheet_name のシートを参照シートとしてテンプレートを作り、
+    JSON に保存する。固定の値と入力必須のセルの区別には、同じブックの他の週のシート (samples 枚、0 ならすべて) と、
+    input フォルダの他のブックのシート (ブックごとに samples 枚) を使う。
+    """
+    excel_files = find_excel_files(os.path.abspath(input_dir))
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+    input_path = excel_files[0]
+    out = out or DEFAULT_TEMPLATE_PATH
+
+    with phase(FILE_SCOPE, file=input_path), StreamingWorkbook(input_path) as wb:
+        if sheet_name not in wb.sheetnames:
+            raise ValueError(f"シート {sheet_name} が {input_path} にありません。")
+        with phase("template.read_reference"):
+            reference = wb.read_cells(sheet_name, None)
+        with phase("template.read_samples"):
+            sample_cells = _read_samples(wb, reference.addresses, samples, exclude=sheet_name)
+
+    other_workbooks = []
+    for other_path in excel_files[1:]:
+        try:
+            with phase(FILE_SCOPE, file=other_path), StreamingWorkbook(other_path) as wb, phase("template.read_samples"):
+                other_workbooks.append(_read_samples(wb, reference.addresses, samples))
+        except Exception as e:
+            logger.warning(f"{other_path} を読み込めないため、見本に使いません: {e}")
+    if not other_workbooks:
+        logger.warning(
+            "input フォルダのブックが 1 つのため、担当者名などブックの中でだけ同じ値も固定の値になります。"
+            "複数の担当者のブックと比べる場合は、input フォルダに他の担当者のブックも置いて作り直してください。"
+        )
+
+    template = learn_template(
+        reference,
+        sample_cells,
+        source={"file": os.path.basename(input_path)},
+        calendar=_sample_calendar(sample_cells),
+        other_workbooks=other_workbooks,
+    )
+    save_template(template, out)
+    kinds = [cell["kind"] for cell in template["cells"].values()]
+    logger.info(
+        f"シート {sheet_name} (見本 {len(sample_cells)} シート、他のブック {len(other_workbooks)} 件) からテンプレートを作成しました: "
+        + ", ".join(f"{kind} {kinds.count(kind)} セル" for kind in dict.fromkeys(kinds))
+        + f" ({out})"
+    )
+
+
+def diff_workbook(input_path, template, start_yyyymm, end_yyyymm, sink):
+    """
+    1 つのブックの指定範囲のシートをテンプレートと比べ、差分 (Finding) を sink に書き出す。
+    各シートはテンプレートのセルだけを読む。戻り値は (比べたシート数, 差分のあったシート数)。
+    """
+    calendar = build_calendar_index(start_yyyymm, end_yyyymm)
+    checked = differed = 0
+    with phase(FILE_SCOPE, file=str(input_path)), StreamingWorkbook(input_path) as wb:
+        _, _, name_findings = sheet_name_findings(wb.sheetnames, calendar.sheet_names)
+        sink.write(str(input_path), name_findings)
+        existing_sheets = set(wb.sheetnames)
+        for sheet_name in calendar.sheet_names:
+            if sheet_name not in existing_sheets:
+                continue
+            with phase(SHEET_SCOPE, sheet=sheet_name):
+                ws = wb.read_cells(sheet_name, template.addresses)
+                with phase("template.diff"):
+                    findings = template.diff(ws, sheet_name, calendar.week(sheet_name))
+            sink.write(str(input_path), findings)
+            checked += 1
+            differed += bool(findings)
+    return checked, differed
+
+
+def run_diff_template(
+    start_yyyymm,
+    end_yyyymm,
+    template_path=None,
+    batch=False,
+    input_dir="input",
+    findings_out=None,
+    findings_format=None,
+):
+    """diff_template コマンドの本体 (引数は main.py の diff_template コマンドのオプションと同じ)"""
+    input_dir = os.path.abspath(input_dir)
+    excel_files = find_excel_files(input_dir)
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+    if not batch:
+        excel_files = excel_files[:1]
+    template = load_template(template_path or DEFAULT_TEMPLATE_PATH)
+
+    started = time.perf_counter()
+    sinks, finding_summary = open_finding_sinks(findings_out, findings_format, base_dir=input_dir if batch else None)
+    try:
+        for input_path in excel_files:
+            try:
+                checked, differed = diff_workbook(input_path, template, start_yyyymm, end_yyyymm, sinks)
+            except Exception as e:
+                logger.error(f"エラーが発生しました ({input_path}): {e}")
+                continue
+            logger.info(f"{input_path}: {checked} シート中 {differed} シートがテンプレート ({len(template)} セル) と一致しません。")
+    finally:
+        sinks.close()
+    finding_summary.log()
+    logger.info(f"テンプレートとの比較が完了しました ({(time.perf_counter() - started) * 1000:.0f} ms)。")
@@ -0,0 +1,164 @@
+import os
+from functools import partial
+from logging import getLogger
+
+from util.batch import collected_records, find_excel_files, run_in_pool
+from util.xlsx_views import normalize_workbook_views
+
+logger = getLogger()
+
+ENGINE_XML = "xml"
+ENGINE_COM = "com"
+
+
+def _normalize_views_in_worker(file_path, move_a1, zoom):
+    """並列処理用: ワーカープロセスで 1 ブックの表示設定を書き換え、処理したシート数とログを返す"""
+    try:
+        sheet_count = normalize_workbook_views(file_path, move_a1=move_a1, zoom=zoom)
+    except Exception as e:
+        logger.error(f"エラー発生 ({file_path}): {e}")
+        sheet_count = None
+    return sheet_count, collected_records()
+
+
+def normalize_views(excel_files, move_a1=False, zoom=None, jobs=0):
+    """
+    複数のブックの表示設定を書き換える。ファイルが複数あればプロセスプールで並列に処理する。
+    戻り値は {ファイルパス: 処理したシート数 (失敗した場合は None)}。
+    """
+    if len(excel_files) == 1:
+        try:
+            return {excel_files[0]: normalize_workbook_views(excel_files[0], move_a1=move_a1, zoom=zoom)}
+        except Exception as e:
+            logger.error(f"エラー発生 ({excel_files[0]}): {e}")
+            return {excel_files[0]: None}
+
+    results = {}
+    worker = partial(_normalize_views_in_worker, move_a1=move_a1, zoom=zoom)
+    for file_path, (sheet_count, records) in run_in_pool(worker, excel_files, jobs):
+        for level, message in records:
+            logger.log(level, message)
+        results[file_path] = sheet_count
+    return results
+
+
+def run_move_a1(engine=ENGINE_XML, all_files=False, jobs=0):
+    """move_a1 コマンドの本体: 全てのシートのアクティブセルを A1 に移動し、最初のシートをアクティブにして上書き保存する"""
+    input_dir = os.path.abspath("input")
+    excel_files = find_excel_files(input_dir)
+
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+
+    if engine == ENGINE_COM:
+        _move_active_cell_to_a1_com(excel_files[0])
+        return
+
+    if not all_files:
+        excel_files = excel_files[:1]  # 最初に見つかったExcelファイルを処理
+    logger.info(f"処理対象のExcelファイル: {excel_files}")
+
+    for file_path, sheet_count in normalize_views(excel_files, move_a1=True, jobs=jobs).items():
+        if sheet_count is not None:
+            logger.info(f"すべてのシート ({sheet_count} シート) のアクティブセルをA1に移動し、最初のシートをアクティブにして保存しました: {file_path}")
+
+
+def _move_active_cell_to_a1_com(input_path):
+    """Excel を COM で操作してアクティブセルを A1 に移動する (従来方式)"""
+    logger.info(f"処理対象のExcelファイル: {input_path}")
+
+    import win32com.client
+
+    excel = None
+    try:
+        # Excelアプリケーションを起動
+        excel = win32com.client.Dispatch("Excel.Application")
+        excel.Visible = False  # Excelを非表示で実行
+
+        # 指定のExcelファイルを開く
+        wb = excel.Workbooks.Open(input_path)
+
+        # すべてのシートのアクティブセルをA1に設定
+        for sheet in wb.Sheets:
+            sheet.Activate()
+            sheet.Range("A1").Select()
+
+        # **最初のシートをアクティブにする**
+        first_sheet = wb.Sheets(1)  # 1番目のシートを取得
+        first_sheet.Activate()  # アクティブに設定
+
+        # 上書き保存
+        wb.Save()
+        logger.info(f"すべてのシートのアクティブセルをA1に移動し、最初のシートをアクティブにして保存しました: {input_path}")
+
+        # ファイルを閉じる
+        wb.Close(SaveChanges=True)
+
+    except Exception as e:
+        logger.error(f"エラーが発生しました: {e}")
+
+    finally:
+        if excel is not None:
+            excel.Quit()  # Excelアプリケーションを終了
+
+
+def run_set_zoom(zoom=100, engine=ENGINE_XML, jobs=0):
+    """
+    set_zoom コマンドの本体: inputフォルダ内のすべてのExcelファイルのシートの拡大・縮小を指定した倍率に設定する。
+
+    Args:
+        zoom (int): 設定するズーム倍率（デフォルトは 100%）
+    """
+    input_dir = os.path.abspath("input")
+    excel_files = find_excel_files(input_dir)
+    
+    if not excel_files:
+        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+
+    if engine == ENGINE_COM:
+        _set_zoom_com(excel_files, zoom)
+        return
+
+    for file_path, sheet_count in normalize_views(excel_files, zoom=zoom, jobs=jobs).items():
+        if sheet_count is not None:
+            logger.info(f"{file_path} のすべてのシートの拡大・縮小を {zoom}% に設定しました。")
+
+    logger.info("全てのExcelシートのズーム設定が完了しました。")
+
+
+def _set_zoom_com(excel_files, zoom):
+    """Excel を COM で操作して拡大・縮小率を設定する (従来方式)"""
+    import win32com.client
+
+    excel = None
+    try:
+        # Excelアプリケーションの起動
+        excel = win32com.client.Dispatch("Excel.Application")
+        excel.Visible = False  # 非表示で実行
+
+        for file_path in excel_files:
+            try:
+                logger.info(f"処理中: {file_path}")
+                wb = excel.Workbooks.Open(file_path)
+
+                # 各シートをアクティブ化し、その後ズームを設定
+                for sheet in wb.Sheets:
+                    sheet.Activate()  # シートをアクティブ化
+                    excel.ActiveWindow.Zoom = zoom  # ズームを設定
+
+                # 上書き保存
+                wb.Save()
+                wb.Close(SaveChanges=True)
+                logger.info(f"{file_path} のすべてのシートの拡大・縮小を {zoom}% に設定しました。")
+
+            except Exception as e:
+                logger.error(f"エラー発生 ({file_path}): {e}")
+
+        logger.info("全てのExcelシートのズーム設定が完了しました。")
+
+    except Exception as e:
+        logger.error(f"Excel 操作中にエラーが発生しました: {e}")
+
+    finally:
+        if excel is not None:
+            excel.Quit()  # Excelを終了
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import time
+from logging import getLogger
+
+from backend.check import check_sheets
+from util.batch import find_excel_files
+from util.calendar_index import build_calendar_index
+from util.check_cache import CheckCache
+from util.findings import LogFindingSink, sheet_name_findings
+from util.logger import flush_log_summary
+from util.profiler import FILE_SCOPE, phase
+from util.rules import DEFAULT_PLAN
+from util.xlsx_reader import StreamingWorkbook
+
+logger = getLogger()
+
+
+def _file_signature(path):
+    """変更の検出に使う (更新日時, サイズ)。ファイルがなければ None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _content_digest(path):
+    """ファイルの内容のダイジェスト (保存し直しただけで内容が変わっていないブックを再チェックしないため)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class WatchedWorkbook:
+    """監視中のブック 1 つ分の状態"""
+
+    __slots__ = ("signature", "content_digest", "name_findings", "reported")
+
+    def __init__(self):
+        self.signature = None
+        self.content_digest = None
+        self.name_findings = None
+        self.reported = False  # 起動後に 1 度でも全シートの結果を出力したか
+
+
+class WorkbookWatcher:
+    """
+    フォルダ内のブックの更新日時とサイズを一定間隔で確認し、変更されたブックだけを再チェックする。
+
+    変更を検出してから debounce 秒間更新日時とサイズが変わらなくなった時点 (保存が終わった時点) でチェックする。
+    ブック内では CheckCache のシート単位のダイジェスト (シートの XML パートの CRC32) で変更のあったシートだけを
+    チェックし、その違反だけを出力する (起動直後の 1 回目は全シートの違反を出力する)。
+    """
+
+    def __init__(self, input_dir, start_yyyymm, end_yyyymm, recursive=False, debounce=0.5, cache=None, sink=None):
+        self.input_dir = input_dir
+        self.recursive = recursive
+        self.debounce = debounce
+        self.calendar = build_calendar_index(start_yyyymm, end_yyyymm)
+        self.cache = cache or CheckCache()
+        self.sink = sink or LogFindingSink(input_dir)
+        self.workbooks = {}
+        self.pending = {}  # {パス: (検出した (更新日時, サイズ), 最後に変更を検出した時刻)}
+
+    def poll(self, immediate=False):
+        """
+        フォルダを 1 回確認し、保存が終わったブックをチェックする。戻り値はチェックしたブックの数。
+        immediate=True なら変更を検出したブックを待たずにチェックする (起動直後用)。
+        """
+        now = time.monotonic()
+        paths = find_excel_files(self.input_dir, recursive=self.recursive)
+        for path in set(self.workbooks) - set(paths):
+            del self.workbooks[path]
+            self.pending.pop(path, None)
+            logger.info(f"{self._display(path)} が削除されました。")
+
+        for path in paths:
+            signature = _file_signature(path)
+            state = self.workbooks.setdefault(path, WatchedWorkbook())
+            if signature is None or signature == state.signature:
+                self.pending.pop(path, None)
+                continue
+            detected = self.pending.get(path)
+            if detected is None or detected[0] != signature:
+                self.pending[path] = (signature, now)
+
+        checked = 0
+        for path, (signature, changed_at) in list(self.pending.items()):
+            if not immediate and now - changed_at < self.debounce:
+                continue
+            del self.pending[path]
+            self.workbooks[path].signature = signature
+            if self.check(path, None if immediate else changed_at):
+                checked += 1
+        if checked:
+            self.cache.save()
+        return checked
+
+    def check(self, path, changed_at=None):
+        """ブックを再チェックし、変更のあったシートの違反を出力する。内容が変わっていなければ何もせず False を返す"""
+        try:
+            return self._check(path, changed_at)
+        finally:
+            # 同じ警告の省略は再チェックごとに数え直す (直らないままの違反も保存するたびに出力する)
+            flush_log_summary()
+
+    def _check(self, path, changed_at):
+        state = self.workbooks.setdefault(path, WatchedWorkbook())
+        started = time.perf_counter()
+        try:
+            content_digest = _content_digest(path)
+            if content_digest == state.content_digest:
+                return False
+            with phase(FILE_SCOPE, file=path), StreamingWorkbook(path) as wb:
+                rechecked, error_sheets, sheet_count = self._check_workbook(path, wb, state)
+        except Exception as e:
+            # 書き込み途中などで読めない場合は、次に変更を検出したときにもう一度チェックする
+            logger.warning(f"{self._display(path)} を読み込めません (保存中の可能性があります): {e}")
+            return False
+        state.content_digest = content_digest
+        state.reported = True
+
+        elapsed = time.perf_counter() - started
+        latency = f"、保存から {time.monotonic() - changed_at:.2f} 秒" if changed_at is not None else ""
+        logger.info(
+            f"{self._display(path)}: {rechecked} シートをチェックしました "
+            f"(違反のあるシート {error_sheets} / {sheet_count}、{elapsed * 1000:.0f} ms{latency})。"
+        )
+        return True
+
+    def _check_workbook(self, path, wb, state):
+        existing_sheets = set(wb.sheetnames)
+        _, _, name_findings = sheet_name_findings(wb.sheetnames, self.calendar.sheet_names)
+        if not state.reported or name_findings != state.name_findings:
+            self.sink.write(path, name_findings)
+        state.name_findings = name_findings
+
+        sheets = [sheet_name for sheet_name in self.calendar.sheet_names if sheet_name in existing_sheets]
+        get_sheet = lambda sheet_name: wb.read_cells(sheet_name, DEFAULT_PLAN.addresses)
+        rechecked = error_sheets = 0
+        for _, findings, cached in check_sheets(wb, get_sheet, sheets, self.calendar, self.cache):
+            if not cached:
+                rechecked += 1
+            if not cached or not state.reported:
+                self.sink.write(path, findings)
+            error_sheets += bool(findings)
+        return rechecked, error_sheets, len(sheets)
+
+    def _display(self, path):
+        return os.path.relpath(path, self.input_dir)
+
+
+def run_watch(start_yyyymm, end_yyyymm, input_dir="input", recursive=False, interval=0.25, debounce=0.5):
+    """watch コマンドの本体: Ctrl+C で止めるまで input フォルダを監視し、変更されたブックをチェックする"""
+    input_dir = os.path.abspath(input_dir)
+    if not os.path.isdir(input_dir):
+        raise FileNotFoundError(f"フォルダが見つかりません: {input_dir}")
+
+    watcher = WorkbookWatcher(input_dir, start_yyyymm, end_yyyymm, recursive=recursive, debounce=debounce)
+    logger.info(f"{input_dir} を監視しています (Ctrl+C で終了)。")
+    # 起動時にあるブックは待たずにチェックする
+    watcher.poll(immediate=True)
+    try:
+        while True:
+            time.sleep(interval)
+            watcher.poll()
+    except KeyboardInterrupt:
+        logger.info("監視を終了しました。")
+    finally:
+        watcher.cache.save()
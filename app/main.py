@@ -1,425 +1,326 @@
 import typer
 from logging import getLogger
 from util.logger import setup_root_logger
-import openpyxl
-import re
-import os
-import glob
-import win32com.client
-from datetime import datetime, timedelta
-import holidays  # 日本の祝日データを取得するライブラリ (install: `pip install holidays`)
+from enum import Enum
+
+# 各コマンドの処理は backend/ にあり、コマンドの実行時に必要なものだけを読み込む。
+# (openpyxl・holidays・win32com などの読み込みに時間がかかるため、--help や他のコマンドでは読み込まない)
 
 logger = getLogger()
 app = typer.Typer()
 
-def generate_expected_sheet_names(start_yyyymm: str, end_yyyymm: str):
-    """指定された年月の範囲で、各週の月曜始まり・日曜終わりのシート名リストを生成"""
-    expected_sheets = []
-    
-    start_date = datetime.strptime(start_yyyymm, "%Y%m").replace(day=1)
-    end_date = datetime.strptime(end_yyyymm, "%Y%m").replace(day=1)
-    
-    next_month = end_date.month % 12 + 1
-    next_month_year = end_date.year + (1 if next_month == 1 else 0)
-    last_day = datetime(next_month_year, next_month, 1) - timedelta(days=1)
-    
-    current_date = start_date
-
-    while current_date <= last_day:
-        if current_date.weekday() != 0:
-            current_date += timedelta(days=(7 - current_date.weekday()))
-        
-        if current_date > last_day:
-            break
-        
-        sunday = current_date + timedelta(days=6)
-        expected_sheets.append(f"{current_date.strftime('%Y%m%d')}_{sunday.strftime('%Y%m%d')}")
-        
-        current_date += timedelta(days=7)
-
-    return expected_sheets
-
-def check_sheet_dates(ws, sheet_name):
-    """指定シートの H10 〜 H16 に正しい日付・数式が入っているか確認"""
-    match = re.match(r"^(\d{8})_(\d{8})$", sheet_name)
-    if not match:
-        logger.warning(f"シート名が不正です: {sheet_name}")
-        return False
-
-    start_date = datetime.strptime(match.group(1), "%Y%m%d")
-
-    # H10 の日付チェック
-    h10_value = ws["H10"].value
-    if isinstance(h10_value, datetime):
-        h10_date = h10_value
-    else:
-        try:
-            h10_date = datetime.strptime(str(h10_value), "%Y/%m/%d")
-        except ValueError:
-            logger.warning(f"シート {sheet_name} の H10 の値が不正: {h10_value}")
-            return False
-
-    if h10_date != start_date:
-        logger.warning(f"シート {sheet_name} の H10 の値が正しくありません: {h10_date} (期待値: {start_date.strftime('%Y/%m/%d')})")
-        return False
-
-    incorrect_cells = []
-
-   # H11～H16 の数式チェック
-    for i in range(1, 7):
-        cell_ref = f"H{10 + i}"
-        cell_value = ws[cell_ref].value
-        expected_formula = f"=H{9 + i}+1"
-
-        if not isinstance(cell_value, str) or not cell_value.startswith("="):
-            incorrect_cells.append(f"{cell_ref}: 数式が設定されていません (期待値: {expected_formula})")
-        elif cell_value != expected_formula:
-            incorrect_cells.append(f"{cell_ref}: {cell_value} (期待値: {expected_formula})")
-
-    # A列の数式チェック (H10 ～ H16 を参照)
-    for i, h_row in enumerate(range(10, 17)):
-        a_row = 10 + (i * 6)
-        h_ref = f"H{h_row}"
-
-        expected_month_formula = f"=MONTH({h_ref})"
-        expected_day_formula = f"=DAY({h_ref})"
-        expected_text_formula = f'="("&TEXT({h_ref}, "aaa")&")"'
-
-        if ws[f"A{a_row}"].value != expected_month_formula:
-            incorrect_cells.append(f"A{a_row}: 数式が正しくありません (期待値: {expected_month_formula})")
-
-        if ws[f"A{a_row + 1}"].value != expected_day_formula:
-            incorrect_cells.append(f"A{a_row + 1}: 数式が正しくありません (期待値: {expected_day_formula})")
-
-        if ws[f"A{a_row + 2}"].value != expected_text_formula:
-            incorrect_cells.append(f"A{a_row + 2}: 数式が正しくありません (期待値: {expected_text_formula})")
-
-    # B列の固定値チェック (指定セル範囲で完全一致)
-    expected_b_values = {
-        10: "月", 11: "日",
-        16: "月", 17: "日",
-        22: "月", 23: "日",
-        28: "月", 29: "日",
-        34: "月", 35: "日",
-        40: "月", 41: "日",
-        46: "月", 47: "日",
-    }
-
-    for row, expected_value in expected_b_values.items():
-        cell_ref = f"B{row}"
-        actual_value = ws[cell_ref].value
-
-        if actual_value != expected_value:
-            incorrect_cells.append(f"{cell_ref}: 値が正しくありません (期待値: '{expected_value}', 実際: '{actual_value}')")
-
-    if incorrect_cells:
-        logger.warning(f"シート {sheet_name} のセル値が正しくありません:\n" + "\n".join(incorrect_cells))
-        return False
-
-    return True
-
-
-
-def check_daily_report(ws, sheet_name):
-    """ C列(業務内容)に未入力があるかチェック"""
-    required_cells = ["C9", "C15", "C21", "C27", "C33", "C39", "C45"]
-    empty_cells = [cell for cell in required_cells if not ws[cell].value]
-    if empty_cells:
-        logger.warning(f"シート {sheet_name} の日報が入力されていません: {', '.join(empty_cells)}")
-        return False
-    # C39, C45 の値が "休暇" であることをチェック
-    for cell in ["C39", "C45"]:
-        cell_value = str(ws[cell].value).strip()
-        if cell_value in ["休暇"]:
-            logger.warning(f"シート {sheet_name} の {cell} の値が '休暇' ではありません (実際: {repr(cell_value)})")
-            return False
-    return True
-
-
-import holidays
-import logging
-from datetime import datetime
-
-
-def check_specific_entries(ws, sheet_name):
-    """
-    - A57 に `=H14` という数式が入力されているかチェック
-    - F4 に `miracleave株式会社` という文字列が入力されているかチェック
-    - C6 が未入力でないかチェック（数値・文字列含む）
-    """
-    errors = []
 
-    # A57セルのチェック
-    a57_formula = ws["A57"].value
-    if a57_formula != "=H14":
-        errors.append(f"A57: {a57_formula} ('=H14' ではありません)")
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="フェーズ・チェックごとの処理時間とメモリ使用量を計測して最後に出力する"),
+    profile_out: str = typer.Option(None, help="cProfile の結果を pstats 形式で保存するファイル (--profile も有効になる)"),
+):
+    if profile or profile_out:
+        from util.profiler import ProfileSession
 
-    # F4セルのチェック
-    f4_value = ws["F4"].value
-    if f4_value != "miracleave株式会社":
-        errors.append(f"F4: {f4_value} ('miracleave株式会社' ではありません)")
+        session = ProfileSession(profile_out)
+        ctx.call_on_close(session.close)
 
-    # C6セルのチェック（数値や文字列を含め、未入力とする）
-    c6_value = ws["C6"].value
-    if c6_value is None or (isinstance(c6_value, str) and c6_value.strip() == ""):
-        errors.append("C6: 未入力です")
 
-    # エラーがあればログに出力
-    if errors:
-        logger.warning(f"シート {sheet_name} のチェックに失敗しました:\n" + "\n".join(errors))
-        return False
+class FindingsFormat(str, Enum):
+    """check --findings-out の出力形式"""
+    jsonl = "jsonl"
+    csv = "csv"
 
-    return True
 
+class CheckEngine(str, Enum):
+    """check コマンドでブックを読み込む方式"""
+    stream = "stream"  # 必要なセルだけを XML から直接読み込む (デフォルト)
+    openpyxl = "openpyxl"  # openpyxl.load_workbook (read_only) でシートを順に読み込む (従来方式)
 
 
-def check_holiday_entries(ws, sheet_name):
-    """H10〜H16の日付が祝日または土日の場合、C列に「祝日」または「休暇」が入力されているかチェック。
-       平日の場合、「祝日」または「休暇」が入力されていないかチェック。"""
-    jp_holidays = holidays.JP()  # 日本の祝日情報を取得
+@app.command("check")
+def sheet_name_check(
+    start_yyyymm: str,
+    end_yyyymm: str,
+    engine: CheckEngine = typer.Option(CheckEngine.stream, help="ブックの読み込み方式 (stream: 必要なセルのみ / openpyxl: openpyxl でシートを順に読み込む)"),
+    batch: bool = typer.Option(False, "--batch", help="input フォルダ内のすべての Excel ファイルをチェックする"),
+    input_dir: str = typer.Option("input", help="チェック対象のフォルダ"),
+    recursive: bool = typer.Option(False, "--recursive", help="--batch 時にサブフォルダも対象にする"),
+    jobs: int = typer.Option(0, help="--batch 時の並列プロセス数 (0: CPU コア数)"),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", help="変更のないシートは前回のチェック結果を使う"),
+    cache_size: int = typer.Option(None, help="キャッシュに保持するシート数の上限 (省略時は 20000)"),
+    findings_out: str = typer.Option(None, help="違反を 1 件ずつ書き出すファイル (.jsonl / .csv)"),
+    findings_format: FindingsFormat = typer.Option(None, help="--findings-out の形式 (省略時は拡張子から判定)"),
+    preflight: bool = typer.Option(False, "--preflight", help="先にシート名だけを確認し、シートが不足・不正なファイルはセルのチェックを行わない"),
+    sheet_jobs: int = typer.Option(1, help="1 つのブックのシートを分けてチェックする並列プロセス数 (0: CPU コア数、--batch なしの stream のみ)"),
+    max_memory: int = typer.Option(0, help="メモリ使用量の上限 (MB)。超えたらチェックを中断する (0: 上限なし、--batch ではプロセスごと)"),
+):
+    from backend.check import run_check
+    from util.memory import MemoryLimitExceeded
 
-    # H列とC列の対応表
-    check_map = {
-        "H10": "C9",
-        "H11": "C15",
-        "H12": "C21",
-        "H13": "C27",
-        "H14": "C33",
-        "H15": "C39",
-        "H16": "C45",
-    }
+    try:
+        run_check(
+            start_yyyymm,
+            end_yyyymm,
+            engine=engine.value,
+            batch=batch,
+            input_dir=input_dir,
+            recursive=recursive,
+            jobs=jobs,
+            use_cache=use_cache,
+            cache_size=cache_size,
+            findings_out=findings_out,
+            findings_format=findings_format.value if findings_format else None,
+            preflight=preflight,
+            sheet_jobs=sheet_jobs,
+            max_memory=max_memory,
+        )
+    except MemoryLimitExceeded as e:
+        logger.error(str(e))
+        raise typer.Exit(code=3)
+
+
+@app.command("watch")
+def watch_input_folder(
+    start_yyyymm: str,
+    end_yyyymm: str,
+    input_dir: str = typer.Option("input", help="監視するフォルダ"),
+    recursive: bool = typer.Option(False, "--recursive", help="サブフォルダも監視する"),
+    interval: float = typer.Option(0.25, help="フォルダを確認する間隔 (秒)"),
+    debounce: float = typer.Option(0.5, help="ファイルの更新が止まってからチェックするまでの待ち時間 (秒)"),
+):
+    """
+    input フォルダを監視し、保存・追加されたブックをチェックする (Ctrl+C で終了)。
+    ブック内では前回から変更のあったシートだけをチェックし、その違反を出力する。
+    """
+    from backend.watch import run_watch
 
-    incorrect_entries = []
+    run_watch(start_yyyymm, end_yyyymm, input_dir=input_dir, recursive=recursive, interval=interval, debounce=debounce)
 
-    # H10 の日付を取得
-    h10_value = ws["H10"].value
-    if isinstance(h10_value, datetime):
-        h10_date = h10_value  # すでに datetime 型ならそのまま
-    else:
-        try:
-            h10_date = datetime.strptime(str(h10_value), "%Y-%m-%d %H:%M:%S")  # Excel のフォーマットに合わせる
-        except ValueError:
-            logger.warning(f"シート {sheet_name} の H10 の値が不正: {h10_value}")
-            return False  # H10 が不正なら処理を中断
 
-    for h_cell, c_cell in check_map.items():
-        if h_cell == "H10":
-            h_date = h10_date  # H10 はそのまま使用
-        else:
-            day_offset = int(h_cell[1:]) - 10  # H11 → +1, H12 → +2, …
-            h_date = h10_date + timedelta(days=day_offset)
+@app.command("preflight")
+def preflight_check(
+    start_yyyymm: str,
+    end_yyyymm: str,
+    batch: bool = typer.Option(False, "--batch", help="input フォルダ内のすべての Excel ファイルを確認する"),
+    input_dir: str = typer.Option("input", help="確認対象のフォルダ"),
+    recursive: bool = typer.Option(False, "--recursive", help="--batch 時にサブフォルダも対象にする"),
+):
+    """
+    ブックの workbook.xml だけを読み、シートの不足・シート名の不正を確認する (セルは読み込まない)。
+    問題があるファイルがあれば終了コード 1 で終了する。
+    """
+    from backend.preflight import run_preflight
 
-        c_value = ws[c_cell].value
+    if run_preflight(start_yyyymm, end_yyyymm, batch=batch, input_dir=input_dir, recursive=recursive):
+        raise typer.Exit(code=1)
 
-        # 祝日 or 土日チェック
-        is_holiday_or_weekend = (h_date in jp_holidays) or (h_date.weekday() >= 5)
 
-        if is_holiday_or_weekend:
-            if c_value not in ["祝日", "休暇", "休日"]:
-                incorrect_entries.append(f"{c_cell}: {c_value} (祝日・週末なのに '祝日' または '休暇' ではありません)")
-        else:
-            if c_value in ["祝日", "休暇", "休日"]:
-                incorrect_entries.append(f"{c_cell}: {c_value} (平日なのに '祝日' または '休暇' が入力されています)")
+@app.command("gate")
+def pre_submit_gate(
+    weeks: int = typer.Option(1, help="確認する直近の週数 (--date を含む週、省略時は今週まで)"),
+    date: str = typer.Option(None, help="この日付 (YYYY-MM-DD) を含む週のシートを確認する"),
+    input_dir: str = typer.Option("input", help="確認対象のフォルダ (最初のファイルを確認する)"),
+    fail_fast: bool = typer.Option(False, "--fail-fast", help="違反が見つかったシートで確認を打ち切る"),
+    max_errors: int = typer.Option(0, help="違反がこの件数に達したら確認を打ち切る (0: 打ち切らない)"),
+):
+    """
+    提出前の確認用: 直近の週 (または指定日を含む週) のシートだけをチェックする。
+    違反・不足しているシートがあれば終了コード 1、ブックを読み込めなければ終了コード 2 で終了する。
+    """
+    from backend.gate import EXIT_PASSED, run_gate
 
-    if incorrect_entries:
-        logger.warning(f"シート {sheet_name} の日付エントリが不正です:\n" + "\n".join(incorrect_entries))
-        return False
+    exit_code = run_gate(weeks=weeks, date_value=date, input_dir=input_dir, fail_fast=fail_fast, max_errors=max_errors)
+    if exit_code != EXIT_PASSED:
+        raise typer.Exit(code=exit_code)
 
-    return True
 
+@app.command("fix")
+def fix_template_cells(
+    start_yyyymm: str,
+    end_yyyymm: str,
+    batch: bool = typer.Option(False, "--batch", help="input フォルダ内のすべての Excel ファイルを修正する"),
+    input_dir: str = typer.Option("input", help="修正対象のフォルダ"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="修正内容を表示するだけで、ファイルは出力しない"),
+):
+    """
+    テンプレートの数式 (H 列の日付・A 列の月/日/曜日・A57) と固定の文字列 (B 列の 月/日・F4 の会社名) の誤りを修正し、
+    output フォルダに <元のファイル名>_fixed.xlsx として出力する。元のファイルは変更しない。
+    """
+    from backend.fix import run_fix
 
+    run_fix(start_yyyymm, end_yyyymm, batch=batch, input_dir=input_dir, dry_run=dry_run)
 
 
+@app.command("learn_template")
+def learn_sheet_template(
+    sheet_name: str,
+    input_dir: str = typer.Option("input", help="参照シートのあるブックのフォルダ (最初のファイルを使い、他のファイルは見本に使う)"),
+    out: str = typer.Option(None, help="テンプレートの保存先 (省略時は templates/daily_report.json)"),
+    samples: int = typer.Option(0, help="固定の値と入力必須のセルの判別に使う他のシートの数 (他のブックはブックごとの数、0: すべて)"),
+):
+    """
+    正しいことがわかっているシート (SHEET_NAME) から、数式・固定の値・入力必須のセルのテンプレートを作り JSON に保存する。
+    """
+    from backend.template import run_learn_template
 
+    run_learn_template(sheet_name, input_dir=input_dir, out=out, samples=samples)
 
-@app.command("check")
-def sheet_name_check(start_yyyymm: str, end_yyyymm: str):
-    input_dir = os.path.abspath("input")
-    excel_files = glob.glob(os.path.join(input_dir, "*.xlsx"))
-    if not excel_files:
-        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
-    input_path = excel_files[0]
-    wb = openpyxl.load_workbook(f"{input_path}", data_only=False)
-    existing_sheets = {ws.title for ws in wb.worksheets}
-
-    expected_sheets = generate_expected_sheet_names(start_yyyymm, end_yyyymm)
-
-    missing_sheets = [sheet for sheet in expected_sheets if sheet not in existing_sheets]
-    extra_sheets = [sheet for sheet in existing_sheets if not re.match(r'^\d{8}_\d{8}$', sheet)]
-
-    if missing_sheets:
-        logger.warning(f"不足しているシートがあります: {missing_sheets}")
-    else:
-        logger.info("必要なシートはすべて存在しています。")
-
-    if extra_sheets:
-        logger.warning(f"適切ではないシート名が検出されました: {extra_sheets}")
-
-    for sheet_name in expected_sheets:
-        if sheet_name in existing_sheets:
-            ws = wb[sheet_name]
-            check_sheet_dates(ws, sheet_name)
-            check_daily_report(ws, sheet_name)
-            check_holiday_entries(ws, sheet_name)
-            check_specific_entries(ws, sheet_name)
 
-@app.command("cut")
-def cut_out_sheet(start_yyyymm: str, end_yyyymm: str):
+@app.command("diff_template")
+def diff_sheets_with_template(
+    start_yyyymm: str,
+    end_yyyymm: str,
+    template: str = typer.Option(None, help="learn_template で作ったテンプレート (省略時は templates/daily_report.json)"),
+    batch: bool = typer.Option(False, "--batch", help="input フォルダ内のすべての Excel ファイルを比べる"),
+    input_dir: str = typer.Option("input", help="比べる対象のフォルダ"),
+    findings_out: str = typer.Option(None, help="差分を 1 件ずつ書き出すファイル (.jsonl / .csv)"),
+    findings_format: FindingsFormat = typer.Option(None, help="--findings-out の形式 (省略時は拡張子から判定)"),
+):
     """
-    指定した年月範囲に含まれるシートのみを抽出し、新しいExcelファイルとして出力する。
+    指定した年月範囲のシートを learn_template で作ったテンプレートと比べ、一致しないセルを出力する。
     """
-    input_dir = os.path.abspath("input")
-    # inputフォルダ内の最初に見つかった.xlsxファイルを取得
-    excel_files = glob.glob(os.path.join(input_dir, "*.xlsx"))
-    if not excel_files:
-        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
-
-    input_path = excel_files[0]  # 最初のExcelファイルを取得
-    output_dir = os.path.abspath("output")
-    output_filename = os.path.join(output_dir, f"日報_抽出_{start_yyyymm}_{end_yyyymm}.xlsx")
-
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    from backend.template import run_diff_template
+
+    run_diff_template(
+        start_yyyymm,
+        end_yyyymm,
+        template_path=template,
+        batch=batch,
+        input_dir=input_dir,
+        findings_out=findings_out,
+        findings_format=findings_format.value if findings_format else None,
+    )
+
+
+@app.command("serve")
+def serve(
+    host: str = typer.Option("127.0.0.1", help="待ち受けるアドレス"),
+    port: int = typer.Option(8765, help="待ち受けるポート"),
+    jobs: int = typer.Option(0, help="チェックを行うワーカープロセス数 (0: CPU コア数)"),
+    max_pending: int = typer.Option(0, help="処理中・処理待ちのリクエスト数の上限。超えた分は 503 を返す (0: ワーカー数 × 4)"),
+    max_upload_mb: int = typer.Option(50, help="アップロードできるファイルサイズの上限 (MB)"),
+):
+    """
+    チェックを HTTP で受け付けるサービスを起動する。
+    POST /check?start=YYYYMM&end=YYYYMM にブック (xlsx) をボディとして送ると、集計と違反を JSON で返す。
+    GET /metrics でリクエスト数とレイテンシ (p50 / p95) を確認できる。
+    """
+    from backend.serve import run_serve
 
-    try:
-        # Excelアプリケーションの起動
-        excel = win32com.client.Dispatch("Excel.Application")
-        excel.Visible = False  # Excelを非表示で実行
+    run_serve(host=host, port=port, jobs=jobs, max_pending=max_pending, max_upload_mb=max_upload_mb)
 
-        # 元のExcelファイルを開く
-        wb = excel.Workbooks.Open(input_path)
-        
-        # 新規Excelファイルを作成
-        new_wb = excel.Workbooks.Add()
 
-        # 期待されるシート名を取得（昇順でソート）
-        expected_sheets = generate_expected_sheet_names(start_yyyymm, end_yyyymm)
+@app.command("index")
+def build_report_index(
+    input_dir: str = typer.Option("input", help="索引に入れるブックのフォルダ"),
+    recursive: bool = typer.Option(False, "--recursive", help="サブフォルダも対象にする"),
+    db: str = typer.Option(None, help="索引の SQLite ファイル (省略時は cache/report_index.sqlite)"),
+):
+    """
+    input フォルダ内のすべてのブックの各シートの日付・C 列の入力内容・チェック結果を SQLite の索引に入れる。
+    前回から変更のないシートは読み直さない。
+    """
+    from backend.index import run_index
 
-        # シートを順番通りにコピー
-        copied_any = False
+    run_index(input_dir=input_dir, recursive=recursive, db_path=db)
 
-        for sheet_name in expected_sheets:
-            if sheet_name in [sheet.Name for sheet in wb.Sheets]:
-                wb.Sheets(sheet_name).Copy(Before=new_wb.Sheets(1))  # 先頭に追加
-                copied_any = True
 
-        if copied_any:
-            # デフォルトの空シート（Sheet1 など）を削除
-            while new_wb.Sheets.Count > len(expected_sheets):
-                new_wb.Sheets(new_wb.Sheets.Count).Delete()
+class ReportName(str, Enum):
+    """report コマンドで出力する定型のレポート"""
+    missing_entries = "missing-entries"  # C 列が未入力の日がある週
+    leave_days = "leave-days"  # 担当者・年度ごとの休暇の日数
+    findings = "findings"  # 担当者・ルールごとの違反の件数
 
-            # 新規Excelファイルを保存
-            new_wb.SaveAs(output_filename)
-            logger.info(f"抽出したシートを {output_filename} に出力しました。")
-        else:
-            logger.warning("指定範囲に該当するシートがありませんでした。")
 
-        # ファイルを閉じる
-        new_wb.Close(SaveChanges=False)
-        wb.Close(SaveChanges=False)
+@app.command("report")
+def show_report(
+    name: ReportName,
+    db: str = typer.Option(None, help="索引の SQLite ファイル (省略時は cache/report_index.sqlite)"),
+    out: str = typer.Option(None, help="結果を書き出す CSV ファイル"),
+):
+    """
+    index コマンドで作った索引から定型のレポートを出力する (xlsx は読み込まない)。
+    """
+    from backend.index import run_report
 
-    except Exception as e:
-        logger.error(f"エラーが発生しました: {e}")
-    
-    finally:
-        excel.Quit()  # Excelを終了
+    run_report(name.value, db_path=db, out=out)
 
 
+class CutEngine(str, Enum):
+    """cut コマンドでシートを抽出する方式"""
+    zip = "zip"  # xlsx の XML パートを直接コピーする (デフォルト・Excel 不要)
+    com = "com"  # Excel を COM で操作してシートをコピーする (従来方式・Windows のみ)
 
-import os
-import glob
-import win32com.client
-import typer
-from logging import getLogger
 
-@app.command("move_a1")
-def move_active_cell_to_a1():
+@app.command("cut")
+def cut_out_sheet(
+    start_yyyymm: str,
+    end_yyyymm: str,
+    engine: CutEngine = typer.Option(CutEngine.zip, help="抽出方式 (zip: Excel 不要 / com: Excel を操作)"),
+):
     """
-    全てのシートのアクティブセルを A1 に移動し、最初のシートをアクティブにして上書き保存する
+    指定した年月範囲に含まれるシートのみを抽出し、新しいExcelファイルとして出力する。
     """
-    input_dir = os.path.abspath("input")
-    excel_files = glob.glob(os.path.join(input_dir, "*.xlsx"))
+    from backend.cut import run_cut
 
-    if not excel_files:
-        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
+    run_cut(start_yyyymm, end_yyyymm, engine=engine.value)
 
-    input_path = excel_files[0]  # 最初に見つかったExcelファイルを処理
-    logger.info(f"処理対象のExcelファイル: {input_path}")
 
-    try:
-        # Excelアプリケーションを起動
-        excel = win32com.client.Dispatch("Excel.Application")
-        excel.Visible = False  # Excelを非表示で実行
+@app.command("pipeline")
+def run_submission_pipeline(
+    start_yyyymm: str,
+    end_yyyymm: str,
+    steps: str = typer.Option("check,cut,move_a1,set_zoom", help="実行するステップ (カンマ区切り: check, cut, move_a1, set_zoom)"),
+    zoom: int = typer.Option(100, help="set_zoom で設定する拡大・縮小率"),
+    input_dir: str = typer.Option("input", help="対象のフォルダ (最初のファイルを処理する)"),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", help="check で変更のないシートは前回のチェック結果を使う"),
+):
+    """
+    ブックを 1 度だけ開き、check → cut → move_a1 → set_zoom を続けて実行する (Excel 不要)。
+    cut を含む場合は、抽出と表示設定の変更をまとめて 1 回で output フォルダに書き出す (元のブックは変更しない)。
+    """
+    from backend.pipeline import parse_steps, run_pipeline
 
-        # 指定のExcelファイルを開く
-        wb = excel.Workbooks.Open(input_path)
+    try:
+        selected_steps = parse_steps(steps)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--steps")
+    run_pipeline(start_yyyymm, end_yyyymm, steps=selected_steps, zoom=zoom, input_dir=input_dir, use_cache=use_cache)
 
-        # すべてのシートのアクティブセルをA1に設定
-        for sheet in wb.Sheets:
-            sheet.Activate()
-            sheet.Range("A1").Select()
 
-        # **最初のシートをアクティブにする**
-        first_sheet = wb.Sheets(1)  # 1番目のシートを取得
-        first_sheet.Activate()  # アクティブに設定
+class ViewEngine(str, Enum):
+    """move_a1 / set_zoom コマンドでシートの表示設定を変更する方式"""
+    xml = "xml"  # 各シートの <sheetView> を直接書き換える (デフォルト・Excel 不要)
+    com = "com"  # Excel を COM で操作する (従来方式・Windows のみ)
 
-        # 上書き保存
-        wb.Save()
-        logger.info(f"すべてのシートのアクティブセルをA1に移動し、最初のシートをアクティブにして保存しました: {input_path}")
 
-        # ファイルを閉じる
-        wb.Close(SaveChanges=True)
+@app.command("move_a1")
+def move_active_cell_to_a1(
+    engine: ViewEngine = typer.Option(ViewEngine.xml, help="処理方式 (xml: Excel 不要 / com: Excel を操作)"),
+    all_files: bool = typer.Option(False, "--all", help="input フォルダ内のすべての Excel ファイルを処理する (xml のみ)"),
+    jobs: int = typer.Option(0, help="--all 時の並列プロセス数 (0: CPU コア数)"),
+):
+    """
+    全てのシートのアクティブセルを A1 に移動し、最初のシートをアクティブにして上書き保存する
+    """
+    from backend.views import run_move_a1
 
-    except Exception as e:
-        logger.error(f"エラーが発生しました: {e}")
+    run_move_a1(engine=engine.value, all_files=all_files, jobs=jobs)
 
-    finally:
-        excel.Quit()  # Excelアプリケーションを終了
 
 @app.command("set_zoom")
-def set_zoom_to_100(zoom: int = 100):
+def set_zoom_to_100(
+    zoom: int = 100,
+    engine: ViewEngine = typer.Option(ViewEngine.xml, help="処理方式 (xml: Excel 不要 / com: Excel を操作)"),
+    jobs: int = typer.Option(0, help="並列プロセス数 (0: CPU コア数)"),
+):
     """
     inputフォルダ内のすべてのExcelファイルのシートの拡大・縮小を指定した倍率に設定する。
-    
+
     Args:
         zoom (int): 設定するズーム倍率（デフォルトは 100%）
     """
-    input_dir = os.path.abspath("input")
-    excel_files = glob.glob(os.path.join(input_dir, "*.xlsx"))
-    
-    if not excel_files:
-        raise FileNotFoundError("input フォルダに Excel ファイルが見つかりません。")
-
-    try:
-        # Excelアプリケーションの起動
-        excel = win32com.client.Dispatch("Excel.Application")
-        excel.Visible = False  # 非表示で実行
-
-        for file_path in excel_files:
-            try:
-                logger.info(f"処理中: {file_path}")
-                wb = excel.Workbooks.Open(file_path)
-
-                # 各シートをアクティブ化し、その後ズームを設定
-                for sheet in wb.Sheets:
-                    sheet.Activate()  # シートをアクティブ化
-                    excel.ActiveWindow.Zoom = zoom  # ズームを設定
-
-                # 上書き保存
-                wb.Save()
-                wb.Close(SaveChanges=True)
-                logger.info(f"{file_path} のすべてのシートの拡大・縮小を {zoom}% に設定しました。")
-
-            except Exception as e:
-                logger.error(f"エラー発生 ({file_path}): {e}")
-
-        logger.info("全てのExcelシートのズーム設定が完了しました。")
-
-    except Exception as e:
-        logger.error(f"Excel 操作中にエラーが発生しました: {e}")
+    from backend.views import run_set_zoom
 
-    finally:
-        excel.Quit()  # Excelを終了
+    run_set_zoom(zoom=zoom, engine=engine.value, jobs=jobs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+import logging
+import logging.handlers
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from util.logger import log_queue
+
+
+def find_excel_files(input_dir, recursive=False):
+    """input_dir 内の .xlsx を名前順に列挙する (Excel の一時ファイル ~$xxx.xlsx は除外)"""
+    pattern = "**/*.xlsx" if recursive else "*.xlsx"
+    return sorted(
+        str(path) for path in Path(input_dir).glob(pattern)
+        if path.is_file() and not path.name.startswith("~$")
+    )
+
+
+class RecordCollector(logging.Handler):
+    """ワーカープロセス内のログを溜めておき、親プロセスへ返すためのハンドラ"""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+    def pop_records(self):
+        records, self.records = self.records, []
+        return records
+
+
+_collector = None
+_task_prefix = None
+
+
+class _TaskPrefixFilter(logging.Filter):
+    """実行中のタスクの接頭辞 (ファイル名など) をメッセージの先頭に付ける"""
+
+    def filter(self, record):
+        if _task_prefix:
+            record.msg = f"[{_task_prefix}] {record.getMessage()}"
+            record.args = None
+        return True
+
+
+def init_worker(level=logging.DEBUG, queue=None):
+    """
+    ワーカープロセスの初期化。
+    fork で引き継いだファイルハンドラへ複数プロセスから書き込まないよう、root logger のハンドラを差し替える。
+    queue (util/logger.log_queue) があれば QueueHandler で親プロセスのリスナーへ直接送り、
+    なければ RecordCollector に溜めてタスクの結果と一緒に親プロセスへ返す。
+    """
+    global _collector
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    if queue is not None:
+        handler = logging.handlers.QueueHandler(queue)
+    else:
+        handler = _collector = RecordCollector()
+    handler.addFilter(_TaskPrefixFilter())
+    root_logger.addHandler(handler)
+    root_logger.setLevel(level)
+
+
+def collected_records():
+    """このワーカーで直前のタスク中に出力されたログを取り出す (キューで送っている場合は空)"""
+    return _collector.pop_records() if _collector is not None else []
+
+
+def _run_task(func, item, prefix):
+    global _task_prefix
+    _task_prefix = prefix
+    try:
+        return func(item)
+    finally:
+        _task_prefix = None
+
+
+def run_in_pool(func, items, jobs=None, prefix=None):
+    """
+    items の各要素を func(item) でプロセスプールに分配し、完了した順に (item, 結果) を返す。
+    jobs を省略した場合は CPU コア数分のプロセスを使う。
+    prefix (関数) を渡すと、タスク中のログの先頭に [prefix(item)] を付ける。
+    """
+    jobs = jobs or os.cpu_count() or 1
+    initargs = (logging.getLogger().level, log_queue())
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items)) or 1, initializer=init_worker, initargs=initargs) as executor:
+        futures = {
+            executor.submit(_run_task, func, item, prefix(item) if prefix else None): item
+            for item in items
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+from functools import lru_cache
+
+from util.profiler import phase
+
+DAYS_PER_WEEK = 7
+
+
+class Week:
+    """1 シート (月曜始まり・日曜終わりの 1 週間) 分の暦情報"""
+
+    __slots__ = ("sheet_name", "dates", "_calendar", "_day_off")
+
+    def __init__(self, sheet_name, dates, calendar):
+        self.sheet_name = sheet_name
+        self.dates = dates  # 月曜〜日曜の date
+        self._calendar = calendar
+        self._day_off = None
+
+    @property
+    def day_off(self):
+        """各日が土日・祝日かどうか (祝日データは初回参照時に読み込む)"""
+        if self._day_off is None:
+            holiday_dates = self._calendar.holiday_dates
+            self._day_off = tuple(offset >= 5 or day in holiday_dates for offset, day in enumerate(self.dates))
+        return self._day_off
+
+
+class CalendarIndex:
+    """
+    start_yyyymm〜end_yyyymm の範囲の週 (期待されるシート) と、
+    各日の土日・祝日フラグ (初回参照時に計算) をまとめた索引。1 回の実行で 1 度だけ作り、全チェックで共有する。
+    """
+
+    def __init__(self, start_yyyymm: str, end_yyyymm: str):
+        for yyyymm in (start_yyyymm, end_yyyymm):
+            if not (len(yyyymm) == 6 and yyyymm.isdigit() and 1 <= int(yyyymm[4:6]) <= 12):
+                raise ValueError(f"{yyyymm} は YYYYMM 形式の正しい年月ではありません")
+        start_date = date(int(start_yyyymm[:4]), int(start_yyyymm[4:6]), 1)
+        end_year, end_month = int(end_yyyymm[:4]), int(end_yyyymm[4:6])
+        next_month = date(end_year + end_month // 12, end_month % 12 + 1, 1)
+        last_day = next_month - timedelta(days=1)
+
+        # 範囲内で最初の月曜日
+        monday = start_date + timedelta(days=(7 - start_date.weekday()) % 7)
+        week_count = max(0, (last_day - monday).days // DAYS_PER_WEEK + 1)
+
+        last_sunday = monday + timedelta(days=week_count * DAYS_PER_WEEK - 1)
+        self._years = range(monday.year, last_sunday.year + 1)
+        self._holiday_dates = None
+
+        weeks = []
+        for _ in range(week_count):
+            dates = tuple(monday + timedelta(days=offset) for offset in range(DAYS_PER_WEEK))
+            sunday = dates[-1]
+            sheet_name = (
+                f"{monday.year:04d}{monday.month:02d}{monday.day:02d}_"
+                f"{sunday.year:04d}{sunday.month:02d}{sunday.day:02d}"
+            )
+            weeks.append(Week(sheet_name, dates, self))
+            monday += timedelta(days=DAYS_PER_WEEK)
+
+        self.weeks = tuple(weeks)
+        self.sheet_names = [week.sheet_name for week in self.weeks]
+        self._by_name = {week.sheet_name: week for week in self.weeks}
+
+    @property
+    def holiday_dates(self):
+        """
+        範囲内の年の祝日の集合。holidays.JP() の作成とライブラリの読み込みに時間がかかるため、
+        土日・祝日の判定が必要になった時点 (シート名だけを使う cut などでは不要) で 1 度だけ作る。
+        """
+        if self._holiday_dates is None:
+            import holidays  # 日本の祝日データを取得するライブラリ (install: `pip install holidays`)
+
+            with phase("calendar.holidays"):
+                self._holiday_dates = frozenset(holidays.JP(years=self._years))
+        return self._holiday_dates
+
+    def use_holiday_dates(self, holiday_dates):
+        """他のプロセスで作った祝日の集合を使う (ワーカープロセスごとに holidays.JP() を作り直さないため)"""
+        if self._holiday_dates is None:
+            self._holiday_dates = frozenset(holiday_dates)
+
+    def __contains__(self, sheet_name):
+        return sheet_name in self._by_name
+
+    def __len__(self):
+        return len(self.weeks)
+
+    def week(self, sheet_name):
+        """シート名に対応する週。範囲外のシート名なら None"""
+        return self._by_name.get(sheet_name)
+
+
+@lru_cache(maxsize=8)
+def build_calendar_index(start_yyyymm: str, end_yyyymm: str):
+    """範囲ごとに 1 度だけ CalendarIndex を作る"""
+    return CalendarIndex(start_yyyymm, end_yyyymm)
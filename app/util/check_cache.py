@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from dataclasses import asdict
+from datetime import datetime
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+
+from util.rules import RULESET_VERSION, Finding
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / "cache" / "check_cache.json"
+DEFAULT_MAX_ENTRIES = 20000
+
+CACHE_FORMAT_VERSION = 1
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+@lru_cache(maxsize=1)
+def holidays_version():
+    """
+    祝日データ (holidays) のバージョン。キャッシュがすべて使える実行では祝日の判定が不要なため、
+    読み込みに時間がかかる holidays 自体は import せず、インストール済みパッケージの情報から取得する。
+    """
+    try:
+        return metadata.version("holidays")
+    except metadata.PackageNotFoundError:
+        import holidays
+
+        return holidays.__version__
+
+
+def sheet_digest(wb, sheet_name):
+    """
+    シートのチェック結果が変わりうる要素 (ルールのバージョン・祝日データのバージョン・スタイル・シートの XML パート) の
+    ダイジェスト。StreamingWorkbook の zip に記録済みの CRC32 とサイズから求めるため、シートの展開は不要。
+    """
+    return f"{RULESET_VERSION}:{holidays_version()}:{wb.styles_digest}:{wb.part_digest(sheet_name)}"
+
+
+def shared_refs_match(wb, shared_refs):
+    """シートが参照していた共有文字列 {番号: 文字列} が、ブックの共有文字列テーブルでも同じ文字列か"""
+    if not shared_refs:
+        return True
+    shared_strings = wb.shared_strings
+    for index, text in shared_refs.items():
+        index = int(index)
+        if index >= len(shared_strings) or shared_strings[index] != text:
+            return False
+    return True
+
+
+class CheckCache:
+    """
+    シート単位のチェック結果のキャッシュ。
+
+    キーは「ブックのパス + シート名」で、シートの XML パートのダイジェスト・スタイルのダイジェスト・
+    ルールのバージョン・祝日データのバージョンが一致し、かつシートが参照していた共有文字列が
+    変わっていなければ、前回の Finding をそのまま再利用する。
+    エントリ数は max_entries 件までとし、超えた分は最後に使われたのが古いものから削除する。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._entries = None
+        self._updates = {}
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == CACHE_FORMAT_VERSION:
+                    self._entries = data["entries"]
+            except (OSError, ValueError, KeyError):
+                pass
+        return self._entries
+
+    @staticmethod
+    def _key(wb, sheet_name):
+        return f"{os.path.abspath(wb.path)}|{sheet_name}"
+
+    @staticmethod
+    def _digest(wb, sheet_name):
+        return sheet_digest(wb, sheet_name)
+
+    def lookup(self, wb, sheet_name):
+        """キャッシュ済みの Finding の一覧を返す。使えるキャッシュがなければ None"""
+        entry = self.entries.get(self._key(wb, sheet_name))
+        if entry is None or entry["digest"] != self._digest(wb, sheet_name):
+            return None
+        if not shared_refs_match(wb, entry["shared_refs"]):
+            return None
+
+        entry["used"] = time.time()
+        self._updates[self._key(wb, sheet_name)] = entry
+        return [Finding(**finding) for finding in entry["findings"]]
+
+    def store(self, wb, sheet_name, ws, findings):
+        """シートのチェック結果を記録する (save を呼ぶまでファイルには書き込まない)"""
+        key = self._key(wb, sheet_name)
+        entry = {
+            "digest": self._digest(wb, sheet_name),
+            "shared_refs": {str(index): text for index, text in ws.shared_refs.items()},
+            "findings": [asdict(finding) for finding in findings],
+            "used": time.time(),
+        }
+        self.entries[key] = entry
+        self._updates[key] = entry
+
+    def pop_updates(self):
+        """前回取り出してから追加・更新されたエントリ (バッチのワーカーから親プロセスへ返す用)"""
+        updates, self._updates = self._updates, {}
+        return updates
+
+    def merge(self, updates):
+        """他プロセスで追加・更新されたエントリを取り込む"""
+        self.entries.update(updates)
+        self._updates.update(updates)
+
+    def save(self):
+        """上限を超えた古いエントリを削除してファイルに書き込む"""
+        if not self._updates:
+            return
+        entries = self.entries
+        if len(entries) > self.max_entries:
+            newest = sorted(entries.items(), key=lambda item: item[1]["used"], reverse=True)
+            entries = self._entries = dict(newest[:self.max_entries])
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_FORMAT_VERSION, "entries": entries}, f, ensure_ascii=False, default=_json_default)
+        os.replace(tmp_path, self.path)
+        self._updates = {}
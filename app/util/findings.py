@@ -0,0 +1,250 @@
+import csv
+import json
+import os
+from collections import Counter
+from datetime import date, datetime
+from logging import getLogger
+
+from util.logger import FINDING_LINES
+from util.rules import CHECK_TITLES, SHEET_NAME_PATTERN, Finding
+
+logger = getLogger()
+
+# シート名の過不足 (シート単位ではなくブック単位の違反) のチェック名
+SHEET_NAMES_CHECK = "check_sheet_names"
+
+FINDING_FIELDS = ("file", "sheet", "cell", "check", "rule_id", "expected", "actual", "message")
+
+
+def missing_sheet_finding(sheet_name):
+    return Finding(SHEET_NAMES_CHECK, "missing_sheet", sheet_name, "", sheet_name, None, "シートがありません")
+
+
+def invalid_sheet_name_finding(sheet_name):
+    return Finding(SHEET_NAMES_CHECK, "invalid_sheet_name", sheet_name, "", "YYYYMMDD_YYYYMMDD", sheet_name, "シート名が不正です")
+
+
+def sheet_name_findings(existing_sheets, expected_sheets):
+    """
+    シート名の一覧だけで判定できる違反 (期待されるシートの不足・形式が YYYYMMDD_YYYYMMDD でないシート名)。
+    戻り値は (不足しているシート名, 不正なシート名, Finding の一覧)。
+    """
+    existing = set(existing_sheets)
+    missing = [sheet for sheet in expected_sheets if sheet not in existing]
+    invalid = [sheet for sheet in existing_sheets if not SHEET_NAME_PATTERN.match(sheet)]
+    findings = [missing_sheet_finding(sheet) for sheet in missing] + [invalid_sheet_name_finding(sheet) for sheet in invalid]
+    return missing, invalid, findings
+
+
+def _plain(value):
+    """JSON / CSV に書き出せる値に変換"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    return str(value)
+
+
+def finding_record(file, finding):
+    """Finding を 1 件分のレコード (dict) にする"""
+    return {
+        "file": file,
+        "sheet": finding.sheet,
+        "cell": finding.cell,
+        "check": finding.check,
+        "rule_id": finding.rule_id,
+        "expected": _plain(finding.expected),
+        "actual": _plain(finding.actual),
+        "message": finding.message,
+    }
+
+
+def finding_key(finding):
+    """シートをまたいで同じ違反かを判定するキー (チェック・ルール・セル・期待値・実際の値)"""
+    return (finding.check, finding.rule_id, finding.cell, repr(finding.expected), repr(finding.actual))
+
+
+def _finding_line(finding):
+    return f"{finding.cell}: {finding.message}" if finding.cell else finding.message
+
+
+def _findings_by_check(findings):
+    """Finding をチェックごとにまとめる: [(チェック名, Finding の一覧), ...] (CHECK_TITLES の順)"""
+    grouped = [(check, [finding for finding in findings if finding.check == check]) for check in CHECK_TITLES]
+    return [(check, check_findings) for check, check_findings in grouped if check_findings]
+
+
+def format_findings(sheet_name, findings):
+    """Finding をチェックごとにまとめ、従来のログ形式のメッセージにする"""
+    return [
+        f"シート {sheet_name} の{CHECK_TITLES[check]}:\n" + "\n".join(_finding_line(finding) for finding in check_findings)
+        for check, check_findings in _findings_by_check(findings)
+    ]
+
+
+class FindingSink:
+    """
+    チェック結果の出力先。write はブック単位の違反 (シート名の過不足) で 1 回、
+    その後シートごとに 1 回呼ばれ、受け取った Finding をその場で出力する。
+    """
+
+    def write(self, file, findings):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LogFindingSink(FindingSink):
+    """
+    従来どおりの人が読むためのログ出力 (base_dir を指定すると、そこからの相対パスを先頭に付ける)。
+    各行に finding_key を添えて出力し、複数のシートで同じ違反はログのリスナーが 2 シート目以降を省略してまとめる。
+    """
+
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir
+
+    def write(self, file, findings):
+        prefix = f"[{os.path.relpath(file, self.base_dir)}] " if self.base_dir else ""
+        missing = [finding.sheet for finding in findings if finding.rule_id == "missing_sheet"]
+        invalid = [finding.sheet for finding in findings if finding.rule_id == "invalid_sheet_name"]
+        if missing:
+            logger.warning(f"{prefix}不足しているシートがあります: {missing}")
+        if invalid:
+            logger.warning(f"{prefix}適切ではないシート名が検出されました: {invalid}")
+
+        sheet_findings = {}
+        for finding in findings:
+            if finding.check != SHEET_NAMES_CHECK:
+                sheet_findings.setdefault(finding.sheet, []).append(finding)
+        for sheet_name, grouped in sheet_findings.items():
+            for check, check_findings in _findings_by_check(grouped):
+                header = f"{prefix}シート {sheet_name} の{CHECK_TITLES[check]}:"
+                lines = tuple((finding_key(finding), _finding_line(finding)) for finding in check_findings)
+                logger.warning(
+                    header + "\n" + "\n".join(line for _, line in lines),
+                    extra={FINDING_LINES: (f"{prefix}{sheet_name}", header, lines)},
+                )
+
+
+class JsonlFindingSink(FindingSink):
+    """1 行 1 件の JSON (JSON Lines) で出力し、最後に集計を 1 行出力する"""
+
+    def __init__(self, path, summary=None):
+        self._file = open(path, "w", encoding="utf-8")
+        self.summary = summary
+
+    def write(self, file, findings):
+        for finding in findings:
+            record = {"type": "finding", **finding_record(file, finding)}
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self.summary is not None:
+            self._file.write(json.dumps({"type": "summary", **self.summary.as_dict()}, ensure_ascii=False) + "\n")
+        self._file.close()
+
+
+class CsvFindingSink(FindingSink):
+    """1 行 1 件の CSV で出力する (Excel で開けるよう BOM 付き UTF-8)"""
+
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=FINDING_FIELDS)
+        self._writer.writeheader()
+
+    def write(self, file, findings):
+        for finding in findings:
+            self._writer.writerow(finding_record(file, finding))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CollectFindingSink(FindingSink):
+    """write の呼び出しをそのまま溜めておく (ワーカープロセスから親プロセスへ返す用)"""
+
+    def __init__(self):
+        self.batches = []
+
+    def write(self, file, findings):
+        self.batches.append((file, findings))
+
+    def pop_batches(self):
+        batches, self.batches = self.batches, []
+        return batches
+
+
+class FindingSummary(FindingSink):
+    """ルール別・シート別の件数を数えるだけの出力先"""
+
+    def __init__(self):
+        self.by_rule = Counter()
+        self.by_sheet = Counter()
+        self.total = 0
+
+    def write(self, file, findings):
+        for finding in findings:
+            self.by_rule[finding.rule_id] += 1
+            self.by_sheet[(file, finding.sheet)] += 1
+        self.total += len(findings)
+
+    def as_dict(self):
+        return {
+            "total": self.total,
+            "by_rule": dict(self.by_rule.most_common()),
+            "by_sheet": [
+                {"file": file, "sheet": sheet, "count": count}
+                for (file, sheet), count in self.by_sheet.most_common()
+            ],
+        }
+
+    def log(self, top_sheets=20):
+        """集計をログに出力 (シート別は件数の多い順に top_sheets 件まで)"""
+        if not self.total:
+            logger.info("チェック結果: 違反はありませんでした。")
+            return
+        lines = [f"違反 {self.total} 件", "ルール別:"]
+        lines += [f"  {rule_id}: {count}" for rule_id, count in self.by_rule.most_common()]
+        lines.append("シート別:")
+        lines += [
+            f"  {os.path.basename(file)} {sheet}: {count}"
+            for (file, sheet), count in self.by_sheet.most_common(top_sheets)
+        ]
+        if len(self.by_sheet) > top_sheets:
+            lines.append(f"  ... ほか {len(self.by_sheet) - top_sheets} シート")
+        logger.info("チェック結果の集計:\n" + "\n".join(lines))
+
+
+class FindingSinks(FindingSink):
+    """複数の出力先にまとめて書き出す"""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def write(self, file, findings):
+        for sink in self.sinks:
+            sink.write(file, findings)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def open_finding_sinks(findings_out=None, findings_format=None, base_dir=None):
+    """
+    ログ出力・集計と、findings_out が指定されていればファイル出力 (jsonl / csv) をまとめた出力先を作る。
+    戻り値は (FindingSinks, FindingSummary)。
+    """
+    summary = FindingSummary()
+    sinks = [LogFindingSink(base_dir), summary]
+    if findings_out:
+        findings_format = findings_format or ("csv" if findings_out.lower().endswith(".csv") else "jsonl")
+        os.makedirs(os.path.dirname(os.path.abspath(findings_out)), exist_ok=True)
+        if findings_format == "csv":
+            sinks.append(CsvFindingSink(findings_out))
+        else:
+            sinks.append(JsonlFindingSink(findings_out, summary))
+    return FindingSinks(sinks), summary
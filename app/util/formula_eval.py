@@ -0,0 +1,295 @@
+import math
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# Excel (1900 年基準) のシリアル値 0 に当たる日時 (1900/3/1 以降の日付で正しく変換できる)
+EXCEL_EPOCH = datetime(1899, 12, 30)
+# Excel は 1900 年をうるう年として扱い、存在しない 1900/2/29 をシリアル値 60 にしている。
+# これより前 (1〜59) は実際の日付より 1 日ずれるため、変換時に補正する
+EXCEL_LEAP_BUG_SERIAL = 60
+
+# TEXT(日付, "aaa") で使う曜日 (月曜 = 0)
+WEEKDAY_NAMES = "月火水木金土日"
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<string>"(?:[^"]|"")*")
+      | (?P<function>[A-Z][A-Z0-9.]*)\(
+      | (?P<ref>\$?[A-Z]{1,3}\$?[0-9]+)
+      | (?P<number>[0-9]+(?:\.[0-9]*)?)
+      | (?P<operator>[-+*/&(),])
+    )""",
+    re.X,
+)
+
+
+class FormulaError(Exception):
+    """評価できない数式 (対応していない関数・演算、読み込んでいないセルの参照、循環参照など)"""
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise FormulaError(f"解釈できない数式です: ={text}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    テンプレートで使う範囲の数式を構文木 (タプル) に変換する。
+    優先順位は Excel と同じく 単項マイナス > * / > + - > & の順。
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, operator=None):
+        token = self.peek()
+        if token[0] is None or (operator is not None and token != ("operator", operator)):
+            raise FormulaError(f"数式の構文が正しくありません (期待: {operator or '値'})")
+        self.position += 1
+        return token
+
+    def parse(self):
+        tree = self.concat()
+        if self.position != len(self.tokens):
+            raise FormulaError("数式の構文が正しくありません")
+        return tree
+
+    def binary(self, operators, operand):
+        tree = operand()
+        while self.peek()[0] == "operator" and self.peek()[1] in operators:
+            operator = self.take()[1]
+            tree = ("op", operator, tree, operand())
+        return tree
+
+    def concat(self):
+        return self.binary("&", self.additive)
+
+    def additive(self):
+        return self.binary("+-", self.term)
+
+    def term(self):
+        return self.binary("*/", self.unary)
+
+    def unary(self):
+        if self.peek() == ("operator", "-"):
+            self.take()
+            return ("neg", self.unary())
+        if self.peek() == ("operator", "+"):
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "number":
+            return ("value", float(value) if "." in value else int(value))
+        if kind == "string":
+            return ("value", value[1:-1].replace('""', '"'))
+        if kind == "ref":
+            return ("ref", value.replace("$", ""))
+        if kind == "function":
+            args = []
+            if self.peek() != ("operator", ")"):
+                args.append(self.concat())
+                while self.peek() == ("operator", ","):
+                    self.take()
+                    args.append(self.concat())
+            self.take(")")
+            return ("call", value, tuple(args))
+        if (kind, value) == ("operator", "("):
+            tree = self.concat()
+            self.take(")")
+            return tree
+        raise FormulaError(f"数式の構文が正しくありません ({value})")
+
+
+@lru_cache(maxsize=None)
+def compile_formula(text):
+    """数式 (先頭の = を除いた文字列) を構文木に変換する。同じ数式はシートをまたいで使い回す"""
+    return _Parser(_tokenize(text)).parse()
+
+
+def to_serial(value):
+    """日時を Excel のシリアル値に変換 (1900/2/28 以前は Excel と同じく 1 日ずらす)"""
+    serial = (value - EXCEL_EPOCH) / timedelta(days=1)
+    return serial - 1 if serial <= EXCEL_LEAP_BUG_SERIAL else serial
+
+
+def from_serial(value):
+    """Excel のシリアル値を日時に変換 (1〜59 は 1900/1/1〜1900/2/28、60 は存在しないため 1900/3/1 にする)"""
+    return EXCEL_EPOCH + timedelta(days=value + 1 if value < EXCEL_LEAP_BUG_SERIAL else value)
+
+
+def _number(value):
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return to_serial(value)
+    raise FormulaError(f"数値ではありません: {value!r}")
+
+
+def _date_parts(value):
+    """
+    日付 (日時またはシリアル値) の (年, 月, 日, 曜日 (月曜 = 0))。
+    空のセル (0) は Excel と同じく 1900/1/0 (土曜日)、60 は 1900/2/29 (木曜日) とする。
+    """
+    if isinstance(value, datetime):
+        return value.year, value.month, value.day, value.weekday()
+    serial = math.floor(_number(value))
+    if serial < 0:
+        raise FormulaError(f"日付にできない値です: {value!r}")
+    weekday = (serial + 5) % 7  # シリアル値 1 (1900/1/1) は Excel では日曜日
+    if serial == 0:
+        return 1900, 1, 0, weekday
+    if serial == EXCEL_LEAP_BUG_SERIAL:
+        return 1900, 2, 29, weekday
+    date = from_serial(serial)
+    return date.year, date.month, date.day, weekday
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, datetime):
+        value = to_serial(value)
+    if isinstance(value, float):
+        return f"{value:.15g}"
+    return str(value)
+
+
+def _add(left, right):
+    if isinstance(left, datetime) and not isinstance(right, datetime):
+        return left + timedelta(days=_number(right))
+    if isinstance(right, datetime) and not isinstance(left, datetime):
+        return right + timedelta(days=_number(left))
+    return _number(left) + _number(right)
+
+
+def _subtract(left, right):
+    if isinstance(left, datetime) and not isinstance(right, datetime):
+        return left - timedelta(days=_number(right))
+    return _number(left) - _number(right)
+
+
+def _divide(left, right):
+    if _number(right) == 0:
+        raise FormulaError("0 で除算しています")
+    return _number(left) / _number(right)
+
+
+_OPERATORS = {
+    "+": _add,
+    "-": _subtract,
+    "*": lambda left, right: _number(left) * _number(right),
+    "/": _divide,
+    "&": lambda left, right: _text(left) + _text(right),
+}
+
+
+def _text_function(value, number_format):
+    if number_format == "aaa":
+        return WEEKDAY_NAMES[_date_parts(value)[3]]
+    if number_format == "aaaa":
+        return WEEKDAY_NAMES[_date_parts(value)[3]] + "曜日"
+    raise FormulaError(f"TEXT の表示形式 {number_format!r} には対応していません")
+
+
+_FUNCTIONS = {
+    "MONTH": (1, lambda value: _date_parts(value)[1]),
+    "DAY": (1, lambda value: _date_parts(value)[2]),
+    "YEAR": (1, lambda value: _date_parts(value)[0]),
+    "TEXT": (2, _text_function),
+}
+
+
+class FormulaEvaluator:
+    """
+    1 シート分のセルの値 {セル番地: 値} を使って、テンプレートの数式 (=H10+1 の連鎖・MONTH・DAY・
+    TEXT(..., "aaa")・=H14 のような参照) を評価する。各セルの評価結果はメモ化し、同じセルは 1 回だけ計算する。
+    """
+
+    def __init__(self, values):
+        self._values = values
+        self._results = {}
+        self._pending = set()
+
+    def evaluate(self, address):
+        """セルの値を返す。数式なら評価した結果を返し、評価できない数式なら None を返す"""
+        try:
+            return self._cell(address)
+        except FormulaError:
+            return None
+
+    def _cell(self, address):
+        if address in self._results:
+            result = self._results[address]
+            if isinstance(result, FormulaError):
+                raise result
+            return result
+        if address not in self._values:
+            raise FormulaError(f"{address} は読み込んでいないセルです")
+        value = self._values[address]
+        if not (isinstance(value, str) and value.startswith("=")):
+            return value
+        if address in self._pending:
+            raise FormulaError(f"{address} は循環参照しています")
+
+        self._pending.add(address)
+        try:
+            result = self._eval(compile_formula(value[1:]))
+        except FormulaError as e:
+            self._results[address] = e
+            raise
+        finally:
+            self._pending.discard(address)
+        # 空のセルだけを参照する数式 (=H14 など) の結果は 0
+        self._results[address] = 0 if result is None else result
+        return self._results[address]
+
+    def _eval(self, tree):
+        kind = tree[0]
+        if kind == "value":
+            return tree[1]
+        if kind == "ref":
+            return self._cell(tree[1])
+        if kind == "op":
+            return _OPERATORS[tree[1]](self._eval(tree[2]), self._eval(tree[3]))
+        if kind == "neg":
+            return -_number(self._eval(tree[1]))
+        name, args = tree[1], tree[2]
+        if name not in _FUNCTIONS:
+            raise FormulaError(f"関数 {name} には対応していません")
+        arity, function = _FUNCTIONS[name]
+        if len(args) != arity:
+            raise FormulaError(f"関数 {name} の引数の数が正しくありません")
+        return function(*(self._eval(arg) for arg in args))
+
+
+def values_match(computed, cached):
+    """評価結果と、ファイルに保存されている計算結果 (キャッシュ値) が一致するか"""
+    if isinstance(computed, str) or isinstance(cached, str):
+        return _text(computed) == _text(cached)
+    try:
+        return abs(_number(computed) - _number(cached)) < 1e-9
+    except FormulaError:
+        return False
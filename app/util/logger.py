@@ -1,10 +1,128 @@
+import atexit
 import logging
 import logging.handlers
+import multiprocessing
+from collections import Counter
 from pathlib import Path
 
+# リポジトリ直下の logs フォルダ (このファイルは app/util/logger.py)
+LOG_DIR = Path(__file__).resolve().parents[2] / "logs"
+
+# 同じメッセージの繰り返しをまとめる対象のレベル (チェックの違反は WARNING で出力される)
+AGGREGATE_LEVEL = logging.WARNING
+# まとめて出力する、繰り返されたメッセージ・違反の件数の上限
+REPEAT_SUMMARY_LINES = 20
+# 複数のシートで見つかった違反のまとめに、シート名を列挙する数の上限
+REPEAT_SUMMARY_SHEETS = 10
+# 集計中に保持する異なるメッセージ・違反の数の上限 (超えたらその時点でまとめを出力して集計をやり直す)
+MAX_AGGREGATED_MESSAGES = 10000
+
+# 違反のログ (util/findings.py の LogFindingSink) に付く属性の名前。
+# 値は (シート, 見出し, ((違反のキー, 行), ...)) で、違反のキーが同じ行は 2 シート目以降を省略する
+FINDING_LINES = "finding_lines"
+# flush_log_summary がキューに入れる印のレコードの属性名
+_FLUSH_MARKER = "aggregation_flush"
+
+_log_queue = None
+_listener = None
+
+
+class AggregatingQueueListener(logging.handlers.QueueListener):
+    """
+    キューに溜まったログを、別スレッドで全ハンドラ (画面・info.log・error.log) に書き出すリスナー。
+    AGGREGATE_LEVEL 以上のまったく同じメッセージは 1 回のチェックの中では初回だけ出力し、2 回目以降は件数だけを数えて
+    チェックの終わり (flush_log_summary) と停止時にまとめて出力する。
+    違反のログ (FINDING_LINES 付き) はシート名を含むためメッセージでは比べず、同じ違反 (ルール・セル・期待値・実際の値)
+    の行を最初のシートだけで出力し、2 シート目以降は見つかったシート名だけを記録して同じくまとめて出力する。
+    """
+
+    def __init__(self, queue, *handlers):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.repeats = Counter()
+        # {違反のキー: (最初に出力した行, [見つかったシート, ...])}
+        self.finding_sheets = {}
+
+    def handle(self, record):
+        if getattr(record, _FLUSH_MARKER, False):
+            self.flush_summary()
+            return
+        finding_lines = getattr(record, FINDING_LINES, None)
+        if finding_lines is not None:
+            record = self._omit_repeated_findings(record, *finding_lines)
+            if record is not None:
+                super().handle(record)
+            return
+        if record.levelno >= AGGREGATE_LEVEL:
+            key = (record.levelno, record.getMessage())
+            if key in self.repeats:
+                self.repeats[key] += 1
+                return
+            if len(self.repeats) + len(self.finding_sheets) >= MAX_AGGREGATED_MESSAGES:
+                self.flush_summary()
+            self.repeats[key] = 1
+        super().handle(record)
+
+    def _omit_repeated_findings(self, record, sheet, header, lines):
+        """既に他のシートで出力した違反の行を除いたレコードを返す (すべて出力済みなら None)"""
+        new_lines = []
+        for key, line in lines:
+            if key in self.finding_sheets:
+                self.finding_sheets[key][1].append(sheet)
+                continue
+            if len(self.repeats) + len(self.finding_sheets) >= MAX_AGGREGATED_MESSAGES:
+                self.flush_summary()
+            self.finding_sheets[key] = (line, [sheet])
+            new_lines.append(line)
+        if not new_lines:
+            return None
+        if len(new_lines) < len(lines):
+            record.msg = header + "\n" + "\n".join(new_lines)
+            record.args = None
+            record.message = record.msg
+        return record
+
+    def flush_summary(self):
+        """繰り返されたメッセージの件数と、複数のシートで見つかった違反のシートをまとめて出力し、集計をやり直す"""
+        repeated = [(key, count) for key, count in self.repeats.most_common() if count > 1]
+        shared = sorted(
+            (entry for entry in self.finding_sheets.values() if len(entry[1]) > 1),
+            key=lambda entry: -len(entry[1]),
+        )
+        self.repeats = Counter()
+        self.finding_sheets = {}
+        if repeated:
+            lines = [f"  {count} 回: {message.splitlines()[0]}" for (_, message), count in repeated[:REPEAT_SUMMARY_LINES]]
+            if len(repeated) > REPEAT_SUMMARY_LINES:
+                lines.append(f"  ... ほか {len(repeated) - REPEAT_SUMMARY_LINES} 件")
+            self._emit_summary("同じメッセージが繰り返し出力されたため、2 回目以降を省略しました:", lines)
+        if shared:
+            lines = []
+            for line, sheets in shared[:REPEAT_SUMMARY_LINES]:
+                names = ", ".join(sheets[:REPEAT_SUMMARY_SHEETS])
+                if len(sheets) > REPEAT_SUMMARY_SHEETS:
+                    names += f" ほか {len(sheets) - REPEAT_SUMMARY_SHEETS} シート"
+                lines.append(f"  {line} ({len(sheets)} シート: {names})")
+            if len(shared) > REPEAT_SUMMARY_LINES:
+                lines.append(f"  ... ほか {len(shared) - REPEAT_SUMMARY_LINES} 件")
+            self._emit_summary("同じ違反が複数のシートで見つかったため、2 シート目以降を省略しました:", lines)
+
+    def _emit_summary(self, title, lines):
+        summary = logging.makeLogRecord({
+            "name": logging.getLogger().name,
+            "levelno": logging.WARNING,
+            "levelname": logging.getLevelName(logging.WARNING),
+            "msg": title + "\n" + "\n".join(lines),
+        })
+        super().handle(summary)
+
+    def stop(self):
+        super().stop()
+        self.flush_summary()
+
 
 def setup_root_logger(verbose):
     # root loggerの設定
+    global _log_queue, _listener
     rootLogger = logging.getLogger()
 
     rootLogger.setLevel(logging.DEBUG if verbose else logging.INFO)
@@ -12,12 +130,14 @@ def setup_root_logger(verbose):
         "%(asctime)s (%(process)d)[%(levelname)s] %(message)s"
     )
 
+    LOG_DIR.mkdir(exist_ok=True)
+
     streamHandler = logging.StreamHandler()
     streamHandler.setLevel(logging.DEBUG)
     streamHandler.setFormatter(formatter)
 
     appLogHandler = logging.handlers.RotatingFileHandler(
-        Path(__file__) / "../../../logs/info.log",
+        LOG_DIR / "info.log",
         encoding="utf-8",
         maxBytes=5 * 1024 * 1024,
         backupCount=5,
@@ -26,7 +146,7 @@ def setup_root_logger(verbose):
     appLogHandler.setFormatter(formatter)
 
     errorLogHandler = logging.handlers.RotatingFileHandler(
-        Path(__file__) / "../../../logs/error.log",
+        LOG_DIR / "error.log",
         encoding="utf-8",
         maxBytes=5 * 1024 * 1024,
         backupCount=5,
@@ -34,6 +154,35 @@ def setup_root_logger(verbose):
     errorLogHandler.setLevel(logging.WARN)
     errorLogHandler.setFormatter(formatter)
 
-    rootLogger.addHandler(streamHandler)
-    rootLogger.addHandler(appLogHandler)
-    rootLogger.addHandler(errorLogHandler)
+    # ログを出力したスレッド・プロセスでは QueueHandler でキューに入れるだけにし、
+    # 書式化と 3 つのハンドラへの書き込みはリスナーのスレッドで 1 か所にまとめて行う。
+    # キューはワーカープロセス (util/batch.py) からも書き込めるよう multiprocessing.Queue を使う。
+    _log_queue = multiprocessing.Queue(-1)
+    _listener = AggregatingQueueListener(_log_queue, streamHandler, appLogHandler, errorLogHandler)
+    _listener.start()
+    atexit.register(stop_root_logger)
+
+    rootLogger.addHandler(logging.handlers.QueueHandler(_log_queue))
+
+
+def log_queue():
+    """setup_root_logger で作ったログのキュー (未設定なら None)。ワーカープロセスのログの送り先に使う"""
+    return _log_queue
+
+
+def flush_log_summary():
+    """
+    1 回のチェック (check の実行・watch の再チェック・serve のリクエスト) の終わりに呼び、繰り返しをまとめたメッセージの
+    件数を出力して集計をやり直す。次のチェックで同じ違反があれば、もう一度出力される。
+    ログはリスナーのスレッドで順に処理されるため、印のレコードをキューに入れ、それまでのログを書き出した後で行う。
+    """
+    if _listener is not None:
+        _log_queue.put_nowait(logging.makeLogRecord({_FLUSH_MARKER: True}))
+
+
+def stop_root_logger():
+    """キューに残ったログをすべて書き出してリスナーを止める (終了時に自動で呼ばれる)"""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
@@ -0,0 +1,82 @@
+import gc
+import os
+import sys
+
+MB = 1024 * 1024
+
+
+class MemoryLimitExceeded(Exception):
+    """プロセスのメモリ使用量が --max-memory の上限を超えた"""
+
+
+def current_rss():
+    """
+    このプロセスの現在のメモリ使用量 (RSS、バイト)。計測できなければ None。
+    Linux は /proc、Windows は GetProcessMemoryInfo、それ以外は resource の最大 RSS (ピーク値) を使う。
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return None
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS はバイト、それ以外は KiB
+
+
+class MemoryGuard:
+    """
+    メモリ使用量の上限 (max_mb) を確認する。check で超えていればガベージコレクションを行って測り直し、
+    それでも超えていれば MemoryLimitExceeded を送出する。max_mb が 0 / None なら何もしない。
+    """
+
+    def __init__(self, max_mb=None):
+        self.max_mb = max_mb or None
+        self.peak = 0
+
+    def check(self, where):
+        """where (「シート xxx のチェック後」など) はエラーメッセージに含める処理中の箇所"""
+        if self.max_mb is None:
+            return
+        rss = current_rss()
+        if rss is None:
+            self.max_mb = None  # 計測できない環境では確認しない
+            return
+        if rss > self.max_mb * MB:
+            gc.collect()
+            rss = current_rss()
+        self.peak = max(self.peak, rss)
+        if rss > self.max_mb * MB:
+            raise MemoryLimitExceeded(
+                f"メモリ使用量 {rss / MB:.0f} MB が上限 {self.max_mb} MB を超えたため中断しました ({where})。"
+                "--max-memory の値を大きくしてください。"
+            )
@@ -0,0 +1,35 @@
+import posixpath
+from xml.etree.ElementTree import fromstring
+
+# xlsx (OOXML) の名前空間とリレーションシップの種類。
+# openpyxl を読み込まずに使えるよう、zip・XML の操作に必要なものだけをここにまとめる。
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_DOC_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+REL_TYPE_OFFICE_DOCUMENT = "/officeDocument"
+REL_TYPE_STYLES = "/styles"
+REL_TYPE_SHARED_STRINGS = "/sharedStrings"
+
+
+def resolve_target(base_dir, target):
+    """リレーションシップの Target を zip 内のパスに変換"""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def read_rels(archive, part_name):
+    """part に対応する .rels を読み込み、{Id: (Type, zip内パス)} を返す"""
+    base_dir, file_name = posixpath.split(part_name)
+    rels_name = posixpath.join(base_dir, "_rels", f"{file_name}.rels")
+    if rels_name not in archive.NameToInfo:
+        return {}
+
+    rels = {}
+    root = fromstring(archive.read(rels_name))
+    for rel in root.iter(f"{NS_PKG_REL}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        rels[rel.get("Id")] = (rel.get("Type", ""), resolve_target(base_dir, rel.get("Target")))
+    return rels
@@ -0,0 +1,236 @@
+import os
+import time
+import tracemalloc
+from contextlib import nullcontext
+from logging import getLogger
+
+logger = getLogger()
+
+# 計測を有効にしていないときに phase() が返す何もしないコンテキスト
+_NULL_PHASE = nullcontext()
+
+# ファイル単位・シート単位の区切りに使うフェーズ名 (フェーズ別の集計には含めない)
+FILE_SCOPE = "file"
+SHEET_SCOPE = "sheet"
+
+_active = None
+
+
+class PhaseStat:
+    """フェーズごとの集計 (回数・経過時間の合計と最大・メモリ使用量のピーク)"""
+
+    __slots__ = ("count", "total", "max", "peak")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.peak = 0
+
+    def add(self, elapsed, peak, count=1):
+        self.count += count
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.peak = max(self.peak, peak)
+
+    def merge(self, other):
+        self.count += other[0]
+        self.total += other[1]
+        self.max = max(self.max, other[2])
+        self.peak = max(self.peak, other[3])
+
+    def as_tuple(self):
+        return self.count, self.total, self.max, self.peak
+
+
+class _Frame:
+    __slots__ = ("name", "file", "sheet", "start", "start_memory", "peak")
+
+    def __init__(self, name, file, sheet, start_memory):
+        self.name = name
+        self.file = file
+        self.sheet = sheet
+        self.start_memory = start_memory
+        self.peak = start_memory
+        self.start = time.perf_counter()
+
+
+class Profiler:
+    """
+    フェーズごとの経過時間とメモリ使用量のピーク (tracemalloc) を集計する。
+    フェーズは入れ子にでき、file / sheet を指定したフェーズの内側はそのファイル・シートの分として記録する。
+    """
+
+    def __init__(self):
+        self.phases = {}  # {フェーズ名: PhaseStat}
+        self.files = {}  # {ファイル: PhaseStat}
+        self.sheets = {}  # {(ファイル, シート名): PhaseStat}
+        # 他のフェーズの内側ではない (file / sheet の区切りの直下の) フェーズの経過時間の合計。
+        # 入れ子のフェーズは外側のフェーズと重複して数えられるため、フェーズ別の割合はこれに対して求める
+        self.top_level = 0.0
+        self._stack = []
+
+    def _enter(self, name, file, sheet):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            parent = self._stack[-1]
+            parent.peak = max(parent.peak, peak)
+            file = file or parent.file
+            sheet = sheet or parent.sheet
+        # ピークをリセットして、このフェーズの間のピークだけを測る (親のピークは上で引き継いでいる)
+        tracemalloc.reset_peak()
+        self._stack.append(_Frame(name, file, sheet, current))
+
+    def _exit(self):
+        elapsed_end = time.perf_counter()
+        frame = self._stack.pop()
+        _, peak = tracemalloc.get_traced_memory()
+        frame.peak = max(frame.peak, peak)
+        if self._stack:
+            self._stack[-1].peak = max(self._stack[-1].peak, frame.peak)
+
+        elapsed = elapsed_end - frame.start
+        used = frame.peak - frame.start_memory
+        if frame.name == FILE_SCOPE:
+            self.files.setdefault(frame.file, PhaseStat()).add(elapsed, used)
+        elif frame.name == SHEET_SCOPE:
+            self.sheets.setdefault((frame.file, frame.sheet), PhaseStat()).add(elapsed, used)
+        else:
+            self.phases.setdefault(frame.name, PhaseStat()).add(elapsed, used)
+            if all(outer.name in (FILE_SCOPE, SHEET_SCOPE) for outer in self._stack):
+                self.top_level += elapsed
+
+    def phase(self, name, file=None, sheet=None):
+        return _Phase(self, name, file, sheet)
+
+    def pop_stats(self):
+        """集計結果をプロセス間で受け渡せる形で取り出す (ワーカープロセス用)"""
+        stats = (
+            {name: stat.as_tuple() for name, stat in self.phases.items()},
+            {file: stat.as_tuple() for file, stat in self.files.items()},
+            {key: stat.as_tuple() for key, stat in self.sheets.items()},
+            self.top_level,
+        )
+        self.phases, self.files, self.sheets = {}, {}, {}
+        self.top_level = 0.0
+        return stats
+
+    def merge(self, stats):
+        """pop_stats で取り出した集計結果を取り込む"""
+        for target, source in zip((self.phases, self.files, self.sheets), stats[:3]):
+            for key, values in source.items():
+                target.setdefault(key, PhaseStat()).merge(values)
+        self.top_level += stats[3]
+
+    def report(self, top=20):
+        """
+        フェーズ別・ファイル別・シート別に経過時間の長い順に並べた結果をログに出力する。
+        割合はフェーズ別では最も外側のフェーズの経過時間の合計 (top_level)、ファイル別・シート別ではその表の合計に対する割合。
+        """
+        def lines_for(title, items, label, overall=None):
+            ranked = sorted(items, key=lambda item: item[1].total, reverse=True)
+            lines = [f"{title}:", "  経過時間(合計) | 割合 | 回数 | 平均 | 最大 | メモリピーク | " + label]
+            if overall is None:
+                overall = sum(stat.total for _, stat in ranked)
+            overall = overall or 1.0
+            for key, stat in ranked[:top]:
+                lines.append(
+                    f"  {stat.total * 1000:10.1f} ms | {stat.total / overall:6.1%} | {stat.count:5d} | "
+                    f"{stat.total / stat.count * 1000:8.2f} ms | {stat.max * 1000:8.2f} ms | "
+                    f"{stat.peak / 1024:10.1f} KiB | {key}"
+                )
+            if len(ranked) > top:
+                lines.append(f"  ... ほか {len(ranked) - top} 件")
+            return lines
+
+        lines = lines_for("フェーズ別", self.phases.items(), "フェーズ", self.top_level)
+        if self.files:
+            lines += lines_for("ファイル別", self.files.items(), "ファイル")
+        if self.sheets:
+            lines += lines_for(
+                "シート別",
+                ((f"{os.path.basename(file or '')} {sheet}", stat) for (file, sheet), stat in self.sheets.items()),
+                "シート",
+            )
+        logger.info(
+            "プロファイル結果 (メモリピークは各フェーズ内で増えた分、フェーズ別の割合は最も外側のフェーズの合計に対する割合):\n"
+            + "\n".join(lines)
+        )
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "file", "sheet")
+
+    def __init__(self, profiler, name, file, sheet):
+        self.profiler = profiler
+        self.name = name
+        self.file = file
+        self.sheet = sheet
+
+    def __enter__(self):
+        self.profiler._enter(self.name, self.file, self.sheet)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler._exit()
+        return False
+
+
+def phase(name, file=None, sheet=None):
+    """
+    フェーズの計測範囲を表すコンテキストマネージャ。計測が無効なときは何もしない
+    (共通の nullcontext を返すだけなので、計測していないときの負荷はほぼない)。
+    """
+    if _active is None:
+        return _NULL_PHASE
+    return _active.phase(name, file, sheet)
+
+
+def active_profiler():
+    return _active
+
+
+def start_profiling():
+    """計測を開始し、このプロセスで有効な Profiler を返す (ワーカープロセスでも呼ばれる)"""
+    global _active
+    if _active is None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _active = Profiler()
+    return _active
+
+
+def stop_profiling():
+    """計測を終了し、それまで有効だった Profiler を返す"""
+    global _active
+    profiler, _active = _active, None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return profiler
+
+
+class ProfileSession:
+    """
+    --profile / --profile-out で有効にする計測。close() で結果をログに出力し、
+    profile_out が指定されていれば cProfile の結果を pstats 形式で保存する。
+    """
+
+    def __init__(self, profile_out=None):
+        self.profiler = start_profiling()
+        self.profile_out = profile_out
+        self.cprofile = None
+        if profile_out:
+            import cProfile
+
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def close(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            os.makedirs(os.path.dirname(os.path.abspath(self.profile_out)), exist_ok=True)
+            self.cprofile.dump_stats(self.profile_out)
+        stop_profiling()
+        self.profiler.report()
+        if self.cprofile is not None:
+            logger.info(f"cProfile の結果を {self.profile_out} に保存しました。(python -m pstats で確認できます)")
@@ -0,0 +1,196 @@
+import json
+import sqlite3
+from pathlib import Path
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parents[2] / "cache" / "report_index.sqlite"
+
+# テーブルの構成を変更したら上げる (古い索引は作り直す)
+INDEX_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    person TEXT NOT NULL,
+    shared_strings_digest TEXT
+);
+CREATE TABLE IF NOT EXISTS sheets (
+    file_id INTEGER NOT NULL,
+    sheet TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    shared_refs TEXT NOT NULL,
+    start_date TEXT,
+    finding_count INTEGER NOT NULL,
+    PRIMARY KEY (file_id, sheet)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    file_id INTEGER NOT NULL,
+    sheet TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    date TEXT,
+    h_date TEXT,
+    entry TEXT,
+    day_off INTEGER,
+    PRIMARY KEY (file_id, sheet, day)
+);
+CREATE TABLE IF NOT EXISTS findings (
+    file_id INTEGER NOT NULL,
+    sheet TEXT NOT NULL,
+    cell TEXT NOT NULL,
+    check_name TEXT NOT NULL,
+    rule_id TEXT NOT NULL,
+    expected TEXT,
+    actual TEXT,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+CREATE INDEX IF NOT EXISTS findings_sheet ON findings (file_id, sheet);
+CREATE INDEX IF NOT EXISTS findings_rule ON findings (rule_id);
+"""
+
+# 4 月始まりの年度
+_FISCAL_YEAR = (
+    "CAST(strftime('%Y', e.date) AS INTEGER) - (CAST(strftime('%m', e.date) AS INTEGER) < 4)"
+)
+
+# 索引に対する定型のレポート: {名前: (説明, SQL)}
+REPORTS = {
+    "missing-entries": (
+        "C 列 (業務内容) が未入力の日がある週",
+        """
+        SELECT f.person AS 担当者, e.sheet AS シート, COUNT(*) AS 未入力の日数, group_concat(e.date, ' ') AS 日付
+        FROM entries e JOIN files f USING (file_id)
+        WHERE e.entry IS NULL OR trim(e.entry) = ''
+        GROUP BY e.file_id, e.sheet
+        ORDER BY f.person, e.sheet
+        """,
+    ),
+    "leave-days": (
+        "担当者・年度 (4 月始まり) ごとの休暇の日数 (土日・祝日を除く)",
+        f"""
+        SELECT f.person AS 担当者, {_FISCAL_YEAR} AS 年度, COUNT(*) AS 休暇の日数
+        FROM entries e JOIN files f USING (file_id)
+        WHERE trim(e.entry) = '休暇' AND e.day_off = 0
+        GROUP BY f.person, 年度
+        ORDER BY f.person, 年度
+        """,
+    ),
+    "findings": (
+        "担当者・ルールごとの違反の件数",
+        """
+        SELECT f.person AS 担当者, r.check_name AS チェック, r.rule_id AS ルール,
+               COUNT(*) AS 件数, COUNT(DISTINCT r.sheet) AS シート数
+        FROM findings r JOIN files f USING (file_id)
+        GROUP BY f.person, r.check_name, r.rule_id
+        ORDER BY f.person, 件数 DESC
+        """,
+    ),
+}
+
+
+class ReportIndex:
+    """
+    日報の各シートの日付 (H10〜H16)・C 列の入力内容・ルールごとのチェック結果を保持する SQLite の索引。
+
+    シートごとにダイジェスト (CheckCache と同じ sheet_digest) と参照した共有文字列を記録しておき、
+    変更のないシートは読み直さない。レポートは xlsx を開かずに索引に対する SQL だけで作る。
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self._prepare()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _prepare(self):
+        """テーブルを作る。スキーマのバージョンが古ければ作り直す"""
+        connection = self.connection
+        version = None
+        if connection.execute("SELECT name FROM sqlite_master WHERE name = 'meta'").fetchone():
+            row = connection.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            version = row[0] if row else None
+        if version != str(INDEX_SCHEMA_VERSION):
+            for table in ("meta", "files", "sheets", "entries", "findings"):
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+        with connection:
+            connection.executescript(_SCHEMA)
+            connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (str(INDEX_SCHEMA_VERSION),)
+            )
+
+    def transaction(self):
+        """with で囲んだ範囲の更新をまとめてコミットする (例外時はロールバック)"""
+        return self.connection
+
+    def file_id(self, path, person):
+        """ファイルの ID (未登録なら登録する)"""
+        row = self.connection.execute("SELECT file_id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self.connection.execute("INSERT INTO files (path, person) VALUES (?, ?)", (path, person)).lastrowid
+
+    def shared_strings_digest(self, file_id):
+        row = self.connection.execute("SELECT shared_strings_digest FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_shared_strings_digest(self, file_id, digest):
+        self.connection.execute("UPDATE files SET shared_strings_digest = ? WHERE file_id = ?", (digest, file_id))
+
+    def sheet_states(self, file_id):
+        """索引済みのシート: {シート名: (ダイジェスト, 参照した共有文字列 {番号: 文字列})}"""
+        rows = self.connection.execute("SELECT sheet, digest, shared_refs FROM sheets WHERE file_id = ?", (file_id,))
+        return {sheet: (digest, json.loads(shared_refs)) for sheet, digest, shared_refs in rows}
+
+    def replace_sheet(self, file_id, sheet, digest, shared_refs, start_date, entries, findings):
+        """
+        1 シート分の索引を置き換える。
+        entries は (日, 日付, H 列の日付, C 列の入力内容, 土日・祝日か) の一覧、
+        findings は util.findings.finding_record 形式の dict の一覧。
+        """
+        self.remove_sheets(file_id, [sheet])
+        connection = self.connection
+        connection.execute(
+            "INSERT INTO sheets (file_id, sheet, digest, shared_refs, start_date, finding_count) VALUES (?, ?, ?, ?, ?, ?)",
+            (file_id, sheet, digest, json.dumps(shared_refs, ensure_ascii=False), start_date, len(findings)),
+        )
+        connection.executemany(
+            "INSERT INTO entries (file_id, sheet, day, date, h_date, entry, day_off) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(file_id, sheet, *entry) for entry in entries],
+        )
+        connection.executemany(
+            "INSERT INTO findings (file_id, sheet, cell, check_name, rule_id, expected, actual, message)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (file_id, sheet, record["cell"], record["check"], record["rule_id"],
+                 _text(record["expected"]), _text(record["actual"]), record["message"])
+                for record in findings
+            ],
+        )
+
+    def remove_sheets(self, file_id, sheets):
+        for table in ("sheets", "entries", "findings"):
+            self.connection.executemany(
+                f"DELETE FROM {table} WHERE file_id = ? AND sheet = ?", [(file_id, sheet) for sheet in sheets]
+            )
+
+    def report(self, name):
+        """定型のレポートを実行し、(列名, 行の一覧) を返す"""
+        cursor = self.connection.execute(REPORTS[name][1])
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+
+def _text(value):
+    return None if value is None else str(value)
@@ -0,0 +1,343 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from util.formula_eval import FormulaEvaluator, from_serial, values_match
+from util.profiler import phase
+
+# ルールを変更したら上げる (チェック結果のキャッシュを無効にするため)
+RULESET_VERSION = 4
+
+SHEET_NAME_PATTERN = re.compile(r"^(\d{8})_(\d{8})$")
+
+# 休日として扱う C 列の入力値
+DAY_OFF_VALUES = ("祝日", "休暇", "休日")
+
+# テンプレートとの差分 (util.template) のチェック名。DEFAULT_PLAN のルールには含まれない
+TEMPLATE_CHECK = "check_template"
+
+# チェック名 (旧チェック関数名) とログの見出し
+CHECK_TITLES = {
+    "check_sheet_dates": "セル値が正しくありません",
+    "check_daily_report": "日報の入力が正しくありません",
+    "check_holiday_entries": "日付エントリが不正です",
+    "check_specific_entries": "チェックに失敗しました",
+    "check_cached_values": "保存されている計算結果が正しくありません",
+    TEMPLATE_CHECK: "テンプレートと一致しません",
+}
+# DEFAULT_PLAN のチェック名 (check コマンドの集計の列)
+CHECK_NAMES = tuple(check for check in CHECK_TITLES if check != TEMPLATE_CHECK)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    1 セルに対するチェックルール。
+
+    predicate(actual, expected, context) は違反がなければ None、違反があれば説明文
+    (期待値・実際の値をルールの期待値・セルの値と別にする場合は Violation) を返す。
+    同じチェック内では stage の小さいルールから評価し、違反があった時点で以降の stage は評価しない。
+    """
+    rule_id: str
+    check: str
+    cell: str
+    expected: object
+    predicate: Callable
+    stage: int = 0
+    day: int = None  # 週の何日目 (月曜 = 0) のセルか
+
+
+@dataclass(frozen=True)
+class Finding:
+    """ルール違反 1 件"""
+    check: str
+    rule_id: str
+    sheet: str
+    cell: str
+    expected: object
+    actual: object
+    message: str
+
+
+@dataclass(frozen=True)
+class Violation:
+    """判定関数が、ルールの期待値・セルの値とは別の期待値・実際の値を報告するときに返す違反"""
+    message: str
+    expected: object
+    actual: object
+
+
+class SheetContext:
+    """
+    1 シート分の判定に使う値。シート名と H10 はここで一度だけ解析する。
+    week は CalendarIndex の週 (各日の日付と土日・祝日フラグ) で、範囲外のシートでは None。
+    cached は数式セルに保存されている計算結果 {セル番地: 値} で、読み込み方式が対応していなければ None。
+    cell は判定中のルールのセル番地 (CheckPlan が判定関数を呼ぶ前に設定する)。
+    """
+
+    __slots__ = ("sheet_name", "start_date", "h10_date", "values", "week", "cached", "cell", "_evaluator")
+
+    def __init__(self, sheet_name, values, week=None, cached=None):
+        self.sheet_name = sheet_name
+        self.values = values
+        self.week = week
+        self.cached = cached
+        self.cell = None
+        self._evaluator = None
+        dates = parse_sheet_name(sheet_name)
+        self.start_date = dates[0] if dates else None
+        self.h10_date = parse_date(values.get("H10"))
+
+    def evaluate(self, address):
+        """セルの数式を評価した値 (評価できなければ None)。評価結果はシート内で使い回す"""
+        if self._evaluator is None:
+            self._evaluator = FormulaEvaluator(self.values)
+        return self._evaluator.evaluate(address)
+
+
+def parse_sheet_name(sheet_name):
+    """
+    YYYYMMDD_YYYYMMDD 形式のシート名の (開始日, 終了日) の datetime。
+    形式が違う場合や、20240231 のように存在しない日付の場合は None
+    """
+    match = SHEET_NAME_PATTERN.match(sheet_name)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1), "%Y%m%d"), datetime.strptime(match.group(2), "%Y%m%d")
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    """H10 の値を datetime に変換 (日付型・文字列のどちらにも対応)。変換できなければ None"""
+    if isinstance(value, datetime):
+        return value
+    for fmt in ("%Y/%m/%d", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(str(value), fmt)
+        except ValueError:
+            pass
+    return None
+
+
+# ---- 判定関数 ----
+
+def valid_sheet_name(actual, expected, context):
+    if context.start_date is None:
+        return "シート名が不正です"
+
+
+def h10_start_date(actual, expected, context):
+    if context.h10_date is None:
+        return f"値が不正: {actual}"
+    if context.h10_date != context.start_date:
+        return f"値が正しくありません: {context.h10_date} (期待値: {context.start_date.strftime('%Y/%m/%d')})"
+
+
+def formula_chain(actual, expected, context):
+    if not isinstance(actual, str) or not actual.startswith("="):
+        return f"数式が設定されていません (期待値: {expected})"
+    if actual != expected:
+        return f"{actual} (期待値: {expected})"
+
+
+def formula_equals(actual, expected, context):
+    if actual != expected:
+        return f"数式が正しくありません (期待値: {expected})"
+
+
+def value_equals(actual, expected, context):
+    if actual != expected:
+        return f"値が正しくありません (期待値: '{expected}', 実際: '{actual}')"
+
+
+def exact_entry(actual, expected, context):
+    if actual != expected:
+        return f"{actual} ('{expected}' ではありません)"
+
+
+def required(actual, expected, context):
+    # 旧 check_daily_report と同じく偽と評価される値 (None・空文字列・0) を未入力とする
+    if not actual:
+        return "未入力です"
+
+
+def not_leave(actual, expected, context):
+    if str(actual).strip() == expected:
+        return f"値が '{expected}' ではありません (実際: {repr(str(actual).strip())})"
+
+
+def day_off_entry(actual, expected, context):
+    if context.week is None:
+        return None
+    if context.week.day_off[expected]:
+        if actual not in DAY_OFF_VALUES:
+            return f"{actual} (祝日・週末なのに '祝日' または '休暇' ではありません)"
+    elif actual in DAY_OFF_VALUES:
+        return f"{actual} (平日なのに '祝日' または '休暇' が入力されています)"
+
+
+def _display(value):
+    return value.strftime("%Y/%m/%d") if isinstance(value, datetime) else repr(value)
+
+
+def _as_date_like(value, other):
+    """other が日付で value が数値 (Excel の日付のシリアル値) なら、value も日付にして同じ形式で比べられるようにする"""
+    if isinstance(other, datetime) and isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 1:
+        return from_serial(value)
+    return value
+
+
+def cached_value(actual, expected, context):
+    # 判定するセル (context.cell) の数式を評価して、保存されている計算結果と比べる
+    if not isinstance(actual, str) or not actual.startswith("="):
+        return None
+    if context.cached is None or context.cell not in context.cached:
+        return None  # 計算結果が保存されていない (Excel 以外で作ったファイルなど)
+    computed = context.evaluate(context.cell)
+    if computed is None:
+        return None
+    cached = context.cached[context.cell]
+    if not values_match(computed, cached):
+        computed, cached = _as_date_like(computed, cached), _as_date_like(cached, computed)
+        return Violation(
+            f"保存されている値 {_display(cached)} が計算結果 {_display(computed)} と一致しません (再計算されずに保存された可能性があります)",
+            computed,
+            cached,
+        )
+
+
+# ---- ルール定義 ----
+
+# シートごとに 1 つだけのルール: (rule_id, チェック名, セル, 期待値, 判定関数, stage)
+SHEET_RULES = (
+    ("sheet_name", "check_sheet_dates", "", None, valid_sheet_name, 0),
+    ("h10_start_date", "check_sheet_dates", "H10", None, h10_start_date, 1),
+    ("a57_formula", "check_specific_entries", "A57", "=H14", exact_entry, 0),
+    ("f4_company", "check_specific_entries", "F4", "miracleave株式会社", exact_entry, 0),
+    ("c6_required", "check_specific_entries", "C6", None, required, 0),
+    ("a57_cached", "check_cached_values", "A57", None, cached_value, 0),
+)
+
+# 1 日 (H10〜H16 の各行) ごとのルールのテンプレート。
+# {h}: H 列の行, {prev}: 前日の H 列の行, {a}: その日の A/B 列の先頭行, {c}: その日の C 列の行
+DAY_RULES = (
+    ("h_formula", "check_sheet_dates", "H{h}", "=H{prev}+1", formula_chain, 2),
+    ("a_month", "check_sheet_dates", "A{a}", "=MONTH(H{h})", formula_equals, 2),
+    ("a_day", "check_sheet_dates", "A{a1}", "=DAY(H{h})", formula_equals, 2),
+    ("a_weekday", "check_sheet_dates", "A{a2}", '="("&TEXT(H{h}, "aaa")&")"', formula_equals, 2),
+    ("b_month_label", "check_sheet_dates", "B{a}", "月", value_equals, 2),
+    ("b_day_label", "check_sheet_dates", "B{a1}", "日", value_equals, 2),
+    ("c_required", "check_daily_report", "C{c}", None, required, 0),
+    ("c_day_off", "check_holiday_entries", "C{c}", "{day}", day_off_entry, 0),
+    ("h_cached", "check_cached_values", "H{h}", None, cached_value, 0),
+    ("a_month_cached", "check_cached_values", "A{a}", None, cached_value, 0),
+    ("a_day_cached", "check_cached_values", "A{a1}", None, cached_value, 0),
+    ("a_weekday_cached", "check_cached_values", "A{a2}", None, cached_value, 0),
+)
+
+# 日単位ルールのうち、特定の日だけに適用するもの: (rule_id, チェック名, 日, 期待値, 判定関数, stage)
+WEEKEND_RULES = (
+    ("c_weekend_leave", "check_daily_report", 5, "休暇", not_leave, 1),
+    ("c_weekend_leave", "check_daily_report", 6, "休暇", not_leave, 1),
+)
+
+DAYS_PER_SHEET = 7
+
+
+def _day_fields(day):
+    return {
+        "day": day,
+        "h": 10 + day,
+        "prev": 9 + day,
+        "a": 10 + day * 6,
+        "a1": 11 + day * 6,
+        "a2": 12 + day * 6,
+        "c": 9 + day * 6,
+    }
+
+
+def build_rules():
+    """ルール定義のテンプレートを展開して Rule の一覧を作る"""
+    rules = [
+        Rule(rule_id, check, cell, expected, predicate, stage)
+        for rule_id, check, cell, expected, predicate, stage in SHEET_RULES
+    ]
+    for day in range(DAYS_PER_SHEET):
+        fields = _day_fields(day)
+        for rule_id, check, cell, expected, predicate, stage in DAY_RULES:
+            if rule_id in ("h_formula", "h_cached") and day == 0:
+                continue  # H10 は日付そのもの (h10_start_date で確認)
+            if expected == "{day}":
+                expected = day
+            elif expected is not None:
+                expected = expected.format(**fields)
+            rules.append(Rule(rule_id, check, cell.format(**fields), expected, predicate, stage, day))
+    for rule_id, check, day, expected, predicate, stage in WEEKEND_RULES:
+        rules.append(Rule(rule_id, check, f"C{_day_fields(day)['c']}", expected, predicate, stage, day))
+    return rules
+
+
+class CheckPlan:
+    """
+    ルール一覧をコンパイルしたシート単位のチェック計画。
+    参照セルは addresses に重複なくまとめ、各セルを 1 回だけ読んで全ルールを評価する。
+    """
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        self.addresses = tuple(dict.fromkeys(rule.cell for rule in self.rules if rule.cell))
+        # {チェック名: ((stage, (Rule, ...)), ...)} の形で評価順に並べておく
+        stages = {}
+        for rule in self.rules:
+            stages.setdefault(rule.check, {}).setdefault(rule.stage, []).append(rule)
+        self.stages = {
+            check: tuple((stage, tuple(stage_rules)) for stage, stage_rules in sorted(check_stages.items()))
+            for check, check_stages in stages.items()
+        }
+        self._phase_names = {check: f"rules.{check}" for check in self.stages}
+
+    def read(self, ws):
+        """シートから参照セルの値を 1 回ずつ読み出す"""
+        layout = getattr(ws, "layout", None)
+        if layout is not None and layout.addresses == self.addresses:
+            # 同じ番地の並びで読み出した SheetCells は値のリストをそのまま使う
+            return dict(zip(self.addresses, ws.values))
+        return {address: ws[address].value for address in self.addresses}
+
+    def run(self, ws, sheet_name, week=None):
+        """シートに全ルールを適用し、違反 (Finding) の一覧を返す"""
+        with phase("rules.read"):
+            values = self.read(ws)
+            # 保存されている計算結果は StreamingWorkbook で読み込んだシート (SheetCells) だけが持つ
+            context = SheetContext(sheet_name, values, week, getattr(ws, "cached", None))
+        findings = []
+        for check, stages in self.stages.items():
+            with phase(self._phase_names[check]):
+                findings.extend(self._run_check(stages, values, context, check, sheet_name))
+        return findings
+
+    @staticmethod
+    def _run_check(stages, values, context, check, sheet_name):
+        """1 つのチェックの各段階を順に評価し、違反が見つかった段階で打ち切る"""
+        for _, stage_rules in stages:
+            stage_findings = []
+            for rule in stage_rules:
+                actual = values.get(rule.cell)
+                context.cell = rule.cell
+                message = rule.predicate(actual, rule.expected, context)
+                if message is None:
+                    continue
+                expected = rule.expected
+                if isinstance(message, Violation):
+                    message, expected, actual = message.message, message.expected, message.actual
+                stage_findings.append(Finding(check, rule.rule_id, sheet_name, rule.cell, expected, actual, message))
+            if stage_findings:
+                return stage_findings
+        return []
+
+
+DEFAULT_PLAN = CheckPlan(build_rules())
+
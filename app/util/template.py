@@ -0,0 +1,240 @@
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+
+from openpyxl.utils.cell import column_index_from_string, coordinate_to_tuple, get_column_letter
+
+from util.calendar_index import DAYS_PER_WEEK
+from util.rules import TEMPLATE_CHECK, Finding
+
+DEFAULT_TEMPLATE_PATH = Path(__file__).resolve().parents[2] / "templates" / "daily_report.json"
+
+# テンプレートの JSON の形式を変更したら上げる
+TEMPLATE_FORMAT_VERSION = 2
+
+KIND_FORMULA = "formula"  # 数式 (相対参照の R1C1 形式で保持し、各セルの番地で A1 形式に戻して比べる)
+KIND_LITERAL = "literal"  # 固定の値 (会社名・「月」「日」などのラベル)
+KIND_REQUIRED = "required"  # シートごとに値は違うが、未入力であってはいけないセル (workday があればその曜日が平日の週だけ)
+
+# 見本のシートのうちこの割合以上で参照シートと同じ値なら固定の値、入力されていれば必須のセルとみなす
+LEARN_RATIO = 0.8
+
+# 文字列リテラル ("...") とそれ以外の部分に分ける
+_STRING_LITERAL = re.compile(r'("(?:[^"]|"")*")')
+_A1_REFERENCE = re.compile(r"(?<![A-Za-z_\d.$])(\$?)([A-Z]{1,3})(\$?)(\d+)(?![A-Za-z_\d(])")
+_R1C1_REFERENCE = re.compile(r"(?<![A-Za-z_\d.])R(\[-?\d+\]|\d+)?C(\[-?\d+\]|\d+)?(?![A-Za-z_\d(])")
+
+
+def _outside_strings(formula, replace):
+    """数式の文字列リテラル以外の部分に replace(text) を適用する"""
+    parts = _STRING_LITERAL.split(formula)
+    return "".join(part if index % 2 else replace(part) for index, part in enumerate(parts))
+
+
+def _relative_part(axis, absolute, number, origin):
+    if absolute:
+        return f"{axis}{number}"
+    offset = number - origin
+    return f"{axis}[{offset}]" if offset else axis
+
+
+def to_relative(formula, address):
+    """A1 形式の数式を、address のセルから見た R1C1 形式 (=H10+1 → =R[-1]C+1) にする"""
+    row, column = coordinate_to_tuple(address)
+
+    def replace_reference(match):
+        column_absolute, letters, row_absolute, number = match.groups()
+        return (
+            _relative_part("R", row_absolute, int(number), row)
+            + _relative_part("C", column_absolute, column_index_from_string(letters), column)
+        )
+
+    return _outside_strings(formula, lambda text: _A1_REFERENCE.sub(replace_reference, text))
+
+
+def from_relative(formula, address):
+    """to_relative の逆: R1C1 形式の数式を address のセルの A1 形式に戻す"""
+    row, column = coordinate_to_tuple(address)
+
+    def resolve(part, origin):
+        if part is None:
+            return origin, ""
+        if part.startswith("["):
+            return origin + int(part[1:-1]), ""
+        return int(part), "$"
+
+    def replace_reference(match):
+        row_number, row_absolute = resolve(match.group(1), row)
+        column_number, column_absolute = resolve(match.group(2), column)
+        return f"{column_absolute}{get_column_letter(column_number)}{row_absolute}{row_number}"
+
+    return _outside_strings(formula, lambda text: _R1C1_REFERENCE.sub(replace_reference, text))
+
+
+def _is_formula(value):
+    return isinstance(value, str) and value.startswith("=")
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and value.strip() == "")
+
+
+def _sort_key(address):
+    return coordinate_to_tuple(address)
+
+
+def _workday_of(filled, weeks, required_count):
+    """
+    見本のシートでの入力の有無 (filled) が、ある曜日 (月曜 = 0) が平日かどうかとほぼ一致するセル
+    (その日の業務内容の詳細・作業時間など、土日・祝日には空欄のセル) ならその曜日を返す。一致しなければ None。
+    weeks は filled と同じ並びの見本のシートの週 (CalendarIndex の Week)。
+    """
+    best_day, best_agreement = None, -1
+    for day in range(DAYS_PER_WEEK):
+        workdays = [not week.day_off[day] for week in weeks]
+        if all(workdays):
+            continue  # その曜日が休みの見本がなければ区別できない
+        agreement = sum(cell_filled == workday for cell_filled, workday in zip(filled, workdays))
+        if agreement > best_agreement:
+            best_day, best_agreement = day, agreement
+    return best_day if best_agreement >= required_count else None
+
+
+def _mostly_equal(value, sample_values):
+    """sample_values の LEARN_RATIO 以上が value と同じか (見本がなければ True)"""
+    required_count = max(1, round(len(sample_values) * LEARN_RATIO)) if sample_values else 0
+    return sum(sample == value for sample in sample_values) >= required_count
+
+
+def learn_template(reference, samples=(), source=None, calendar=None, other_workbooks=()):
+    """
+    参照シート (正しいことがわかっているシートの SheetCells) から、テンプレート (JSON に保存できる dict) を作る。
+
+    - 数式のセルは、相対参照の R1C1 形式にした数式を期待値にする
+    - 数式以外で値のあるセルは、見本のシート (samples) の LEARN_RATIO 以上で同じ値で、
+      他のブックの見本 (other_workbooks、ブックごとの SheetCells のリスト) でもブックの LEARN_RATIO 以上で同じ値なら固定の値。
+      担当者名のように 1 つのブックの中でだけ同じ値は、入力されていれば必須のセルにする。
+      それ以外 (備考欄など) はテンプレートに含めない
+    - calendar (見本のシートの週を含む CalendarIndex) を渡すと、入力の有無がある曜日の土日・祝日と一致するセルは
+      その曜日が平日の週だけ入力必須のセル (workday) にする
+    """
+    weeks = [calendar.week(sample.title) if calendar is not None else None for sample in samples]
+    dated = [index for index, week in enumerate(weeks) if week is not None]
+    cells = {}
+    for address in sorted(reference.addresses, key=_sort_key):
+        value = reference[address].value
+        if _is_blank(value):
+            continue
+        if _is_formula(value):
+            cells[address] = {"kind": KIND_FORMULA, "formula": to_relative(value, address)}
+            continue
+        sample_values = [sample[address].value for sample in samples]
+        required_count = max(1, round(len(sample_values) * LEARN_RATIO)) if sample_values else 0
+        fixed = not isinstance(value, datetime) and _mostly_equal(value, sample_values)
+        if fixed and other_workbooks:
+            agreeing = [_mostly_equal(value, [sample[address].value for sample in workbook]) for workbook in other_workbooks]
+            fixed = _mostly_equal(True, agreeing)
+        if fixed:
+            cells[address] = {"kind": KIND_LITERAL, "value": value}
+            continue
+        filled = [not _is_blank(sample) for sample in sample_values]
+        if all(filled):
+            cells[address] = {"kind": KIND_REQUIRED}
+            continue
+        workday = None
+        if dated:
+            workday = _workday_of(
+                [filled[index] for index in dated],
+                [weeks[index] for index in dated],
+                max(1, round(len(dated) * LEARN_RATIO)),
+            )
+        if workday is not None:
+            cells[address] = {"kind": KIND_REQUIRED, "workday": workday}
+        elif sum(filled) >= required_count:
+            cells[address] = {"kind": KIND_REQUIRED}
+    return {
+        "version": TEMPLATE_FORMAT_VERSION,
+        "source": {
+            **(source or {}), "sheet": reference.title, "samples": len(samples), "workbooks": 1 + len(other_workbooks)
+        },
+        "cells": cells,
+    }
+
+
+def save_template(template, path=DEFAULT_TEMPLATE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(template, f, ensure_ascii=False, indent=1)
+
+
+def load_template(path=DEFAULT_TEMPLATE_PATH):
+    """保存したテンプレートを読み込み、CompiledTemplate にする"""
+    with open(path, encoding="utf-8") as f:
+        template = json.load(f)
+    if template.get("version") != TEMPLATE_FORMAT_VERSION:
+        raise ValueError(f"テンプレートの形式が古いため、learn_template で作り直してください: {path}")
+    return CompiledTemplate(template)
+
+
+class CompiledTemplate:
+    """
+    テンプレートを、セル番地・種類・期待値の並びにまとめたもの。
+    数式の期待値は読み込み時に各セルの A1 形式に戻しておくため、シートごとの比較は値の比較だけで済む。
+    シートはまず数式・固定の値のセルの値の並びをまとめて (タプル同士で) 比べ、一致して入力必須のセルも空でなければ
+    (ほとんどのシート) 1 セルずつの比較は行わない。
+    """
+
+    def __init__(self, template):
+        self.template = template
+        cells = template["cells"]
+        self.addresses = tuple(cells)
+        self.kinds = tuple(cell["kind"] for cell in cells.values())
+        self.workdays = tuple(cell.get("workday") for cell in cells.values())
+        self.expected = tuple(
+            from_relative(cell["formula"], address) if cell["kind"] == KIND_FORMULA else cell.get("value")
+            for address, cell in cells.items()
+        )
+        self._compared = tuple(index for index, kind in enumerate(self.kinds) if kind != KIND_REQUIRED)
+        self._compared_expected = tuple(self.expected[index] for index in self._compared)
+        self._required = tuple(index for index, kind in enumerate(self.kinds) if kind == KIND_REQUIRED)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def _read(self, ws):
+        """テンプレートのセルの値を self.addresses の並びで返す"""
+        layout = getattr(ws, "layout", None)
+        if layout is not None and layout.addresses == self.addresses:
+            # 同じ番地の並びで読み出した SheetCells は値のリストをそのまま使う
+            return ws.values
+        return [ws[address].value for address in self.addresses]
+
+    def diff(self, ws, sheet_name, week=None):
+        """
+        シート (read_cells(sheet_name, self.addresses) の結果など) とテンプレートの差分を Finding の一覧で返す。
+        week (シートの週) を渡すと、workday の曜日が土日・祝日の週ではそのセルの未入力を差分にしない。
+        """
+        values = self._read(ws)
+        if tuple(map(values.__getitem__, self._compared)) == self._compared_expected and not any(
+            _is_blank(values[index]) for index in self._required
+        ):
+            return []
+
+        findings = []
+        for address, kind, expected, workday, actual in zip(self.addresses, self.kinds, self.expected, self.workdays, values):
+            if kind == KIND_FORMULA:
+                if actual == expected:
+                    continue
+                message = f"{actual} (期待値: {expected})" if _is_formula(actual) else f"数式が設定されていません (期待値: {expected})"
+            elif kind == KIND_LITERAL:
+                if actual == expected:
+                    continue
+                message = f"値が正しくありません (期待値: '{expected}', 実際: '{actual}')"
+            else:
+                if not _is_blank(actual) or (workday is not None and week is not None and week.day_off[workday]):
+                    continue
+                message = "未入力です"
+            findings.append(Finding(TEMPLATE_CHECK, f"template_{kind}", sheet_name, address, expected, actual, message))
+        return findings
@@ -0,0 +1,244 @@
+import re
+from dataclasses import dataclass
+from html import escape, unescape
+
+from openpyxl.formula.translate import Translator
+from openpyxl.utils.cell import column_index_from_string, coordinate_to_tuple, range_boundaries
+
+from util.rules import DEFAULT_PLAN, SheetContext
+from util.xlsx_package import set_attr
+
+# 自動修正の対象にするルール (テンプレートの数式・固定の文字列で、正しい値が一意に決まるもの)
+FIXABLE_RULE_IDS = (
+    "h_formula",
+    "a_month",
+    "a_day",
+    "a_weekday",
+    "b_month_label",
+    "b_day_label",
+    "a57_formula",
+    "f4_company",
+)
+
+FIX_RULES = tuple(rule for rule in DEFAULT_PLAN.rules if rule.rule_id in FIXABLE_RULE_IDS)
+FIX_ADDRESSES = tuple(dict.fromkeys(rule.cell for rule in FIX_RULES))
+
+_SHEET_DATA = re.compile(rb"<((?:\w+:)?)sheetData\b[^>]*?(/?>)")
+_ROW = re.compile(rb"<(?:\w+:)?row\b[^>]*?(?:/>|>.*?</(?:\w+:)?row>)", re.S)
+_CELL = re.compile(rb"<(?:\w+:)?c\b[^>]*?(?:/>|>.*?</(?:\w+:)?c>)", re.S)
+_FORMULA = re.compile(rb"<((?:\w+:)?)f\b([^>]*?)(?:/>|>(.*?)</(?:\w+:)?f>)", re.S)
+_ROW_NUMBER = re.compile(rb'\sr="(\d+)"')
+_CELL_REF = re.compile(rb'\sr="([A-Z]+)(\d+)"')
+_STYLE = re.compile(rb'\ss="(\d+)"')
+_SPANS = re.compile(rb'\sspans="[^"]*"')
+_SHARED_INDEX = re.compile(rb'\ssi="(\d+)"')
+_SHARED_REF = re.compile(rb'\sref="([^"]*)"')
+_CALC_PR = re.compile(rb"<(?:\w+:)?calcPr\b[^>]*?/>")
+# workbook.xml で calcPr の直前に置かれる要素の終了タグ
+_BEFORE_CALC_PR = re.compile(rb"</((?:\w+:)?)(?:sheets|externalReferences|definedNames)>")
+
+
+@dataclass(frozen=True)
+class CellFix:
+    """自動修正 1 件 (expected が "=" で始まれば数式、それ以外は文字列を書き込む)"""
+    rule_id: str
+    sheet: str
+    cell: str
+    actual: object
+    expected: str
+
+
+def plan_fixes(ws, sheet_name, week=None):
+    """
+    シート (read_cells の結果など) に FIX_RULES を適用し、書き換えが必要なセルの一覧を返す。
+    check と違い段階 (stage) による打ち切りはせず、H10 が正しくない場合も数式は修正する。
+    """
+    values = {address: ws[address].value for address in FIX_ADDRESSES}
+    context = SheetContext(sheet_name, values, week)
+    fixes = []
+    for rule in FIX_RULES:
+        actual = values.get(rule.cell)
+        if rule.predicate(actual, rule.expected, context) is not None:
+            fixes.append(CellFix(rule.rule_id, sheet_name, rule.cell, actual, rule.expected))
+    return fixes
+
+
+def _new_cell(address, value, prefix, style=None):
+    """書き込む値の <c> 要素。文字列は共有文字列を変えないようインライン文字列で書く"""
+    style_attr = f' s="{style}"' if style is not None else ""
+    if value.startswith("="):
+        # キャッシュ値 (<v>) は持たせず、ブックを開いたときに Excel に再計算させる
+        body = f"<{prefix}f>{escape(value[1:], quote=False)}</{prefix}f>"
+        return f'<{prefix}c r="{address}"{style_attr}>{body}</{prefix}c>'.encode("utf-8")
+    body = f"<{prefix}is><{prefix}t>{escape(value, quote=False)}</{prefix}t></{prefix}is>"
+    return f'<{prefix}c r="{address}"{style_attr} t="inlineStr">{body}</{prefix}c>'.encode("utf-8")
+
+
+def _cell_address(cell):
+    match = _CELL_REF.search(cell[:cell.index(b">")])
+    if match is None:
+        raise ValueError("r 属性のないセルがあるため修正できません")
+    return match.group(1).decode() + match.group(2).decode(), column_index_from_string(match.group(1).decode())
+
+
+def _shared_masters(row, row_targets):
+    """書き換えるセルのうち共有数式の親セル: {si: (Translator, 共有範囲の最終行)}"""
+    masters = {}
+    for cell in _CELL.finditer(row):
+        address, column = _cell_address(cell.group(0))
+        if column not in row_targets:
+            continue
+        formula = _FORMULA.search(cell.group(0))
+        if formula is None or b't="shared"' not in formula.group(2) or not formula.group(3):
+            continue
+        shared_index = _SHARED_INDEX.search(formula.group(2))
+        shared_ref = _SHARED_REF.search(formula.group(2))
+        if shared_index is None or shared_ref is None:
+            continue
+        text = unescape(formula.group(3).decode("utf-8"))
+        last_row = range_boundaries(shared_ref.group(1).decode())[3]
+        masters[shared_index.group(1)] = (Translator(f"={text}", address), last_row)
+    return masters
+
+
+def _unshare(cell, address, masters):
+    """親セルを書き換える共有数式の子セルを、親の数式を翻訳した通常の数式に置き換える"""
+    formula = _FORMULA.search(cell)
+    if formula is None or formula.group(3) or b't="shared"' not in formula.group(2):
+        return cell
+    shared_index = _SHARED_INDEX.search(formula.group(2))
+    if shared_index is None or shared_index.group(1) not in masters:
+        return cell
+    translated = masters[shared_index.group(1)][0].translate_formula(address)
+    prefix = formula.group(1).decode()
+    replacement = f"<{prefix}f>{escape(translated[1:], quote=False)}</{prefix}f>".encode("utf-8")
+    return cell[:formula.start()] + replacement + cell[formula.end():]
+
+
+def _fix_row(row, row_targets, masters, prefix):
+    """1 行分の <row> 要素の対象セルを書き換え、存在しないセルは列の順番どおりに挿入する"""
+    start_end = row.index(b">") + 1
+    if row.endswith(b"/>") and start_end == len(row):
+        start_tag, body, end_tag = row[:-2].rstrip() + b">", b"", f"</{prefix}row>".encode()
+    else:
+        end_start = row.rindex(b"</")
+        start_tag, body, end_tag = row[:start_end], row[start_end:end_start], row[end_start:]
+
+    remaining = dict(row_targets)
+    pieces = []
+    position = 0
+    for match in _CELL.finditer(body):
+        cell = match.group(0)
+        address, column = _cell_address(cell)
+        pieces.append(body[position:match.start()])
+        for missing in sorted(col for col in remaining if col < column):
+            pieces.append(_new_cell(*remaining.pop(missing), prefix))
+        if column in remaining:
+            style = _STYLE.search(cell[:cell.index(b">")])
+            cell = _new_cell(*remaining.pop(column), prefix, style.group(1).decode() if style else None)
+        elif masters:
+            cell = _unshare(cell, address, masters)
+        pieces.append(cell)
+        position = match.end()
+    pieces.append(body[position:])
+    if remaining:
+        for missing in sorted(remaining):
+            pieces.append(_new_cell(*remaining[missing], prefix))
+        # セルを追加した行は、列の範囲のヒント (spans) を外しておく
+        start_tag = _SPANS.sub(b"", start_tag)
+    return start_tag + b"".join(pieces) + end_tag
+
+
+def fix_sheet_xml(data, values):
+    """
+    シートの XML の values ({セル番地: 値}) のセルだけを書き換える。それ以外の部分はバイト列のまま変更しない。
+    値が "=" で始まれば数式、それ以外は文字列として書き込む。セル・行がなければ追加する。
+    書き換えるセルが共有数式の親であれば、同じ共有数式の子セルは通常の数式に展開する。
+    """
+    header = _SHEET_DATA.search(data)
+    if header is None:
+        raise ValueError("sheetData が見つかりません")
+    prefix = header.group(1).decode()
+
+    targets = {}  # {行番号: {列番号: (セル番地, 値)}}
+    for address, value in values.items():
+        row_number, column = coordinate_to_tuple(address)
+        targets.setdefault(row_number, {})[column] = (address, value)
+    if not targets:
+        return data
+
+    if header.group(2) == b"/>":
+        # セルが 1 つもないシート
+        rows = b"".join(
+            _fix_row(f'<{prefix}row r="{number}"/>'.encode(), targets[number], {}, prefix) for number in sorted(targets)
+        )
+        opening = header.group(0)[:-2].rstrip() + b">"
+        return data[:header.start()] + opening + rows + f"</{prefix}sheetData>".encode() + data[header.end():]
+
+    sheet_data_end = data.index(f"</{prefix}sheetData>".encode(), header.end())
+
+    # 対象の行 (と書き換える共有数式の範囲) の最終行まで <row> の位置を調べる
+    rows = {}
+    masters = {}
+    last_row = max(targets)
+    number = 0
+    for match in _ROW.finditer(data, header.end(), sheet_data_end):
+        found = _ROW_NUMBER.search(match.group(0)[:match.group(0).index(b">")])
+        number = int(found.group(1)) if found else number + 1
+        rows[number] = match
+        if number in targets:
+            for shared_index, (translator, shared_last_row) in _shared_masters(match.group(0), targets[number]).items():
+                masters[shared_index] = (translator, shared_last_row)
+                last_row = max(last_row, shared_last_row)
+        if number >= last_row:
+            break
+
+    edits = []  # (開始位置, 終了位置, 行番号, 置き換える内容)
+    for number, match in rows.items():
+        if number in targets or (masters and b'si="' in match.group(0)):
+            edits.append((match.start(), match.end(), number, _fix_row(match.group(0), targets.get(number, {}), masters, prefix)))
+    for number in targets:
+        if number in rows:
+            continue
+        # 存在しない行は、次の行の直前 (なければ sheetData の末尾) に追加する
+        following = [match.start() for row_number, match in rows.items() if row_number > number]
+        position = min(following) if following else sheet_data_end
+        new_row = _fix_row(f'<{prefix}row r="{number}"/>'.encode(), targets[number], {}, prefix)
+        edits.append((position, position, number, new_row))
+
+    pieces = []
+    position = 0
+    for start, end, _, replacement in sorted(edits, key=lambda edit: (edit[0], edit[2])):
+        pieces.append(data[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(data[position:])
+    return b"".join(pieces)
+
+
+def force_full_calc_on_load(data):
+    """workbook.xml の calcPr に fullCalcOnLoad を設定し、ブックを開いたときに全数式を再計算させる"""
+    match = _CALC_PR.search(data)
+    if match is not None:
+        calc_pr = set_attr(match.group(0).decode("utf-8"), "fullCalcOnLoad", 1).encode("utf-8")
+        return data[:match.start()] + calc_pr + data[match.end():]
+    anchors = list(_BEFORE_CALC_PR.finditer(data))
+    if not anchors:
+        return data
+    anchor = anchors[-1]
+    calc_pr = f'<{anchor.group(1).decode()}calcPr fullCalcOnLoad="1"/>'.encode()
+    return data[:anchor.end()] + calc_pr + data[anchor.end():]
+
+
+def fix_transforms(package, fixes):
+    """XlsxPackage.rewrite に渡す書き換え関数 {zip内パス: 関数} を CellFix の一覧から作る"""
+    values_by_part = {}
+    sheet_parts = package.sheet_parts
+    for fix in fixes:
+        values_by_part.setdefault(sheet_parts[fix.sheet], {})[fix.cell] = fix.expected
+    transforms = {
+        part: lambda data, values=values: fix_sheet_xml(data, values)
+        for part, values in values_by_part.items()
+    }
+    transforms[package.workbook_part] = force_full_calc_on_load
+    return transforms
@@ -0,0 +1,285 @@
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from html import unescape
+from xml.etree.ElementTree import fromstring
+
+from util.ooxml import NS_DOC_REL, NS_MAIN, REL_TYPE_OFFICE_DOCUMENT, read_rels
+
+CONTENT_TYPES_PART = "[Content_Types].xml"
+
+REL_TYPE_WORKSHEET = "/worksheet"
+REL_TYPE_CHARTSHEET = "/chartsheet"
+REL_TYPE_CALC_CHAIN = "/calcChain"
+
+# 名前空間の接頭辞 (x: など) の有無どちらにも一致させる
+_SHEET_ELEMENT = re.compile(r"<(?:\w+:)?sheet\b[^>]*?/>")
+_SHEETS_BLOCK = re.compile(r"(<(?:\w+:)?sheets\b[^>]*>)(.*?)(</(?:\w+:)?sheets>)", re.S)
+_DEFINED_NAME = re.compile(r"<(?:\w+:)?definedName\b([^>]*)>(.*?)</(?:\w+:)?definedName>", re.S)
+_LOCAL_SHEET_ID = re.compile(r'\blocalSheetId="(\d+)"')
+_WORKBOOK_VIEW = re.compile(r"<(?:\w+:)?workbookView\b[^>]*?/?>")
+_RELATIONSHIP = re.compile(r"<Relationship\b[^>]*?/>")
+_OVERRIDE = re.compile(r"<Override\b[^>]*?/>")
+_ATTR = re.compile(r'([\w:]+)="([^"]*)"')
+
+
+def _attrs(element_text):
+    return {name: unescape(value) for name, value in _ATTR.findall(element_text)}
+
+
+def set_attr(element_text, name, value):
+    """要素の開始タグ文字列の属性を書き換える (なければ追加する)"""
+    pattern = re.compile(rf'\b{name}="[^"]*"')
+    if pattern.search(element_text):
+        return pattern.sub(f'{name}="{value}"', element_text, count=1)
+    end = -2 if element_text.endswith("/>") else -1
+    return f'{element_text[:end].rstrip()} {name}="{value}"{element_text[end:]}'
+
+
+@contextmanager
+def replacing_file(path):
+    """
+    path を上書きするための一時ファイル (同じフォルダ) のパスを返し、with を正常に抜けたら path と置き換える。
+    一時ファイルは mkstemp で 0600 になるため、置き換える前に元のファイルのアクセス権をコピーする。
+    例外で抜けた場合は一時ファイルを削除し、元のファイルはそのまま残す。
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(path)[1], dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        yield tmp_path
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _output_info(info):
+    """
+    出力する zip のエントリ情報。writestr は渡した ZipInfo の位置・CRC・サイズを書き換えるため、
+    元のブックの ZipInfo (同じ XlsxPackage から続けて読み書きする) は渡さず、名前・日時・属性だけをコピーする
+    """
+    output_info = zipfile.ZipInfo(info.filename, info.date_time)
+    output_info.compress_type = info.compress_type
+    output_info.external_attr = info.external_attr
+    return output_info
+
+
+def _chain(first, second):
+    """first の後に second (None なら何もしない) を適用する書き換え関数"""
+    if second is None:
+        return first
+    return lambda data: second(first(data))
+
+
+class XlsxPackage:
+    """
+    xlsx の zip パッケージを、XML パートの単位でコピー・書き換えするためのクラス。
+    Excel を起動せずにシートの抽出やビュー設定の変更を行う。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path)
+
+        package_rels = read_rels(self.archive, "")
+        self.workbook_part = next(
+            (target for rel_type, target in package_rels.values() if rel_type.endswith(REL_TYPE_OFFICE_DOCUMENT)),
+            "xl/workbook.xml",
+        )
+        self.workbook_rels_part = posixpath.join(
+            posixpath.dirname(self.workbook_part), "_rels", f"{posixpath.basename(self.workbook_part)}.rels"
+        )
+        self.workbook_rels = read_rels(self.archive, self.workbook_part)
+
+        # [(シート名, r:id, zip内パス)] をブック内の順番で保持
+        self.sheets = []
+        root = fromstring(self.archive.read(self.workbook_part))
+        for sheet in root.iter(f"{NS_MAIN}sheet"):
+            rel_id = sheet.get(f"{NS_DOC_REL}id")
+            rel = self.workbook_rels.get(rel_id)
+            self.sheets.append((sheet.get("name"), rel_id, rel[1] if rel else None))
+
+        active_tab = 0
+        view = root.find(f"{NS_MAIN}bookViews/{NS_MAIN}workbookView")
+        if view is not None:
+            active_tab = int(view.get("activeTab", 0))
+        self.active_sheet = self.sheets[active_tab][0] if active_tab < len(self.sheets) else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.archive.close()
+
+    @property
+    def sheetnames(self):
+        return [name for name, _, _ in self.sheets]
+
+    @property
+    def sheet_parts(self):
+        return {name: part for name, _, part in self.sheets}
+
+    def _reachable_parts(self, dropped_rel_ids):
+        """
+        パッケージのルートからリレーションシップをたどって到達できるパートの集合。
+        dropped_rel_ids に含まれるブックからのリレーションシップ (削除するシートなど) はたどらない。
+        """
+        reachable = set()
+        pending = [target for _, target in read_rels(self.archive, "").values()]
+        while pending:
+            part = pending.pop()
+            if part in reachable or part not in self.archive.NameToInfo:
+                continue
+            reachable.add(part)
+            rels = self.workbook_rels if part == self.workbook_part else read_rels(self.archive, part)
+            for rel_id, (_, target) in rels.items():
+                if part == self.workbook_part and rel_id in dropped_rel_ids:
+                    continue
+                pending.append(target)
+        return reachable
+
+    def rewrite(self, output_path, transforms, drop_calc_chain=False):
+        """
+        全パートを output_path にコピーする。transforms ({zip内パス: 関数(bytes) -> bytes}) に
+        含まれるパートだけを書き換え、それ以外のパートは内容を変えずにそのまま出力する。
+        drop_calc_chain=True のときは計算チェーン (calcChain.xml) を出力しない (セルの数式を書き換えた場合。
+        計算チェーンは Excel が再作成する)。
+        """
+        dropped_parts = set()
+        if drop_calc_chain:
+            dropped_rel_ids = {
+                rel_id for rel_id, (rel_type, _) in self.workbook_rels.items() if rel_type.endswith(REL_TYPE_CALC_CHAIN)
+            }
+            if dropped_rel_ids:
+                dropped_parts = {self.workbook_rels[rel_id][1] for rel_id in dropped_rel_ids}
+                kept_parts = set(self.archive.NameToInfo) - dropped_parts
+                transforms = dict(transforms)
+                transforms[self.workbook_rels_part] = lambda data: self._drop_relationships(data, dropped_rel_ids)
+                transforms[CONTENT_TYPES_PART] = lambda data: self._drop_overrides(data, kept_parts)
+
+        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as output:
+            for info in self.archive.infolist():
+                if info.filename in dropped_parts:
+                    continue
+                data = self.archive.read(info.filename)
+                if info.filename in transforms:
+                    data = transforms[info.filename](data)
+                output.writestr(_output_info(info), data)
+
+    def extract(self, sheet_names, output_path, transforms=None):
+        """
+        sheet_names のシートだけを、指定した順番で含む新しいブックを output_path に書き出す。
+
+        シートの XML パートと、そこから参照されるパート (図形・コメントなど)、
+        スタイル・共有文字列・テーマなどブック共通のパートは、zip からそのままコピーする。
+        削除したシートを参照する計算チェーン (calcChain.xml) は Excel が再作成するため出力しない。
+        transforms に {zip内パス: 関数(bytes) -> bytes} を渡すと、そのパートを書き換えて出力する
+        (workbook.xml などの抽出時に書き換えるパートは、抽出に合わせた書き換えの後に渡した関数を適用する)。
+        戻り値は出力したシート名のリスト (該当するシートがなければ何も書き出さず空のリストを返す)。
+        """
+        existing = {name: (rel_id, part) for name, rel_id, part in self.sheets}
+        selected = [name for name in sheet_names if name in existing]
+        if not selected:
+            return selected
+        selected_rel_ids = {existing[name][0] for name in selected}
+
+        dropped_rel_ids = {
+            rel_id for rel_id, (rel_type, _) in self.workbook_rels.items()
+            if rel_type.endswith(REL_TYPE_CALC_CHAIN)
+            or ((rel_type.endswith(REL_TYPE_WORKSHEET) or rel_type.endswith(REL_TYPE_CHARTSHEET))
+                and rel_id not in selected_rel_ids)
+        }
+        kept_parts = self._reachable_parts(dropped_rel_ids)
+
+        active_sheet = self.active_sheet if self.active_sheet in selected else None
+        transforms = dict(transforms or {})
+        # 渡された workbook.xml などの書き換えは、抽出に合わせた書き換えの後に行う
+        for part, transform in (
+            (self.workbook_part, lambda data: self._rewrite_workbook(data, selected, active_sheet)),
+            (self.workbook_rels_part, lambda data: self._drop_relationships(data, dropped_rel_ids)),
+            (CONTENT_TYPES_PART, lambda data: self._drop_overrides(data, kept_parts)),
+        ):
+            transforms[part] = _chain(transform, transforms.get(part))
+
+        with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as output:
+            for info in self.archive.infolist():
+                name = info.filename
+                if name != CONTENT_TYPES_PART and not self._is_kept(name, kept_parts):
+                    continue
+                data = self.archive.read(name)
+                if name in transforms:
+                    data = transforms[name](data)
+                output.writestr(_output_info(info), data)
+
+        return selected
+
+    @staticmethod
+    def _is_kept(name, kept_parts):
+        if name in kept_parts:
+            return True
+        if name.endswith(".rels"):
+            # xxx/_rels/yyy.rels はパート xxx/yyy と一緒に残す
+            base_dir, rels_name = posixpath.split(name)
+            owner = posixpath.join(posixpath.dirname(base_dir), rels_name[:-len(".rels")])
+            return owner in kept_parts or owner == ""
+        return False
+
+    def _rewrite_workbook(self, data, selected, active_sheet):
+        """workbook.xml の sheets を抽出後の並びに置き換え、関連する設定を合わせる"""
+        text = data.decode("utf-8")
+        old_index = {name: index for index, name in enumerate(self.sheetnames)}
+        new_index = {old_index[name]: index for index, name in enumerate(selected)}
+
+        elements = {}
+        for element in _SHEET_ELEMENT.findall(text):
+            attrs = _attrs(element)
+            elements[attrs.get("name")] = element
+        text = _SHEETS_BLOCK.sub(
+            lambda m: m.group(1) + "".join(elements[name] for name in selected) + m.group(3), text, count=1
+        )
+
+        selected_set = set(selected)
+        dropped = [name for name in self.sheetnames if name not in selected_set]
+
+        def rewrite_defined_name(match):
+            local = _LOCAL_SHEET_ID.search(match.group(1))
+            if local is None:
+                # ブック全体の名前は、削除したシートを参照していれば出力しない
+                formula = unescape(match.group(2))
+                if any(f"{name}!" in formula or f"'{name}'!" in formula for name in dropped):
+                    return ""
+                return match.group(0)
+            index = new_index.get(int(local.group(1)))
+            if index is None:
+                return ""  # 削除したシートの印刷範囲などは出力しない
+            return match.group(0).replace(local.group(0), f'localSheetId="{index}"', 1)
+
+        text = _DEFINED_NAME.sub(rewrite_defined_name, text)
+
+        active_tab = selected.index(active_sheet) if active_sheet is not None else 0
+        text = _WORKBOOK_VIEW.sub(
+            lambda m: set_attr(set_attr(m.group(0), "activeTab", active_tab), "firstSheet", 0), text
+        )
+        return text.encode("utf-8")
+
+    @staticmethod
+    def _drop_relationships(data, dropped_rel_ids):
+        text = data.decode("utf-8")
+        text = _RELATIONSHIP.sub(lambda m: "" if _attrs(m.group(0)).get("Id") in dropped_rel_ids else m.group(0), text)
+        return text.encode("utf-8")
+
+    @staticmethod
+    def _drop_overrides(data, kept_parts):
+        text = data.decode("utf-8")
+        text = _OVERRIDE.sub(
+            lambda m: m.group(0) if _attrs(m.group(0)).get("PartName", "").lstrip("/") in kept_parts else "", text
+        )
+        return text.encode("utf-8")
@@ -0,0 +1,340 @@
+import zipfile
+from functools import lru_cache
+from xml.etree.ElementTree import fromstring, iterparse
+
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+from util.ooxml import (
+    NS_DOC_REL,
+    NS_MAIN,
+    REL_TYPE_OFFICE_DOCUMENT,
+    REL_TYPE_SHARED_STRINGS,
+    REL_TYPE_STYLES,
+    read_rels,
+)
+from util.profiler import phase
+
+
+class CellValue:
+    """openpyxl の Cell と同じく `.value` で値を参照できる軽量なセル"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+EMPTY_CELL = CellValue(None)
+
+
+class SheetLayout:
+    """
+    読み出すセルの番地と、SheetCells.values の並びとの対応。同じ番地の一覧を読むすべてのシートで 1 つを共有する。
+    """
+
+    __slots__ = ("addresses", "index", "positions", "last_row", "last_column")
+
+    def __init__(self, addresses):
+        self.addresses = tuple(addresses)
+        self.index = {address: index for index, address in enumerate(self.addresses)}
+        self.positions = {coordinate_to_tuple(address): index for index, address in enumerate(self.addresses)}
+        self.last_row = max((row for row, _ in self.positions), default=0)
+        self.last_column = max((column for _, column in self.positions), default=0)
+
+
+@lru_cache(maxsize=32)
+def sheet_layout(addresses):
+    """番地のタプルごとに 1 度だけ SheetLayout を作る"""
+    return SheetLayout(addresses)
+
+
+class SheetCells:
+    """
+    必要なセルの値だけを保持するシート。`ws["H10"].value` の形で参照できる。
+    値は layout (SheetLayout) の並びのリストで持ち、セルごとのオブジェクトは作らない
+    (チェックするセル数分の小さなリストだけなので、シートをチェックし終えたらすぐに解放できる)。
+    shared_refs には読み出したセルが参照した共有文字列 {番号: 文字列} を保持する。
+    cached には読み出した数式セルのうち、計算結果が保存されているものの値 {セル番地: 値} を保持する。
+    """
+
+    __slots__ = ("title", "layout", "values", "shared_refs", "cached")
+
+    def __init__(self, title, layout, values=None, shared_refs=None, cached=None):
+        self.title = title
+        self.layout = layout
+        self.values = values if values is not None else [None] * len(layout.addresses)
+        self.shared_refs = shared_refs or {}
+        self.cached = cached if cached is not None else {}
+
+    def __getitem__(self, address):
+        index = self.layout.index.get(address)
+        value = None if index is None else self.values[index]
+        return EMPTY_CELL if value is None else CellValue(value)
+
+    def __contains__(self, address):
+        index = self.layout.index.get(address)
+        return index is not None and self.values[index] is not None
+
+    @property
+    def addresses(self):
+        """値のあるセルの番地"""
+        return [address for address, value in zip(self.layout.addresses, self.values) if value is not None]
+
+
+def snapshot_worksheet(ws, addresses):
+    """openpyxl のワークシート (read_only でも可) から、addresses のセルの値だけを SheetCells に写す"""
+    layout = sheet_layout(tuple(addresses))
+    values = [None] * len(layout.addresses)
+    rows = ws.iter_rows(max_row=layout.last_row, max_col=layout.last_column, values_only=True)
+    for row_number, row in enumerate(rows, start=1):
+        for column_number, value in enumerate(row, start=1):
+            index = layout.positions.get((row_number, column_number))
+            if index is not None:
+                values[index] = value
+    return SheetCells(ws.title, layout, values)
+
+
+def _cast_number(value):
+    """openpyxl と同じ規則で数値文字列を int / float に変換"""
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+class StreamingWorkbook:
+    """
+    xlsx の zip を直接読み、各シートの XML をストリーミングして必要なセルだけを取り出す。
+
+    openpyxl.load_workbook のように全セルを構築しないため、
+    シート数が多いブックでもチェック対象のセル分のメモリと時間しか使わない。
+    path にはファイルのパスのほか、zipfile.ZipFile と同じくファイルオブジェクト (BytesIO など) も渡せる。
+    archive に開いている zipfile.ZipFile (XlsxPackage.archive など) を渡すと、それを共有して読む (close では閉じない)。
+    """
+
+    def __init__(self, path, archive=None):
+        self.path = path
+        self._owns_archive = archive is None
+        self._archive = zipfile.ZipFile(path) if archive is None else archive
+        self._sheet_parts = None
+        self._epoch = WINDOWS_EPOCH
+        self._styles_part = None
+        self._shared_strings_part = None
+        self._shared_strings = None
+        self._date_styles = None
+        with phase("zip.workbook"):
+            self._load_workbook_part()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._owns_archive:
+            self._archive.close()
+
+    def _load_workbook_part(self):
+        """workbook.xml からシート名と各シートの XML パスを取得"""
+        package_rels = read_rels(self._archive, "")
+        workbook_part = next(
+            (target for rel_type, target in package_rels.values() if rel_type.endswith(REL_TYPE_OFFICE_DOCUMENT)),
+            "xl/workbook.xml",
+        )
+        workbook_rels = read_rels(self._archive, workbook_part)
+
+        for rel_type, target in workbook_rels.values():
+            if rel_type.endswith(REL_TYPE_STYLES):
+                self._styles_part = target
+            elif rel_type.endswith(REL_TYPE_SHARED_STRINGS):
+                self._shared_strings_part = target
+
+        root = fromstring(self._archive.read(workbook_part))
+        workbook_pr = root.find(f"{NS_MAIN}workbookPr")
+        if workbook_pr is not None and workbook_pr.get("date1904") in ("1", "true"):
+            self._epoch = MAC_EPOCH
+
+        self._sheet_parts = {}
+        for sheet in root.iter(f"{NS_MAIN}sheet"):
+            rel = workbook_rels.get(sheet.get(f"{NS_DOC_REL}id"))
+            if rel is not None:
+                self._sheet_parts[sheet.get("name")] = rel[1]
+
+    @property
+    def sheetnames(self):
+        return list(self._sheet_parts)
+
+    def part_digest(self, sheet_name):
+        """シートの XML パートの内容を表すダイジェスト (zip に記録済みの CRC32 とサイズから求めるため展開不要)"""
+        info = self._archive.getinfo(self._sheet_parts[sheet_name])
+        return f"{info.CRC:08x}-{info.file_size}"
+
+    @property
+    def styles_digest(self):
+        """スタイル (日付の表示形式の判定に使用) のパートのダイジェスト"""
+        info = self._archive.NameToInfo.get(self._styles_part)
+        return f"{info.CRC:08x}-{info.file_size}" if info is not None else ""
+
+    @property
+    def shared_strings_digest(self):
+        """共有文字列テーブルのパートのダイジェスト (共有文字列がなければ空文字列)"""
+        info = self._archive.NameToInfo.get(self._shared_strings_part)
+        return f"{info.CRC:08x}-{info.file_size}" if info is not None else ""
+
+    @property
+    def shared_strings(self):
+        """共有文字列テーブル (ふりがな rPh は除外)。初回参照時に読み込む"""
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if self._shared_strings_part in self._archive.NameToInfo:
+                with phase("zip.shared_strings"), self._archive.open(self._shared_strings_part) as source:
+                    for _, element in iterparse(source):
+                        if element.tag != f"{NS_MAIN}si":
+                            continue
+                        text = element.findtext(f"{NS_MAIN}t")
+                        if text is None:
+                            text = "".join(run.findtext(f"{NS_MAIN}t") or "" for run in element.iter(f"{NS_MAIN}r"))
+                        self._shared_strings.append(text)
+                        element.clear()
+        return self._shared_strings
+
+    @property
+    def date_styles(self):
+        """日付の表示形式が設定されているスタイル番号の集合"""
+        if self._date_styles is None:
+            self._date_styles = set()
+            if self._styles_part in self._archive.NameToInfo:
+                with phase("zip.styles"):
+                    root = fromstring(self._archive.read(self._styles_part))
+                custom_formats = {
+                    int(num_fmt.get("numFmtId")): num_fmt.get("formatCode")
+                    for num_fmt in root.iter(f"{NS_MAIN}numFmt")
+                }
+                cell_xfs = root.find(f"{NS_MAIN}cellXfs")
+                if cell_xfs is not None:
+                    for idx, xf in enumerate(cell_xfs.iter(f"{NS_MAIN}xf")):
+                        num_fmt_id = int(xf.get("numFmtId", 0))
+                        fmt = custom_formats.get(num_fmt_id) or BUILTIN_FORMATS.get(num_fmt_id)
+                        if fmt and is_date_format(fmt):
+                            self._date_styles.add(idx)
+        return self._date_styles
+
+    def read_cells(self, sheet_name, addresses):
+        """
+        指定シートの XML をストリーミングし、addresses のセルだけを読み出す (None なら値のある全セル)。
+        必要なセルがすべて揃うか、対象の最終行を過ぎた時点で読み込みを打ち切る。
+        値は openpyxl.load_workbook(data_only=False) と同じ形式で返す。
+        数式セルに保存されている計算結果 (data_only=True で読める値) も同じ読み込みで取り出し、cached に入れる。
+        """
+        read_all = addresses is None
+        if read_all:
+            layout = None
+            found = {}
+            targets = set()
+            last_row = float("inf")
+        else:
+            layout = sheet_layout(tuple(addresses))
+            values = [None] * len(layout.addresses)
+            targets = set(layout.addresses)
+            last_row = layout.last_row
+        cached = {}
+        shared_formulae = {}
+        shared_refs = {}
+
+        with phase("zip.read_cells"), self._archive.open(self._sheet_parts[sheet_name]) as source:
+            row_counter = 0
+            col_counter = 0
+            for event, element in iterparse(source, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    if tag == f"{NS_MAIN}row":
+                        row_counter = int(element.get("r", row_counter + 1))
+                        col_counter = 0
+                        if row_counter > last_row:
+                            break
+                    continue
+
+                if tag == f"{NS_MAIN}c":
+                    coordinate = element.get("r")
+                    if coordinate:
+                        col_counter = coordinate_to_tuple(coordinate)[1]
+                    else:
+                        col_counter += 1
+                        coordinate = f"{get_column_letter(col_counter)}{row_counter}"
+
+                    formula = element.find(f"{NS_MAIN}f")
+                    if formula is not None and formula.get("t") == "shared" and formula.text:
+                        # 共有数式の親セルは対象外でも翻訳元として記録しておく
+                        shared_formulae[formula.get("si")] = Translator(f"={formula.text}", coordinate)
+
+                    if read_all or coordinate in targets:
+                        value = self._parse_cell(element, formula, coordinate, shared_formulae, shared_refs)
+                        if read_all:
+                            found[coordinate] = value
+                        else:
+                            values[layout.index[coordinate]] = value
+                        if formula is not None and element.findtext(f"{NS_MAIN}v"):
+                            cached[coordinate] = self._parse_value(element, shared_refs)
+                        targets.discard(coordinate)
+                    element.clear()
+
+                elif tag == f"{NS_MAIN}row":
+                    element.clear()
+                    if not targets and not read_all:
+                        break
+
+                elif tag == f"{NS_MAIN}sheetData":
+                    break
+
+        if read_all:
+            layout = SheetLayout(found)
+            values = list(found.values())
+        return SheetCells(sheet_name, layout, values, shared_refs, cached)
+
+    def _parse_cell(self, element, formula, coordinate, shared_formulae, shared_refs):
+        """<c> 要素を openpyxl(data_only=False) と同じ値に変換"""
+        if formula is not None:
+            if formula.get("t") == "shared" and not formula.text:
+                translator = shared_formulae.get(formula.get("si"))
+                if translator is not None:
+                    return translator.translate_formula(coordinate)
+            return f"={formula.text or ''}"
+
+        data_type = element.get("t", "n")
+        if data_type == "inlineStr":
+            inline = element.find(f"{NS_MAIN}is")
+            if inline is None:
+                return None
+            text = inline.findtext(f"{NS_MAIN}t")
+            if text is None:
+                text = "".join(run.findtext(f"{NS_MAIN}t") or "" for run in inline.iter(f"{NS_MAIN}r"))
+            return text
+        return self._parse_value(element, shared_refs)
+
+    def _parse_value(self, element, shared_refs):
+        """<c> 要素の <v> の値を、型 (t 属性) と表示形式に合わせて変換 (数式セルでは保存されている計算結果)"""
+        data_type = element.get("t", "n")
+        value = element.findtext(f"{NS_MAIN}v") or None
+        if value is None:
+            return None
+
+        if data_type == "n":
+            value = _cast_number(value)
+            if int(element.get("s", 0)) in self.date_styles:
+                try:
+                    value = from_excel(value, self._epoch)
+                except (OverflowError, ValueError):
+                    value = "#VALUE!"
+            return value
+        if data_type == "s":
+            index = int(value)
+            shared_refs[index] = self.shared_strings[index]
+            return shared_refs[index]
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_ISO8601(value)
+        return value
@@ -0,0 +1,95 @@
+import re
+
+from util.xlsx_package import XlsxPackage, replacing_file, set_attr
+
+_SHEET_VIEWS_BLOCK = re.compile(rb"<(?:\w+:)?sheetViews\b.*?</(?:\w+:)?sheetViews>", re.S)
+_SHEET_VIEW = re.compile(rb"<(?:\w+:)?sheetView\b[^>]*?/>|<(?:\w+:)?sheetView\b[^>]*?>.*?</(?:\w+:)?sheetView>", re.S)
+_SELECTION = re.compile(rb"<(?:\w+:)?selection\b[^>]*?/>")
+_PANE = re.compile(rb"<(?:\w+:)?pane\b")
+_WORKBOOK_VIEW = re.compile(rb"<(?:\w+:)?workbookView\b[^>]*?/?>")
+
+
+def _remove_attr(element, name):
+    return re.sub(rf'\s{name}="[^"]*"'.encode(), b"", element)
+
+
+def _set_attr(element, name, value):
+    return set_attr(element.decode("utf-8"), name, value).encode("utf-8")
+
+
+def normalize_sheet_views(data, move_a1=False, zoom=None, tab_selected=None):
+    """
+    シートの XML の <sheetViews> だけを書き換える。それ以外の部分はバイト列のまま変更しない。
+
+    - move_a1: 選択範囲とアクティブセルを A1 にし、表示位置を左上に戻す
+    - zoom: 拡大・縮小率 (zoomScale) を設定する
+    - tab_selected: True / False でシートタブの選択状態を設定する (None なら変更しない)
+    """
+    match = _SHEET_VIEWS_BLOCK.search(data)
+    if match is None:
+        return data
+
+    def rewrite_view(view_match):
+        view = view_match.group(0)
+        start_end = view.index(b">") + 1
+        start_tag, body = view[:start_end], view[start_end:]
+
+        if zoom is not None:
+            start_tag = _set_attr(start_tag, "zoomScale", zoom)
+            if b"zoomScaleNormal=" in start_tag:
+                start_tag = _set_attr(start_tag, "zoomScaleNormal", zoom)
+        if tab_selected is True:
+            start_tag = _set_attr(start_tag, "tabSelected", 1)
+        elif tab_selected is False:
+            start_tag = _remove_attr(start_tag, "tabSelected")
+        if move_a1:
+            if not _PANE.search(body):
+                start_tag = _remove_attr(start_tag, "topLeftCell")
+            body = _SELECTION.sub(
+                lambda m: _set_attr(_set_attr(_remove_attr(m.group(0), "activeCellId"), "activeCell", "A1"), "sqref", "A1"),
+                body,
+            )
+        return start_tag + body
+
+    block = _SHEET_VIEW.sub(rewrite_view, match.group(0))
+    return data[:match.start()] + block + data[match.end():]
+
+
+def activate_first_sheet(data):
+    """workbook.xml の workbookView を、最初のシートがアクティブな状態にする"""
+    return _WORKBOOK_VIEW.sub(lambda m: _set_attr(_set_attr(m.group(0), "activeTab", 0), "firstSheet", 0), data)
+
+
+def view_transforms(package, move_a1=False, zoom=None, sheet_names=None):
+    """
+    XlsxPackage の各シートと workbook.xml に対する書き換え関数 {zip内パス: 関数} を作る。
+    sheet_names を指定するとそのシートだけを対象にし、その最初のシートを選択状態にする (抽出後のブック用)。
+    """
+    sheet_parts = package.sheet_parts
+    if sheet_names is not None:
+        sheet_parts = {name: sheet_parts[name] for name in sheet_names if name in sheet_parts}
+    transforms = {}
+    for index, part in enumerate(sheet_parts.values()):
+        if part is None:
+            continue
+        tab_selected = (index == 0) if move_a1 else None
+        transforms[part] = lambda data, tab_selected=tab_selected: normalize_sheet_views(
+            data, move_a1=move_a1, zoom=zoom, tab_selected=tab_selected
+        )
+    if move_a1:
+        transforms[package.workbook_part] = activate_first_sheet
+    return transforms
+
+
+def normalize_workbook_views(path, move_a1=False, zoom=None):
+    """
+    ブックを上書きして、全シートのアクティブセルを A1 にする / 拡大・縮小率を設定する。
+    書き換えは同じフォルダの一時ファイルに行い、完了してから元のファイルと置き換える。
+    戻り値は処理したシート数。
+    """
+    with replacing_file(path) as tmp_path:
+        with XlsxPackage(path) as package:
+            transforms = view_transforms(package, move_a1=move_a1, zoom=zoom)
+            package.rewrite(tmp_path, transforms)
+            sheet_count = len(package.sheets)
+    return sheet_count
@@ -0,0 +1,109 @@
+"""
+CLI (app/main.py) の起動時間を計測するベンチマーク。
+
+コマンドごとに新しい Python プロセスで `app/main.py <コマンド> --help` を実行して経過時間を計測し、
+あわせて -X importtime で各コマンドの起動時に読み込まれた重いモジュール (openpyxl など) を表示する。
+結果は run_bench.py と同じ形式で bench/results/ に保存し、--compare で以前の結果と比較できる。
+
+    python bench/bench_startup.py
+    python bench/bench_startup.py --compare bench/results/0.1.0-abc1234-startup.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from run_bench import RESULTS_DIR, ROOT_DIR, compare, measure, version_label
+
+MAIN_PATH = ROOT_DIR / "app" / "main.py"
+
+# 計測するコマンドライン (main.py に渡す引数)
+COMMANDS = {
+    "help": ["--help"],
+    "check.help": ["check", "--help"],
+    "cut.help": ["cut", "--help"],
+    "pipeline.help": ["pipeline", "--help"],
+    "gate.help": ["gate", "--help"],
+    "watch.help": ["watch", "--help"],
+    "fix.help": ["fix", "--help"],
+    "diff_template.help": ["diff_template", "--help"],
+    "serve.help": ["serve", "--help"],
+    "report.help": ["report", "--help"],
+    "move_a1.help": ["move_a1", "--help"],
+    "set_zoom.help": ["set_zoom", "--help"],
+}
+
+# 起動時に読み込まれていないか確認する、読み込みに時間のかかるモジュール
+HEAVY_MODULES = ("openpyxl", "holidays", "win32com", "cProfile")
+
+
+def run_command(args):
+    subprocess.run([sys.executable, str(MAIN_PATH), *args], cwd=ROOT_DIR, capture_output=True, check=True)
+
+
+def heavy_imports(args):
+    """-X importtime の出力から、HEAVY_MODULES のうち起動時に読み込まれたものを返す"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", str(MAIN_PATH), *args],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    )
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        module = line.rsplit("|", 1)[-1].strip()
+        if module.split(".")[0] in HEAVY_MODULES:
+            loaded.add(module.split(".")[0])
+    return sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI の起動時間のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=10, help="各コマンドの実行回数 (中央値を記録)")
+    parser.add_argument("--output", help="結果の保存先 (省略時は bench/results/<バージョン>-startup.json)")
+    parser.add_argument("--compare", help="比較する以前の結果 (JSON)")
+    parser.add_argument("--threshold", type=float, default=1.2, help="この倍率を超えて遅くなったら失敗とする")
+    args = parser.parse_args()
+
+    # Python 自体の起動時間 (比較の基準)
+    cases = {"python": lambda: subprocess.run([sys.executable, "-c", "pass"], check=True)}
+    for name, command_args in COMMANDS.items():
+        cases[name] = lambda command_args=command_args: run_command(command_args)
+
+    label = version_label()
+    results = {}
+    for name, func in cases.items():
+        timings = measure(func, args.repeat)
+        results[name] = {"median": statistics.median(timings), "min": min(timings), "max": max(timings)}
+        loaded = heavy_imports(COMMANDS[name]) if name in COMMANDS else []
+        results[name]["heavy_imports"] = loaded
+        print(
+            f"{name:<20} {results[name]['median'] * 1000:9.2f} ms (min {results[name]['min'] * 1000:.2f} ms)"
+            + (f"  読み込み: {', '.join(loaded)}" if loaded else "")
+        )
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{label}-startup.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "version": label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "preset": "startup",
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n結果を保存しました: {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+レビューで見つかった不具合が再発していないかの動作確認。
+
+確認項目ごとに小さなブック・シートを作って処理し、期待どおりでなければ NG を表示して終了コード 1 を返す。
+引数に確認項目の名前を渡すと、その項目だけを確認する。
+
+    python bench/check_regressions.py
+    python bench/check_regressions.py blank_h10_cached_values
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import openpyxl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from backend.check import run_check  # noqa: E402
+from backend.index import index_workbook  # noqa: E402
+from backend.pipeline import STEP_MOVE_A1, STEP_SET_ZOOM, run_pipeline  # noqa: E402
+from generate_workbooks import fill_sheet, generate_workbook  # noqa: E402
+from util.calendar_index import CalendarIndex  # noqa: E402
+from util.logger import AggregatingQueueListener  # noqa: E402
+from util.profiler import FILE_SCOPE, Profiler  # noqa: E402
+from util.report_index import ReportIndex  # noqa: E402
+from util.rules import DEFAULT_PLAN  # noqa: E402
+from util.xlsx_package import XlsxPackage  # noqa: E402
+from util.xlsx_views import normalize_workbook_views  # noqa: E402
+
+CHECKS = {}
+
+
+def check(func):
+    """確認項目として登録する。func は問題がなければ None、あれば説明文を返す"""
+    CHECKS[func.__name__] = func
+    return func
+
+
+class MemorySheet:
+    """値 {セル番地: 値} と保存されている計算結果 (cached) だけを持つシート (SheetCells の代わり)"""
+
+    def __init__(self, title, values, cached=None):
+        self.title = title
+        self.values = values
+        self.cached = cached
+
+    def __getitem__(self, address):
+        return SimpleNamespace(value=self.values.get(address))
+
+
+def template_sheet(start_yyyymm="202404", end_yyyymm="202404", index=0):
+    """テンプレートどおりに入力した 1 週間分のシート (openpyxl の Worksheet) と、その週"""
+    week = CalendarIndex(start_yyyymm, end_yyyymm).weeks[index]
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = week.sheet_name
+    fill_sheet(ws, week, random.Random(0), "山田 太郎")
+    return ws, week
+
+
+@check
+def blank_h10_cached_values():
+    """H10 が空欄のシートで、Excel が保存した計算結果を「再計算されていない」と誤検出しない"""
+    ws, week = template_sheet()
+    ws["H10"] = None
+    values = {address: ws[address].value for address in DEFAULT_PLAN.addresses}
+    # 空欄はシリアル値 0 (Excel では 1900/1/0 土曜日)。H11〜H16 は 1〜6 (1900/1/1 日曜日〜)
+    cached = {"A57": 4}
+    for day in range(7):
+        a_row = 10 + day * 6
+        if day:
+            cached[f"H{10 + day}"] = day
+        cached[f"A{a_row}"] = 1
+        cached[f"A{a_row + 1}"] = day
+        cached[f"A{a_row + 2}"] = f"({'土日月火水木金'[day]})"
+    findings = DEFAULT_PLAN.run(MemorySheet(week.sheet_name, values, cached), week.sheet_name, week)
+    wrong = [f"{finding.cell}: {finding.message}" for finding in findings if finding.check == "check_cached_values"]
+    if wrong:
+        return "保存されている計算結果を誤検出しました: " + " / ".join(wrong)
+
+
+@check
+def required_keeps_falsy_semantics():
+    """C 列の未入力の判定が旧 check_daily_report と同じ (空白だけの文字列は入力あり、数値の 0 は未入力)"""
+    ws, week = template_sheet()
+    values = {address: ws[address].value for address in DEFAULT_PLAN.addresses}
+    values["C9"] = "  "
+    values["C15"] = 0
+    findings = DEFAULT_PLAN.run(MemorySheet(week.sheet_name, values), week.sheet_name, week)
+    empty = sorted(finding.cell for finding in findings if finding.rule_id == "c_required")
+    if empty != ["C15"]:
+        return f"未入力と判定されたセルが {empty} です (期待値: ['C15'])"
+
+
+@check
+def extract_twice_from_one_package():
+    """1 つの XlsxPackage から続けて 2 回抽出しても、元のブックと抽出したブックが壊れない"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "日報.xlsx"
+        generate_workbook(path, "202404", "202406")
+        outputs = [Path(temp_dir) / "first.xlsx", Path(temp_dir) / "second.xlsx"]
+        with XlsxPackage(path) as package:
+            names = package.sheetnames
+            for output_path, sheet_names in zip(outputs, (names[:2], names[2:4])):
+                try:
+                    package.extract(sheet_names, output_path)
+                except Exception as e:
+                    return f"{output_path.name} の抽出でエラーになりました: {e!r}"
+            if package.archive.testzip() is not None:
+                return "抽出後に元のブックが読めなくなりました"
+        for output_path, sheet_names in zip(outputs, (names[:2], names[2:4])):
+            wb = openpyxl.load_workbook(output_path, read_only=True)
+            if wb.sheetnames != sheet_names:
+                return f"{output_path.name} のシートが {wb.sheetnames} です (期待値: {sheet_names})"
+            wb.close()
+
+
+def _file_mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@check
+def views_keep_file_mode():
+    """move_a1 / set_zoom でブックを上書きしても、元のファイルのアクセス権が変わらない"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "日報.xlsx"
+        generate_workbook(path, "202404", "202404")
+        os.chmod(path, 0o644)
+        normalize_workbook_views(path, move_a1=True, zoom=100)
+        if _file_mode(path) != 0o644:
+            return f"アクセス権が {_file_mode(path):o} になりました (元は 644)"
+
+
+@check
+def pipeline_keeps_file_mode():
+    """pipeline (cut なし) でブックを上書きしても、元のファイルのアクセス権が変わらない"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "日報.xlsx"
+        generate_workbook(path, "202404", "202404")
+        os.chmod(path, 0o644)
+        run_pipeline("202404", "202404", steps=(STEP_MOVE_A1, STEP_SET_ZOOM), input_dir=temp_dir)
+        if _file_mode(path) != 0o644:
+            return f"アクセス権が {_file_mode(path):o} になりました (元は 644)"
+
+
+@check
+def index_skips_impossible_sheet_date():
+    """存在しない日付のシート名 (20240231_20240306) があっても、ブックの他のシートは索引に入る"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "日報.xlsx"
+        generate_workbook(path, "202402", "202403")
+        wb = openpyxl.load_workbook(path)
+        wb.copy_worksheet(wb.worksheets[0]).title = "20240231_20240306"
+        wb.save(path)
+        expected = len(wb.sheetnames) - 1
+        with ReportIndex(Path(temp_dir) / "index.sqlite") as index:
+            try:
+                updated, _ = index_workbook(index, path)
+            except ValueError as e:
+                return f"ブック全体が索引に入りませんでした: {e}"
+        if updated != expected:
+            return f"索引に入ったシートが {updated} シートです (期待値: {expected})"
+
+
+class CaptureHandler(logging.Handler):
+    """書き出された WARNING 以上のログのメッセージを保持する"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@check
+def repeated_findings_collapse():
+    """すべてのシートで同じ違反 (F4 の会社名) があっても、違反の行は 1 回だけ出力し、まとめに全シートを挙げる"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "日報.xlsx"
+        generate_workbook(path, "202404", "202404")
+        wb = openpyxl.load_workbook(path)
+        for ws in wb.worksheets:
+            ws["F4"] = "別の会社"
+        wb.save(path)
+
+        capture = CaptureHandler()
+        log_queue = queue.Queue()
+        listener = AggregatingQueueListener(log_queue, capture)
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        logging.getLogger().addHandler(queue_handler)
+        listener.start()
+        try:
+            run_check("202404", "202404", input_dir=temp_dir, use_cache=False)
+        finally:
+            logging.getLogger().removeHandler(queue_handler)
+            listener.stop()
+
+    f4_lines = [line for message in capture.messages for line in message.splitlines() if line.startswith("F4: ")]
+    if len(f4_lines) != 1:
+        return f"F4 の違反が {len(f4_lines)} 回出力されました (期待値: 1)"
+    summaries = [message for message in capture.messages if message.startswith("同じ違反が複数のシートで")]
+    missing = [ws.title for ws in wb.worksheets if not summaries or ws.title not in summaries[0]]
+    if missing:
+        return f"まとめに挙がっていないシートがあります: {missing}"
+
+
+@check
+def nested_phase_percentages():
+    """入れ子のフェーズがあっても、フェーズ別の割合の合計が最も外側のフェーズの分 (100%) を超えない"""
+    profiler = Profiler()
+    with profiler.phase(FILE_SCOPE, file="日報.xlsx"):
+        with profiler.phase("check"):
+            with profiler.phase("check.read"):
+                time.sleep(0.01)
+            with profiler.phase("check.rules"):
+                time.sleep(0.01)
+    capture = CaptureHandler()
+    capture.setLevel(logging.INFO)
+    root = logging.getLogger()
+    level = root.level
+    root.addHandler(capture)
+    root.setLevel(logging.INFO)
+    try:
+        profiler.report()
+    finally:
+        root.removeHandler(capture)
+        root.setLevel(level)
+    lines = capture.messages[0].splitlines()
+    phase_lines = lines[lines.index("フェーズ別:") + 2:lines.index("ファイル別:")]
+    percentages = {line.split("|")[-1].strip(): float(line.split("|")[1].strip().rstrip("%")) for line in phase_lines}
+    if percentages["check"] != 100.0 or sum(percentages.values()) > 200.0:
+        return f"フェーズ別の割合が {percentages} です (check が 100%、入れ子の 2 フェーズで残りの 100% の想定)"
+
+
+def main(names):
+    failed = 0
+    for name in names or CHECKS:
+        problem = CHECKS[name]()
+        print(f"{'NG' if problem else 'OK'}: {name}" + (f" ({problem})" if problem else ""))
+        failed += bool(problem)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,89 @@
+"""
+watch の動作確認。
+
+違反を入れたブックを生成して WorkbookWatcher でチェックし、違反を直さないままブックを保存し直して
+もう一度チェックする。2 回目のチェックでも同じ違反が出力されることを確認し、出力されなければ終了コード 1 を返す
+(ログの同じ警告の省略が再チェックをまたいで続き、違反が出力されなくなっていないかの確認)。
+
+    python bench/check_watch.py
+"""
+import logging
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import openpyxl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from backend.watch import WorkbookWatcher  # noqa: E402
+from generate_workbooks import generate_workbook  # noqa: E402
+from util import logger as app_logger  # noqa: E402
+from util.check_cache import CheckCache  # noqa: E402
+
+START_YYYYMM, END_YYYYMM = "202404", "202406"
+CYCLE_END = "check_watch: チェック終了"
+
+
+class CaptureHandler(logging.Handler):
+    """リスナーが書き出した WARNING 以上のログのメッセージを保持する"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.written = threading.Event()
+
+    def emit(self, record):
+        if record.getMessage() == CYCLE_END:
+            self.written.set()
+        elif record.levelno >= logging.WARNING:
+            self.messages.append(record.getMessage())
+
+
+def check_cycle(watcher, path, capture):
+    """ブックを 1 回チェックし、そのチェックで出力された WARNING 以上のメッセージを返す"""
+    before = len(capture.messages)
+    capture.written.clear()
+    watcher.check(str(path))
+    # リスナーのスレッドがそれまでのログを書き出すまで待つ (リスナーは止めず、集計はそのまま引き継ぐ)
+    logging.getLogger().info(CYCLE_END)
+    if not capture.written.wait(timeout=10):
+        raise TimeoutError("ログが書き出されませんでした")
+    return capture.messages[before:]
+
+
+def main():
+    capture = CaptureHandler()
+    logging.getLogger().handlers.clear()
+    app_logger.setup_root_logger(verbose=False)
+    app_logger._listener.handlers += (capture,)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = Path(temp_dir) / "input"
+        path = input_dir / "日報.xlsx"
+        broken = generate_workbook(path, START_YYYYMM, END_YYYYMM, broken_rate=0.5, seed=1)
+        watcher = WorkbookWatcher(str(input_dir), START_YYYYMM, END_YYYYMM, cache=CheckCache(Path(temp_dir) / "cache.json"))
+
+        first = check_cycle(watcher, path, capture)
+
+        # 違反のあるシートのチェック対象ではないセルだけを変えて保存し直す
+        wb = openpyxl.load_workbook(path)
+        for sheet_name in broken:
+            wb[sheet_name]["Z100"] = "メモ"
+        wb.save(path)
+        second = check_cycle(watcher, path, capture)
+
+    app_logger.stop_root_logger()
+
+    reported = lambda messages: {sheet_name for sheet_name in broken if any(sheet_name in message for message in messages)}
+    print(f"違反を入れたシート: {len(broken)}、1 回目に出力: {len(reported(first))}、2 回目に出力: {len(reported(second))}")
+    if not broken or reported(first) != set(broken) or reported(second) != set(broken):
+        print("NG: 再チェックで違反が出力されませんでした")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+ベンチマーク・動作確認用の日報ブックを生成する。
+
+check のルール (util/rules.py) どおりに入力された正常なシートを作り、
+--broken-rate の割合のシートには違反をわざと 1 つ入れる。
+
+    python bench/generate_workbooks.py --preset year
+    python bench/generate_workbooks.py --start 202104 --end 202603 --broken-rate 0.2 --output bench/data/custom
+"""
+import argparse
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import openpyxl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from util.calendar_index import CalendarIndex  # noqa: E402
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+# プリセット: (開始年月, 終了年月, ブック数)
+PRESETS = {
+    "year": ("202404", "202503", 1),
+    "5years": ("202004", "202503", 1),
+    "team": ("202404", "202503", 20),
+}
+
+WORK_ENTRIES = ("設計書レビュー", "機能実装", "単体テスト", "打ち合わせ", "不具合調査", "資料作成")
+
+
+def _break_h_formula(ws, week, rng):
+    ws[f"H{rng.randint(11, 16)}"] = "=H10+2"
+
+
+def _break_a_formula(ws, week, rng):
+    ws[f"A{10 + rng.randint(0, 6) * 6}"] = "=MONTH(H10)"
+
+
+def _break_b_label(ws, week, rng):
+    ws[f"B{11 + rng.randint(0, 6) * 6}"] = None
+
+
+def _break_h10(ws, week, rng):
+    tuesday = week.dates[1]
+    ws["H10"] = datetime(tuesday.year, tuesday.month, tuesday.day)
+
+
+def _break_company(ws, week, rng):
+    ws["F4"] = "miracleave"
+
+
+def _break_a57(ws, week, rng):
+    ws["A57"] = "=H15"
+
+
+def _break_c6(ws, week, rng):
+    ws["C6"] = None
+
+
+def _break_entry(ws, week, rng):
+    ws[f"C{9 + rng.randint(0, 4) * 6}"] = None
+
+
+def _break_day_off(ws, week, rng):
+    workdays = [day for day in range(7) if not week.day_off[day]]
+    if workdays:
+        ws[f"C{9 + rng.choice(workdays) * 6}"] = "休日"
+
+
+BREAKERS = (
+    _break_h_formula, _break_a_formula, _break_b_label, _break_h10, _break_company,
+    _break_a57, _break_c6, _break_entry, _break_day_off,
+)
+
+
+def fill_sheet(ws, week, rng, person):
+    """1 週間分の日報シートをテンプレートどおりに埋める"""
+    ws["F4"] = "miracleave株式会社"
+    ws["C6"] = person
+    ws["H10"] = datetime(week.dates[0].year, week.dates[0].month, week.dates[0].day)
+    ws["H10"].number_format = "yyyy/m/d"
+    for day in range(1, 7):
+        ws[f"H{10 + day}"] = f"=H{9 + day}+1"
+        ws[f"H{10 + day}"].number_format = "yyyy/m/d"
+
+    for day in range(7):
+        a_row = 10 + day * 6
+        h_ref = f"H{10 + day}"
+        ws[f"A{a_row}"] = f"=MONTH({h_ref})"
+        ws[f"A{a_row + 1}"] = f"=DAY({h_ref})"
+        ws[f"A{a_row + 2}"] = f'="("&TEXT({h_ref}, "aaa")&")"'
+        ws[f"B{a_row}"] = "月"
+        ws[f"B{a_row + 1}"] = "日"
+        if week.day_off[day]:
+            ws[f"C{a_row - 1}"] = "休日" if day >= 5 else "祝日"
+        else:
+            ws[f"C{a_row - 1}"] = rng.choice(WORK_ENTRIES)
+            # 実際の日報と同じく、業務内容の下に詳細と作業時間を入れておく
+            for offset in range(1, 5):
+                ws[f"C{a_row - 1 + offset}"] = f"{rng.choice(WORK_ENTRIES)} の詳細 {offset}"
+                ws[f"G{a_row - 1 + offset}"] = rng.choice((0.5, 1.0, 1.5, 2.0))
+    ws["A57"] = "=H14"
+    ws["C58"] = "所感"
+    ws["C59"] = "特になし"
+
+
+def generate_workbook(path, start_yyyymm, end_yyyymm, broken_rate=0.0, seed=0, person="山田 太郎"):
+    """日報ブックを 1 つ生成する。戻り値は違反を入れたシート名のリスト"""
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    broken = []
+    for week in CalendarIndex(start_yyyymm, end_yyyymm).weeks:
+        ws = wb.create_sheet(week.sheet_name)
+        fill_sheet(ws, week, rng, person)
+        if rng.random() < broken_rate:
+            rng.choice(BREAKERS)(ws, week, rng)
+            broken.append(week.sheet_name)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return broken
+
+
+def generate_preset(preset, output_dir=None, broken_rate=0.1, seed=0):
+    """プリセットのブック一式を生成し、生成したファイルのリストを返す"""
+    start_yyyymm, end_yyyymm, count = PRESETS[preset]
+    output_dir = Path(output_dir or DATA_DIR / preset)
+    paths = []
+    for index in range(count):
+        path = output_dir / f"日報_{index + 1:02d}.xlsx"
+        generate_workbook(path, start_yyyymm, end_yyyymm, broken_rate, seed + index, person=f"社員{index + 1:02d}")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用の日報ブックを生成する")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="生成するサイズのプリセット")
+    parser.add_argument("--start", help="開始年月 (YYYYMM)。--preset を使わない場合に指定")
+    parser.add_argument("--end", help="終了年月 (YYYYMM)。--preset を使わない場合に指定")
+    parser.add_argument("--count", type=int, default=1, help="生成するブック数")
+    parser.add_argument("--broken-rate", type=float, default=0.1, help="違反を入れるシートの割合 (0〜1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="出力フォルダ (省略時は bench/data/<preset>)")
+    args = parser.parse_args()
+
+    if args.preset:
+        paths = generate_preset(args.preset, args.output, args.broken_rate, args.seed)
+    elif args.start and args.end:
+        output_dir = Path(args.output or DATA_DIR / f"{args.start}_{args.end}")
+        paths = []
+        for index in range(args.count):
+            path = output_dir / f"日報_{index + 1:02d}.xlsx"
+            generate_workbook(path, args.start, args.end, args.broken_rate, args.seed + index)
+            paths.append(path)
+    else:
+        parser.error("--preset または --start と --end を指定してください")
+
+    for path in paths:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
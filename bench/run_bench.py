@@ -0,0 +1,211 @@
+"""
+check / cut の処理時間を計測するベンチマーク。
+
+bench/generate_workbooks.py のプリセットのブック (なければ生成する) を使い、
+ブックの読み込み・シート名の差分・チェックごとの処理・cut を計測して bench/results/ に JSON で保存する。
+--compare に以前の結果を渡すと比較を表示し、--threshold 倍を超えて遅くなった項目があれば終了コード 1 を返す。
+
+    python bench/run_bench.py --preset 5years
+    python bench/run_bench.py --preset 5years --compare bench/results/0.1.0-abc1234-5years.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+sys.path.insert(0, str(ROOT_DIR / "app"))
+
+import openpyxl  # noqa: E402
+
+from backend.check import check_workbook  # noqa: E402
+from generate_workbooks import DATA_DIR, PRESETS, generate_preset  # noqa: E402
+from util.calendar_index import CalendarIndex  # noqa: E402
+from util.findings import CollectFindingSink  # noqa: E402
+from util.rules import CHECK_NAMES, DEFAULT_PLAN, CheckPlan  # noqa: E402
+from util.template import CompiledTemplate, learn_template  # noqa: E402
+from util.xlsx_package import XlsxPackage  # noqa: E402
+from util.xlsx_reader import StreamingWorkbook  # noqa: E402
+
+
+def measure(func, repeat):
+    """func を repeat 回実行し、各回の経過時間 (秒) のリストを返す"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def version_label():
+    """pyproject.toml のバージョンと git のコミット (取得できれば) からなるラベル"""
+    version = "unknown"
+    for line in (ROOT_DIR / "pyproject.toml").read_text(encoding="utf-8").splitlines():
+        if line.startswith("version"):
+            version = line.split("=", 1)[1].strip().strip('"')
+            break
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return f"{version}-{commit}"
+    except (OSError, subprocess.CalledProcessError):
+        return version
+
+
+def workbook_paths(preset):
+    paths = sorted((DATA_DIR / preset).glob("*.xlsx"))
+    if len(paths) < PRESETS[preset][2]:
+        paths = generate_preset(preset)
+    return paths
+
+
+def bench_cases(preset):
+    """{計測項目名: 関数} を返す"""
+    start_yyyymm, end_yyyymm, _ = PRESETS[preset]
+    paths = workbook_paths(preset)
+    largest = max(paths, key=lambda path: path.stat().st_size)
+    calendar = CalendarIndex(start_yyyymm, end_yyyymm)
+
+    with StreamingWorkbook(largest) as wb:
+        snapshots = [(name, wb.read_cells(name, DEFAULT_PLAN.addresses)) for name in calendar.sheet_names if name in wb.sheetnames]
+    check_plans = {check: CheckPlan([rule for rule in DEFAULT_PLAN.rules if rule.check == check]) for check in CHECK_NAMES}
+
+    def load_openpyxl():
+        for path in paths:
+            openpyxl.load_workbook(path, data_only=False)
+
+    def load_stream():
+        for path in paths:
+            with StreamingWorkbook(path) as wb:
+                for name in wb.sheetnames:
+                    wb.read_cells(name, DEFAULT_PLAN.addresses)
+
+    def sheet_name_diff():
+        index = CalendarIndex(start_yyyymm, end_yyyymm)
+        with StreamingWorkbook(largest) as wb:
+            existing = set(wb.sheetnames)
+        [name for name in index.sheet_names if name not in existing]
+
+    def run_check(plan):
+        def run():
+            for name, ws in snapshots:
+                plan.run(ws, name, calendar.week(name))
+        return run
+
+    def cut():
+        # 最大のブックから最後の 1 年分 (12 か月) を切り出す
+        sheet_names = calendar.sheet_names[-52:]
+        with tempfile.TemporaryDirectory() as tmp_dir, XlsxPackage(largest) as package:
+            package.extract(sheet_names, Path(tmp_dir) / "cut.xlsx")
+
+    cases = {
+        "load_workbook.openpyxl": load_openpyxl,
+        "load_workbook.stream": load_stream,
+        "sheet_name_diff": sheet_name_diff,
+    }
+    for check, plan in check_plans.items():
+        cases[f"check.{check}"] = run_check(plan)
+    cases["check.all_rules"] = run_check(DEFAULT_PLAN)
+    cases["check_workbook"] = lambda: [
+        check_workbook(path, start_yyyymm, end_yyyymm, sink=CollectFindingSink()) for path in paths
+    ]
+    if (os.cpu_count() or 1) > 1:
+        # 1 つのブックのシートを CPU コア数のプロセスに分けてチェック (check --sheet-jobs 0)
+        cases["check_workbook.sheet_jobs"] = lambda: [
+            check_workbook(path, start_yyyymm, end_yyyymm, sink=CollectFindingSink(), sheet_jobs=os.cpu_count())
+            for path in paths
+        ]
+    cases["cut.zip"] = cut
+
+    # diff_template: 最初の週をテンプレートにして、全シートを読む時間と比べる時間を分けて計測する
+    with StreamingWorkbook(largest) as wb:
+        sheet_names = [name for name in calendar.sheet_names if name in wb.sheetnames]
+        reference = wb.read_cells(sheet_names[0], None)
+        samples = [wb.read_cells(name, reference.addresses) for name in sheet_names[1:]]
+        template = CompiledTemplate(learn_template(reference, samples, calendar=calendar))
+        template_sheets = [(name, wb.read_cells(name, template.addresses)) for name in sheet_names]
+
+    def template_read():
+        with StreamingWorkbook(largest) as wb:
+            for name in sheet_names:
+                wb.read_cells(name, template.addresses)
+
+    def template_diff():
+        for name, ws in template_sheets:
+            template.diff(ws, name, calendar.week(name))
+
+    cases["template.read"] = template_read
+    cases["template.diff"] = template_diff
+    return cases
+
+
+def compare(results, baseline, threshold):
+    """
+    以前の結果と比較して表示し、threshold 倍を超えて遅くなった項目名のリストを返す。
+    短い処理はばらつきが大きいため、比較には最小値を使う。
+    """
+    regressions = []
+    print(f"\n比較対象: {baseline['version']} ({baseline['timestamp']})")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:<40} (新規)")
+            continue
+        ratio = result["min"] / before["min"] if before["min"] else float("inf")
+        mark = ""
+        if ratio > threshold:
+            mark = "  <-- 遅くなっています"
+            regressions.append(name)
+        print(f"  {name:<40} {before['min'] * 1000:9.2f} ms -> {result['min'] * 1000:9.2f} ms (x{ratio:.2f}){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="check / cut のベンチマーク")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="year")
+    parser.add_argument("--repeat", type=int, default=5, help="各項目の実行回数 (中央値を記録)")
+    parser.add_argument("--output", help="結果の保存先 (省略時は bench/results/<バージョン>-<プリセット>.json)")
+    parser.add_argument("--compare", help="比較する以前の結果 (JSON)")
+    parser.add_argument("--threshold", type=float, default=1.2, help="この倍率を超えて遅くなったら失敗とする")
+    args = parser.parse_args()
+
+    label = version_label()
+    results = {}
+    for name, func in bench_cases(args.preset).items():
+        timings = measure(func, args.repeat)
+        results[name] = {"median": statistics.median(timings), "min": min(timings), "max": max(timings)}
+        print(f"{name:<40} {results[name]['median'] * 1000:9.2f} ms (min {results[name]['min'] * 1000:.2f} ms)")
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{label}-{args.preset}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "version": label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "preset": args.preset,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n結果を保存しました: {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()